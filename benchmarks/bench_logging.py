@@ -0,0 +1,162 @@
+"""
+Log overhead under load: synchronous vs queued logging
+
+Usage:
+    python -m benchmarks.bench_logging [--threads 1 8 32] [--records 2000]
+
+Every thread logs, per simulated request, one INFO line and one DEBUG line
+with a DataFrame preview, with the logger at DEBUG (development) and at INFO
+(production). "before" is the original setup: a RotatingFileHandler on the
+calling thread and an eager head(10).to_string() argument. "after" is the
+current one: an AsyncQueueHandler in front of a DailyDirectoryFileHandler
+served by a background writer, and LazyPreview. Reported are the time the
+calling threads spend per request (mean and p99) and the wall time until
+every record is on disk, plus the records the full queue dropped.
+"""
+import argparse
+import logging
+import queue
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import QueueListener, RotatingFileHandler
+
+import numpy as np
+import pandas as pd
+
+from flaskr import definitions as constants
+from flaskr.log_handlers import AsyncQueueHandler, DailyDirectoryFileHandler, LazyPreview
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class _WrittenCount(logging.Filter):
+    """Counts the records reaching the file handler"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self.count += 1
+        return True
+
+
+def _preview_frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "Country": [f"COUNTRY {i:03d}" for i in range(200)],
+            "Date": rng.integers(1990, 2024, 200),
+            "Value": rng.random(200) * 100,
+        }
+    )
+
+
+def _eager_preview(data_frame: pd.DataFrame) -> str:
+    """The original DEBUG argument, rendered whether or not it's emitted"""
+    return data_frame.head(10).to_string(index=False)
+
+
+def _before(directory: str) -> tuple:
+    handler = RotatingFileHandler(
+        f"{directory}/before.log", maxBytes=1024 * 1024, backupCount=10
+    )
+    handler.setFormatter(logging.Formatter(FORMAT))
+    return handler, [handler], None, _eager_preview
+
+
+def _after(directory: str) -> tuple:
+    handler = DailyDirectoryFileHandler(directory, "after.log")
+    handler.setFormatter(logging.Formatter(FORMAT))
+    queue_handler = AsyncQueueHandler(queue.Queue(constants.LOG_QUEUE_SIZE))
+    listener = QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    return handler, [queue_handler], listener, LazyPreview
+
+
+SETUPS = {"before": _before, "after": _after}
+
+
+def run_case(setup: str, level: int, threads: int, records: int) -> dict:
+    """Logs from several threads through one setup
+
+    Args:
+        setup (str): 'before' or 'after'
+        level (int): Logger level
+        threads (int): Concurrent logging threads
+        records (int): Simulated requests per thread
+
+    Returns:
+        dict: Per-request caller time (mean, p99), wall time until flushed
+              and dropped records
+    """
+    data_frame = _preview_frame()
+    with tempfile.TemporaryDirectory() as directory:
+        file_handler, handlers, listener, preview = SETUPS[setup](directory)
+        written = _WrittenCount()
+        file_handler.addFilter(written)
+        logger = logging.getLogger(f"bench.{setup}")
+        logger.propagate = False
+        logger.setLevel(level)
+        for handler in handlers:
+            logger.addHandler(handler)
+
+        durations = np.zeros((threads, records))
+
+        def work(thread: int) -> None:
+            for record in range(records):
+                start = time.perf_counter()
+                logger.info("Request %s of thread %s handled in %.3fms", record, thread, 1.5)
+                logger.debug("Top 10 data =\n%s", preview(data_frame))
+                durations[thread, record] = time.perf_counter() - start
+
+        workers = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if listener is not None:
+            listener.stop()
+        wall = time.perf_counter() - start
+
+        for handler in handlers:
+            logger.removeHandler(handler)
+            handler.close()
+        file_handler.close()
+
+    return {
+        "setup": setup,
+        "level": logging.getLevelName(level),
+        "threads": threads,
+        "mean_us": float(durations.mean() * 1e6),
+        "p99_us": float(np.percentile(durations, 99) * 1e6),
+        "wall_ms": wall * 1e3,
+        "dropped": threads * records * (2 if level <= logging.DEBUG else 1) - written.count,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--records", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'level':>6} {'threads':>8} {'setup':>7} {'mean us':>9} {'p99 us':>9} "
+        f"{'wall ms':>9} {'dropped':>8}"
+    )
+    for level in (logging.DEBUG, logging.INFO):
+        for threads in args.threads:
+            for setup in SETUPS:
+                result = run_case(setup, level, threads, args.records)
+                print(
+                    f"{result['level']:>6} {threads:>8} {setup:>7} {result['mean_us']:>9.1f} "
+                    f"{result['p99_us']:>9.1f} {result['wall_ms']:>9.1f} {result['dropped']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the PPP parsing path
+
+Usage:
+    python -m benchmarks.bench_ppp_parse [--records 10000 100000 1000000]
+
+Compares the original row-by-row parse + groupby/idxmax reduction with the
+columnar extraction + sort-based reduction of PPPData._parse_ppp_data; that
+both produce the same output is checked by tests/test_ppp_parse.py.
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import world_bank_pages, world_bank_records
+from flaskr.api.ingest import PPPColumns
+from flaskr.api.services import PPPData
+
+
+def legacy_parse_ppp_data(ppp_data: list) -> pd.DataFrame:
+    """The original PPPData._parse_ppp_data, kept as the reference output"""
+    records = []
+
+    for record in ppp_data:
+        country = record["country"]["value"]
+        date = record["date"]
+        value = record["value"]
+        records.append([country, date, value])
+
+    parsed_df = pd.DataFrame(records, columns=["Country", "Date", "Value"])
+    parsed_df["Value"] = parsed_df["Value"].astype("float")
+    parsed_df["Date"] = parsed_df["Date"].astype("int")
+
+    filter1_df = parsed_df.loc[parsed_df["Value"].notna()].copy()
+    filter1_df["Country"] = filter1_df["Country"].str.upper()
+
+    filter2_df = filter1_df.loc[
+        filter1_df.groupby(by="Country")["Date"].idxmax()
+    ].reset_index()
+
+    return filter2_df[["Country", "Date", "Value"]]
+
+
+def columnar_parse_ppp_data(service: PPPData, ppp_data: list) -> pd.DataFrame:
+    """The current path: page by page extraction into PPPColumns, then the
+    sort-based reduction"""
+    columns = PPPColumns()
+    for page in world_bank_pages(ppp_data):
+        columns.extend(page)
+
+    return service._parse_ppp_data(ppp_data=columns)[["Country", "Date", "Value"]]
+
+
+def _best_of(repeat: int, func, *args) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    service = PPPData()
+    print(f"{'records':>9} {'legacy ms':>10} {'columnar ms':>12} {'speedup':>8}")
+    for count in args.records:
+        records = world_bank_records(count)
+        legacy_seconds, _ = _best_of(args.repeat, legacy_parse_ppp_data, records)
+        columnar_seconds, _ = _best_of(args.repeat, columnar_parse_ppp_data, service, records)
+
+        print(
+            f"{count:>9} {legacy_seconds * 1e3:>10.1f} {columnar_seconds * 1e3:>12.1f} "
+            f"{legacy_seconds / columnar_seconds:>7.1f}x"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Load time and RSS of the CSV and columnar storage backends
+
+Usage:
+    python -m benchmarks.bench_storage [--rows 10000 100000 1000000]
+
+Every load runs in a fresh subprocess so the reported RSS growth belongs to
+that load alone.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from flaskr.data import ColumnarStorage, CsvStorage
+
+BACKENDS = {
+    "csv": CsvStorage,
+    "columnar": lambda: ColumnarStorage(csv_export=False),
+}
+
+
+def synthetic_merged_data(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Merged-data shaped frame: string country/currency, int year, float values"""
+    rng = np.random.default_rng(seed)
+    countries = np.array([f"COUNTRY {i:04d}" for i in range(250)], dtype=object)
+    codes = np.array([f"C{i:02d}" for i in range(160)], dtype=object)
+    return pd.DataFrame(
+        {
+            "Country": countries[rng.integers(0, len(countries), rows)],
+            "AlphabeticCode": codes[rng.integers(0, len(codes), rows)],
+            "Date": rng.integers(1990, 2024, rows),
+            "Value": rng.random(rows) * 100,
+            "ExchangeRate": rng.random(rows) * 1000,
+        }
+    )
+
+
+def _current_rss_kb() -> int:
+    """Resident set size of this process; falls back to the peak RSS where
+    /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure_load(backend: str, path: str, mode: str) -> dict:
+    """Runs in the child process: loads the dataset and reports time and the
+    RSS the loaded data holds on to"""
+    storage = BACKENDS[backend]()
+    baseline_rss = _current_rss_kb()
+    start = time.perf_counter()
+    if mode == "columns":
+        columns = storage.load_columns(path)
+        # Touch the numeric columns so memory-mapped pages are counted
+        checksum = float(
+            sum(np.asarray(columns[name], dtype="float64").sum() for name in ("Value", "ExchangeRate"))
+        )
+    else:
+        data_frame = storage.load(path)
+        checksum = float(data_frame["Value"].sum() + data_frame["ExchangeRate"].sum())
+    seconds = time.perf_counter() - start
+    loaded_rss = _current_rss_kb()
+
+    return {
+        "seconds": seconds,
+        "rss_delta_kb": loaded_rss - baseline_rss,
+        "checksum": checksum,
+    }
+
+
+def run(rows_list: list) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in rows_list:
+            data_frame = synthetic_merged_data(rows)
+            path = os.path.join(directory, f"merged_{rows}")
+            for backend, factory in BACKENDS.items():
+                storage = factory()
+                storage.save(data_frame, path)
+                size = os.path.getsize(storage.path_for(path))
+                for mode in ("dataframe", "columns"):
+                    output = subprocess.run(
+                        [sys.executable, "-m", "benchmarks.bench_storage", "--child", backend, path, mode],
+                        check=True,
+                        capture_output=True,
+                        text=True,
+                    ).stdout
+                    measured = json.loads(output.strip().splitlines()[-1])
+                    results.append(
+                        {
+                            "rows": rows,
+                            "backend": backend,
+                            "mode": mode,
+                            "file_bytes": size,
+                            **measured,
+                        }
+                    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure_load(*args.child)))
+        return
+
+    print(f"{'rows':>9} {'backend':>9} {'mode':>10} {'file MB':>8} {'load ms':>9} {'RSS MB':>8}")
+    for result in run(args.rows):
+        print(
+            f"{result['rows']:>9} {result['backend']:>9} {result['mode']:>10} "
+            f"{result['file_bytes'] / 1e6:>8.2f} {result['seconds'] * 1e3:>9.2f} "
+            f"{result['rss_delta_kb'] / 1024:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
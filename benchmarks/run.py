@@ -0,0 +1,252 @@
+"""
+Benchmark suite of the data pipeline stages over synthetic upstream payloads
+
+Usage:
+    python -m benchmarks.run [--scales 1 10 100] [--output results.json]
+    python -m benchmarks.run --compare baseline.json [--threshold 0.25]
+
+Every stage runs on payloads scaled from today's upstream sizes (scale 1) up
+to 100x. Time is the best of --repeat runs; peak memory is measured with
+tracemalloc in a separate run so tracing doesn't skew the timings. With
+--compare, stages slower or hungrier than the baseline by more than the
+threshold are reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from flaskr import definitions as constants
+
+
+def _stages(scale: int, directory: str) -> list:
+    """Builds the payloads of one scale and the stages running on them
+
+    Args:
+        scale (int): Multiple of today's upstream sizes
+        directory (str): Scratch directory the fetched/generated files go to
+
+    Returns:
+        list: (stage name, record count, zero-argument callable) tuples
+    """
+    # Services read their paths from constants when they're constructed
+    constants.FETCHED_DATA_PATH = os.path.join(directory, "fetched")
+    constants.GENERATED_DATA_PATH = os.path.join(directory, "generated", "current")
+
+    from flaskr.api.ingest import PPPColumns
+    from flaskr.api.services import CurrencyData, ExchangeRateData, GenerateData, PPPData
+    from flaskr.data import CsvStorage
+
+    countries = synthetic.WORLD_BANK_COUNTRIES * scale
+    currencies = synthetic.EXCHANGE_RATE_CURRENCIES * scale
+    records = synthetic.world_bank_records(
+        countries * synthetic.WORLD_BANK_YEARS, countries=countries, seed=scale
+    )
+    exchange_payload = synthetic.open_exchange_rates_payload(currencies, seed=scale)
+    currency_bytes = synthetic.currency_csv(
+        countries=countries,
+        entities=synthetic.CURRENCY_ENTITIES * scale,
+        currencies=currencies,
+        seed=scale,
+    )
+
+    ppp_service = PPPData()
+    exchange_service = ExchangeRateData()
+    currency_service = CurrencyData()
+
+    def parse_ppp():
+        columns = PPPColumns()
+        for page in synthetic.world_bank_pages(records):
+            columns.extend(page)
+        return ppp_service._parse_ppp_data(ppp_data=columns)
+
+    # Fetched inputs of the merge, saved the way the services save them
+    series_columns = PPPColumns()
+    for page in synthetic.world_bank_pages(records):
+        series_columns.extend(page)
+    series_df = ppp_service._parse_ppp_series(ppp_data=series_columns)
+    ppp_service.storage.save(series_df, ppp_service.ppp_series_path)
+    ppp_service._save_ppp_data(
+        ppp_service._latest_per_country(series_df)[["Country", "Date", "Value"]]
+    )
+    exchange_service._save_exch_rate_data(
+        exchange_service._parse_exch_rate_data(exchange_payload)
+    )
+    currency_service._save_currency_data(currency_service._parse_data(currency_bytes))
+
+    generator = GenerateData()
+    merged_df = generator._full_merge()
+    csv_storage = CsvStorage()
+    csv_path = os.path.join(directory, "merged.csv")
+    csv_storage.save(merged_df, csv_path)
+
+    return [
+        ("parse_ppp_data", len(records), parse_ppp),
+        (
+            "parse_exch_rate_data",
+            currencies,
+            lambda: exchange_service._parse_exch_rate_data(exchange_payload),
+        ),
+        (
+            "parse_currency_data",
+            synthetic.CURRENCY_ENTITIES * scale,
+            lambda: currency_service._parse_data(currency_bytes),
+        ),
+        ("generate_merge", merged_df.shape[0], generator._full_merge),
+        ("csv_save", merged_df.shape[0], lambda: csv_storage.save(merged_df, csv_path)),
+        ("csv_load", merged_df.shape[0], lambda: csv_storage.load(csv_path)),
+    ]
+
+
+def _measure(func, repeat: int) -> tuple:
+    """Best wall time of a few runs, then the tracemalloc peak of one more
+
+    Args:
+        func: Zero-argument stage callable
+        repeat (int): Timed runs
+
+    Returns:
+        tuple: (float seconds, int peak bytes)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def run(scales: list, repeat: int) -> dict:
+    """Runs every stage at every scale
+
+    Args:
+        scales (list): Multiples of today's upstream sizes
+        repeat (int): Timed runs per stage
+
+    Returns:
+        dict: Environment and one result per (stage, scale)
+    """
+    fetched_path = constants.FETCHED_DATA_PATH
+    generated_path = constants.GENERATED_DATA_PATH
+    results = []
+    try:
+        for scale in scales:
+            with tempfile.TemporaryDirectory() as directory:
+                for stage, records, func in _stages(scale, directory):
+                    seconds, peak = _measure(func, repeat)
+                    results.append(
+                        {
+                            "stage": stage,
+                            "scale": scale,
+                            "records": int(records),
+                            "seconds": seconds,
+                            "peak_bytes": int(peak),
+                        }
+                    )
+                    _print_result(results[-1])
+    finally:
+        constants.FETCHED_DATA_PATH = fetched_path
+        constants.GENERATED_DATA_PATH = generated_path
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Finds the stages that got slower or hungrier than the baseline
+
+    Args:
+        current (dict): Output of run
+        baseline (dict): Stored output of an earlier run
+        threshold (float): Allowed relative increase, e.g. 0.25 for +25%
+
+    Returns:
+        list: One dict per regression
+    """
+    previous = {(result["stage"], result["scale"]): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["scale"]))
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if before[metric] > 0 and result[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    {
+                        "stage": result["stage"],
+                        "scale": result["scale"],
+                        "metric": metric,
+                        "baseline": before[metric],
+                        "current": result[metric],
+                        "change": result[metric] / before[metric] - 1,
+                    }
+                )
+
+    return regressions
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"{result['stage']:>22} {result['scale']:>6}x {result['records']:>9} "
+        f"{result['seconds'] * 1e3:>10.2f} {result['peak_bytes'] / 2**20:>10.2f}",
+        flush=True,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{'stage':>22} {'scale':>7} {'records':>9} {'time ms':>10} {'peak MiB':>10}")
+    current = run(args.scales, args.repeat)
+    with open(args.output, "w") as file:
+        json.dump(current, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare, "r") as file:
+        baseline = json.load(file)
+    regressions = compare(current, baseline, args.threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['stage']} at {regression['scale']}x: "
+            f"{regression['metric']} {regression['baseline']:.6g} -> "
+            f"{regression['current']:.6g} ({regression['change']:+.0%})"
+        )
+    if not regressions:
+        print(f"No regressions over {args.threshold:.0%} against {args.compare}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
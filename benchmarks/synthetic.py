@@ -0,0 +1,143 @@
+"""
+Synthetic upstream payloads shaped like the real World Bank,
+openexchangerates.org and datahub.io responses
+"""
+import string
+
+import numpy as np
+
+# Sizes of the real upstream payloads today
+WORLD_BANK_COUNTRIES = 266  # Countries and aggregates in a PA.NUS.PPP response
+WORLD_BANK_YEARS = 4  # The 2019:2022 date range PPPData requests
+EXCHANGE_RATE_CURRENCIES = 170  # Rates in an openexchangerates.org latest.json
+CURRENCY_ENTITIES = 440  # Rows of the datahub.io currency-codes CSV
+
+
+def world_bank_records(count: int, countries: int = 266, seed: int = 0) -> list:
+    """World Bank indicator records (the second element of a page body)
+
+    Args:
+        count (int): Number of records
+        countries (int): Number of distinct countries
+        seed (int): Random seed
+
+    Returns:
+        list: Records with 'country', 'countryiso3code', 'date' and 'value'
+    """
+    rng = np.random.default_rng(seed)
+    names = country_names(countries)
+    country_dicts = [{"id": f"C{i:03d}", "value": name} for i, name in enumerate(names)]
+    indicator = {"id": "PA.NUS.PPP", "value": "PPP conversion factor, GDP (LCU per international $)"}
+
+    country_ids = rng.integers(0, countries, count)
+    years = rng.integers(1990, 2024, count)
+    values = rng.random(count) * 100
+    missing = rng.random(count) < 0.15
+
+    return [
+        {
+            "indicator": indicator,
+            "country": country_dicts[country_id],
+            "countryiso3code": country_dicts[country_id]["id"],
+            "date": str(year),
+            "value": None if is_missing else value,
+            "unit": "",
+            "obs_status": "",
+            "decimal": 0,
+        }
+        for country_id, year, value, is_missing in zip(
+            country_ids.tolist(), years.tolist(), values.tolist(), missing.tolist()
+        )
+    ]
+
+
+def world_bank_pages(records: list, per_page: int = 1000):
+    """Splits records into page sized chunks the way the API returns them
+
+    Args:
+        records (list): Records from world_bank_records
+        per_page (int): Records per page
+
+    Yields:
+        list: Records of one page
+    """
+    for start in range(0, len(records), per_page):
+        yield records[start:start + per_page]
+
+
+def country_names(countries: int) -> list:
+    """World Bank style country names; mixed case names that collide once
+    upper-cased, like the real aggregates
+
+    Args:
+        countries (int): Number of names
+
+    Returns:
+        list: Country names
+    """
+    return [f"Country {i:03d}" if i % 7 else f"COUNTRY {i - 1:03d}" for i in range(countries)]
+
+
+def currency_code(index: int) -> str:
+    """Distinct alphabetic code for an index: AAA, AAB, ... then four letters
+
+    Args:
+        index (int): Currency index
+
+    Returns:
+        str: Alphabetic code
+    """
+    letters = []
+    width = 3 if index < 26**3 else 4
+    for _ in range(width):
+        index, remainder = divmod(index, 26)
+        letters.append(string.ascii_uppercase[remainder])
+    return "".join(reversed(letters))
+
+
+def open_exchange_rates_payload(currencies: int, seed: int = 0) -> dict:
+    """openexchangerates.org latest.json body with USD based rates
+
+    Args:
+        currencies (int): Number of rates
+        seed (int): Random seed
+
+    Returns:
+        dict: Body with 'base' and 'rates'
+    """
+    rng = np.random.default_rng(seed)
+    rates = rng.random(currencies) * 1000
+
+    return {
+        "disclaimer": "Usage subject to terms: https://openexchangerates.org/terms",
+        "license": "https://openexchangerates.org/license",
+        "timestamp": 1700000000,
+        "base": "USD",
+        "rates": {currency_code(i): rate for i, rate in enumerate(rates.tolist())},
+    }
+
+
+def currency_csv(countries: int, entities: int, currencies: int, seed: int = 0) -> bytes:
+    """datahub.io currency-codes CSV: one row for every World Bank country
+    (in ISO 4217 spelling) plus entities the World Bank doesn't report
+
+    Args:
+        countries (int): World Bank countries, see country_names
+        entities (int): Total number of rows
+        currencies (int): Number of distinct currencies
+        seed (int): Random seed
+
+    Returns:
+        bytes: CSV body
+    """
+    rng = np.random.default_rng(seed)
+    lines = ["Entity,Currency,AlphabeticCode,NumericCode,MinorUnit,WithdrawalDate"]
+    names = country_names(countries) + [
+        f"Territory {i:03d}" for i in range(max(0, entities - countries))
+    ]
+    for i, currency in enumerate(rng.integers(0, currencies, len(names)).tolist()):
+        lines.append(
+            f'"{names[i]}",Currency {currency},{currency_code(currency)},{currency % 1000},2,'
+        )
+
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -1,5 +1,9 @@
+import time
+
+# Measured from the first line so the import of the whole stack is included
+_import_start = time.perf_counter()
+
 import logging.config
-import os
 
 from flask import Flask
 
@@ -8,21 +12,35 @@ app = Flask(__name__)
 import flaskr.definitions as constants
 from flaskr.config import DevelopmentConfig
 from flaskr.web import bp_web
+from flaskr.api import bp_api
+from flaskr.metrics import STARTUP_SECONDS, init_request_metrics
+from flaskr.log_handlers import start_queue_logging
 
 blue_prints = [
     bp_web,
+    bp_api,
 ]
 # Registering the blueprints
-app.register_blueprint(bp_web)
+for blue_print in blue_prints:
+    app.register_blueprint(blue_print)
+
+# Registering the `flask snapshots` and `flask runs` commands
+import flaskr.snapshots
+import flaskr.run_ledger
+
+# Timing every request for the /metrics endpoint
+init_request_metrics(app)
 
 # Configuring the Flask App
 app.config.from_object(DevelopmentConfig)
 
-# Configuring logger
-if not os.path.exists(constants.LOG_TODAY_DIR):
-    os.makedirs(constants.LOG_TODAY_DIR)
-
+# Configuring logger; the configured handlers write from a background thread
 logging.config.dictConfig(app.config["LOGGING"])
-
-from flaskr.initialize import app_startup
-app.before_first_request(app_startup)
+start_queue_logging()
+
+# The data warm-up and refresh trigger run from the serving entry point
+# (flaskr.main, skipped by every `flask` command but `run`) so CLI commands
+# and Celery workers don't start them
+_import_seconds = time.perf_counter() - _import_start
+STARTUP_SECONDS.set(_import_seconds, phase="import")
+app.logger.info("Flask app imported in %.3fs", _import_seconds)
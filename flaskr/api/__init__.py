@@ -0,0 +1,3 @@
+from .routes import bp_api
+
+# Added Blueprint to package level
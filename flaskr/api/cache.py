@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flaskr import definitions as constants
+from flaskr.metrics import registry
+
+
+CACHE_LOOKUPS = registry.counter(
+    "wagescale_conversion_cache_lookups_total",
+    "Conversion cache lookups by result",
+    ("result",),
+)
+
+
+class ConversionCache:
+    """Bounded LRU cache of conversion results with a TTL; callers put the
+    data generation in the key so a refresh invalidates every older entry.
+    A single lock guards the map, so it's safe under threaded WSGI servers."""
+
+    def __init__(
+        self,
+        maxsize: int = constants.CONVERSION_CACHE_SIZE,
+        ttl: float = constants.CONVERSION_CACHE_TTL,
+    ) -> None:
+        """Constructor
+
+        Args:
+            maxsize (int): Most entries kept, least recently used go first
+            ttl (float): Seconds an entry stays valid
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> tuple:
+        """Looks a key up, refreshing its recency on a hit
+
+        Args:
+            key (tuple): Cache key
+
+        Returns:
+            tuple: (True, value) on a hit, (False, None) on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                hit = False
+
+        CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+        return (True, entry[1]) if hit else (False, None)
+
+    def put(self, key: tuple, value) -> None:
+        """Stores a value, evicting the least recently used entries if full
+
+        Args:
+            key (tuple): Cache key
+            value: Value to be cached
+        """
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and size
+
+        Returns:
+            dict: 'hits', 'misses', 'size' and 'maxsize'
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
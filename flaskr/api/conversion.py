@@ -0,0 +1,864 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.api.cache import ConversionCache
+from flaskr.api.resolution import CountryResolver
+from flaskr.data import get_storage, load_pair_matrices, read_generation
+
+
+class ConversionError(ValueError):
+    """Raised when a salary value can't be converted"""
+
+
+class PPPSeries:
+    """PPP time series sorted by country then year; (country, year) pairs are
+    packed into one sorted int64 key so as-of lookups for a whole batch are a
+    single vectorized binary search"""
+
+    # Keys are series id * YEAR_STRIDE + year, so every year must lie within
+    # [PPP_MIN_YEAR, PPP_MAX_YEAR] for a series' keys not to run into the next
+    YEAR_STRIDE = 10000
+
+    def __init__(self, countries: np.ndarray, dates: np.ndarray, values: np.ndarray) -> None:
+        """Constructor
+
+        Args:
+            countries (np.ndarray): Country of every observation, sorted
+            dates (np.ndarray): Year of every observation, sorted within a country
+            values (np.ndarray): PPP conversion factor of every observation
+
+        Raises:
+            ValueError: If a year is outside [PPP_MIN_YEAR, PPP_MAX_YEAR]
+        """
+        countries = np.asarray(countries, dtype=object)
+        starts = np.ones(len(countries), dtype=bool)
+        starts[1:] = countries[1:] != countries[:-1]
+
+        self.ids = np.cumsum(starts) - 1
+        self.country_index = {
+            country: series_id for series_id, country in enumerate(countries[starts].tolist())
+        }
+        self.years = np.asarray(dates, dtype=np.int64)
+        if not _years_in_range(self.years).all():
+            raise ValueError(
+                f"PPP series years must lie within {constants.PPP_MIN_YEAR}"
+                f"-{constants.PPP_MAX_YEAR}"
+            )
+        self.values = np.asarray(values, dtype="float64")
+        self.keys = self.ids * self.YEAR_STRIDE + self.years
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def as_of(self, series_ids: np.ndarray, years: np.ndarray) -> np.ndarray:
+        """PPP factor of every (country, year) pair as of that year: the
+        observation of that year or else the last one before it
+
+        Args:
+            series_ids (np.ndarray): Series id of every row, -1 for none
+            years (np.ndarray): Requested year of every row
+
+        Returns:
+            np.ndarray: PPP factor of every row, NaN if nothing is available
+                        or the year is out of range
+        """
+        series_ids = np.asarray(series_ids, dtype=np.int64)
+        years = np.asarray(years, dtype=np.int64)
+        in_range = _years_in_range(years)
+        # Out of range years would land in a neighbouring series' keys
+        queries = series_ids * self.YEAR_STRIDE + np.where(in_range, years, 0)
+
+        positions = np.searchsorted(self.keys, queries, side="right") - 1
+        safe_positions = np.clip(positions, 0, None)
+        found = (series_ids >= 0) & (positions >= 0) & in_range
+        if len(self.keys) == 0:
+            found[:] = False
+        else:
+            found &= self.ids[safe_positions] == series_ids
+
+        factors = np.full(len(queries), np.nan)
+        factors[found] = self.values[safe_positions[found]]
+
+        return factors
+
+
+class ConversionTable:
+    """Immutable snapshot of the final merged data laid out as NumPy arrays
+    with a country/currency index for O(1) lookups"""
+
+    def __init__(
+        self,
+        countries: np.ndarray,
+        codes: np.ndarray,
+        ppp_values: np.ndarray,
+        exch_rates: np.ndarray,
+        mtime: float = 0.0,
+        digest: str = "",
+        series: PPPSeries = None,
+        pair_matrices: tuple = None,
+        aliases: dict = None,
+        generation: int = 0,
+    ) -> None:
+        """Constructor
+
+        Args:
+            countries (np.ndarray): Upper-cased country names
+            codes (np.ndarray): Alphabetic currency code of every country
+            ppp_values (np.ndarray): PPP conversion factor of every country
+            exch_rates (np.ndarray): USD based exchange rate of every country
+            mtime (float): Modification time of the file the table was read from
+            digest (str): SHA-256 of the data the table was read from
+            series (PPPSeries): PPP time series of the countries, if available
+            pair_matrices (tuple): (modes, (modes, N, N) array) of precomputed
+                                   pair multipliers in row order, if available
+            aliases (dict): Normalized alias -> country from the resolution index
+            generation (int): Generation number of the data
+        """
+        self.countries = countries
+        self.codes = codes
+        self.factors = {
+            "ppp": ppp_values,
+            "exchange": exch_rates,
+        }
+        self.mtime = mtime
+        self.digest = digest
+        self.generation = generation
+
+        # Country -> row position; first row wins for a currency code
+        self.country_index = {country: pos for pos, country in enumerate(countries)}
+        self.code_index = {}
+        for pos, code in enumerate(codes):
+            self.code_index.setdefault(code, pos)
+        self.resolver = CountryResolver(countries=countries.tolist(), aliases=aliases)
+
+        # Row position -> series id, -1 for countries without a series
+        self.series = series
+        self.row_series = np.fromiter(
+            (series.country_index.get(country, -1) if series else -1 for country in countries),
+            dtype=np.int64,
+            count=len(countries),
+        )
+
+        # Mode -> matrix of from x to multipliers
+        self.pair_matrices = {}
+        if pair_matrices is not None:
+            modes, matrices = pair_matrices
+            self.pair_matrices = {mode: matrices[pos] for pos, mode in enumerate(modes)}
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: dict,
+        mtime: float = 0.0,
+        digest: str = "",
+        series_columns: dict = None,
+        pair_matrices: tuple = None,
+        aliases: dict = None,
+        generation: int = 0,
+    ) -> "ConversionTable":
+        """Builds the table from the columns of the final merged data; memory
+        mapped float columns are used as they are, without a copy
+
+        Args:
+            columns (dict): Column name -> np.ndarray
+            mtime (float): Modification time of the source file
+            digest (str): SHA-256 of the source data
+            series_columns (dict): Columns of the merged PPP series, if any
+            pair_matrices (tuple): (modes, matrices) built from the same data, if any
+            aliases (dict): Normalized alias -> country, if any
+            generation (int): Generation number of the data
+
+        Returns:
+            ConversionTable: Table built from the data
+        """
+        series = None
+        if series_columns is not None:
+            series = PPPSeries(
+                countries=series_columns["Country"],
+                dates=series_columns["Date"],
+                values=series_columns["Value"],
+            )
+
+        return cls(
+            countries=np.asarray(columns["Country"], dtype=object),
+            codes=np.asarray(columns["AlphabeticCode"], dtype=object),
+            ppp_values=np.asarray(columns["Value"], dtype="float64"),
+            exch_rates=np.asarray(columns["ExchangeRate"], dtype="float64"),
+            mtime=mtime,
+            digest=digest,
+            series=series,
+            pair_matrices=pair_matrices,
+            aliases=aliases,
+            generation=generation,
+        )
+
+    def resolve(self, key: str) -> int:
+        """Resolves a country name or currency code to its row position
+
+        Args:
+            key (str): Country name or alphabetic currency code
+
+        Raises:
+            ConversionError: If the key is unknown
+
+        Returns:
+            int: Row position in the table
+        """
+        pos = self._lookup(key)
+        if pos < 0:
+            raise ConversionError(f"Unknown country or currency: {key}")
+
+        return pos
+
+    def _lookup(self, key: str) -> int:
+        """Looks up a key without raising, -1 if it's unknown; exact names and
+        currency codes are tried before the alias map"""
+        normalized = str(key).strip().upper()
+        pos = self.country_index.get(normalized, self.code_index.get(normalized))
+        if pos is None:
+            country = self.resolver.resolve(normalized)
+            pos = -1 if country is None else self.country_index[country]
+
+        return pos
+
+    def suggest(self, prefix: str, limit: int = None) -> list:
+        """Type-ahead suggestions for a partially typed country name
+
+        Args:
+            prefix (str): What the user typed so far
+            limit (int): Most suggestions returned
+
+        Returns:
+            list: {"country", "code"} dicts, best first
+        """
+        return [
+            {"country": country, "code": self.codes[self.country_index[country]]}
+            for country in self.resolver.suggest(prefix, limit)
+        ]
+
+    def resolve_many(self, keys, size: int = None) -> np.ndarray:
+        """Resolves many country names or currency codes in one go; every
+        distinct key is looked up once and mapped back to all of its rows
+
+        Args:
+            keys: Sequence of country names or currency codes, or a single
+                  key shared by all rows
+            size (int): Number of rows when a single key is given
+
+        Returns:
+            np.ndarray: Row position of every key, -1 for unknown keys
+        """
+        if isinstance(keys, str):
+            return np.full(size or 0, self._lookup(keys), dtype=np.int64)
+
+        keys = np.asarray(keys, dtype=str).reshape(-1)
+        if keys.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        lookup = np.fromiter(
+            (self._lookup(key) for key in unique_keys.tolist()),
+            dtype=np.int64,
+            count=len(unique_keys),
+        )
+
+        return lookup[inverse.reshape(-1)]
+
+    def ppp_as_of(self, rows: np.ndarray, years: np.ndarray) -> np.ndarray:
+        """PPP factor of table rows as of the given years
+
+        Args:
+            rows (np.ndarray): Row positions
+            years (np.ndarray): Requested year of every row
+
+        Raises:
+            ConversionError: If no PPP series is loaded
+
+        Returns:
+            np.ndarray: PPP factor of every row, NaN if nothing is available
+        """
+        if self.series is None:
+            raise ConversionError("PPP time series is not available yet")
+
+        return self.series.as_of(self.row_series[rows], years)
+
+    def pair_multipliers(self, mode: str, src, dst):
+        """Multipliers converting amounts between table rows: a read from the
+        precomputed pair matrix when available, else factor[dst] / factor[src]
+
+        Args:
+            mode (str): One of constants.CONVERSION_MODES
+            src: Source row position(s)
+            dst: Target row position(s)
+
+        Raises:
+            ConversionError: If the mode is unknown
+
+        Returns:
+            float | np.ndarray: Multiplier of every (src, dst) pair
+        """
+        factor = self.factor(mode)
+        matrix = self.pair_matrices.get(mode)
+        if matrix is not None:
+            return matrix[src, dst]
+
+        return factor[dst] / factor[src]
+
+    def factor(self, mode: str) -> np.ndarray:
+        """Returns the per-country conversion factors for a mode
+
+        Args:
+            mode (str): One of constants.CONVERSION_MODES
+
+        Raises:
+            ConversionError: If the mode is unknown
+
+        Returns:
+            np.ndarray: Conversion factor of every country
+        """
+        try:
+            return self.factors[mode]
+        except KeyError:
+            raise ConversionError(f"Unknown conversion mode: {mode}") from None
+
+
+class ConversionEngine:
+    """Process-local salary conversion engine over the final merged data; it
+    watches the data file and swaps in a fresh table in the background so
+    request handlers only ever read from memory; single conversions go through
+    a result cache keyed on the data generation. When the data is published as
+    snapshots, every table read checks the `current` symlink (one readlink)
+    and swaps to a newly published or rolled back generation right away."""
+
+    def __init__(
+        self,
+        data_path: str = None,
+        poll_interval: float = constants.CONVERSION_RELOAD_INTERVAL,
+    ) -> None:
+        """Constructor
+
+        Args:
+            data_path (str): Path of the final merged data file
+            poll_interval (float): Seconds between checks of the data file
+        """
+        self.storage = get_storage()
+        self.data_path = self.storage.path_for(
+            data_path
+            or os.path.join(
+                constants.GENERATED_DATA_PATH,
+                constants.FINAL_MERGED_DATA_FILE_NAME,
+            )
+        )
+        # The `current` snapshot symlink when the data lives in snapshots
+        self.data_dir = os.path.dirname(self.data_path)
+        self._set_directory(self.data_dir)
+        self.poll_interval = poll_interval
+
+        self.cache = ConversionCache()
+
+        self._table = None
+        self._stat_key = None
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+
+    @property
+    def table(self) -> ConversionTable:
+        """Currently loaded table
+
+        Raises:
+            ConversionError: If no data has been loaded yet
+
+        Returns:
+            ConversionTable: Loaded table
+        """
+        self._check_snapshot()
+        table = self._table
+        if table is None:
+            raise ConversionError("Conversion data is not available yet")
+
+        return table
+
+    def _set_directory(self, directory: str) -> None:
+        """Points the data file paths at a directory"""
+        self.data_path = os.path.join(directory, os.path.basename(self.data_path))
+        self.series_path = self.storage.path_for(
+            os.path.join(directory, constants.FINAL_MERGED_SERIES_FILE_NAME)
+        )
+        self.pair_matrices_path = os.path.join(directory, constants.PAIR_MATRICES_FILE_NAME)
+        self.pair_matrices_index_path = os.path.join(
+            directory, constants.PAIR_MATRICES_INDEX_FILE_NAME
+        )
+        self.resolution_index_path = os.path.join(
+            directory, constants.RESOLUTION_INDEX_FILE_NAME
+        )
+        self.generation_path = os.path.join(directory, constants.GENERATION_FILE_NAME)
+
+    def _check_snapshot(self) -> None:
+        """Reloads right away if the `current` symlink moved; a reader that
+        finds a reload in progress keeps serving the loaded table"""
+        try:
+            snapshot = os.readlink(self.data_dir)
+        except OSError:
+            # Not a snapshot layout (or nothing published yet), the watcher polls
+            return
+
+        if snapshot != self._snapshot and self._reload_lock.acquire(blocking=False):
+            try:
+                self._reload()
+            except Exception as e:
+                app.logger.error("Conversion data reload failed: %s", str(e))
+            finally:
+                self._reload_lock.release()
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the table if the data (series, pair matrices, resolution
+        index or generation) files' mtime and content hash changed
+
+        Returns:
+            bool: True if a new table was swapped in else False
+        """
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self) -> bool:
+        """Does the work of reload_if_changed, the reload lock held; the
+        symlink is resolved once and every file read from that snapshot, so a
+        flip in the middle can't mix two generations
+
+        Returns:
+            bool: True if a new table was swapped in else False
+        """
+        # Only recorded once the snapshot is loaded (or found unchanged), so a
+        # failed load is retried by the next reader instead of the next flip
+        snapshot = _readlink(self.data_dir)
+        directory = self.data_dir
+        if snapshot is not None:
+            directory = os.path.join(os.path.dirname(self.data_dir), snapshot)
+        self._set_directory(directory)
+        try:
+            stat = os.stat(self.data_path)
+        except FileNotFoundError:
+            self._snapshot = snapshot
+            return False
+
+        has_series = os.path.exists(self.series_path)
+        stat_key = (directory, stat.st_mtime_ns, stat.st_size)
+        for path in (
+            self.series_path,
+            self.pair_matrices_index_path,
+            self.resolution_index_path,
+            self.generation_path,
+        ):
+            if os.path.exists(path):
+                other_stat = os.stat(path)
+                stat_key += (other_stat.st_mtime_ns, other_stat.st_size)
+        if stat_key == self._stat_key:
+            self._snapshot = snapshot
+            return False
+
+        data_digest = self.storage.digest(self.data_path)
+        digest = data_digest
+        if has_series:
+            digest += ":" + self.storage.digest(self.series_path)
+        columns = self.storage.load_columns(self.data_path)
+        pair_matrices = self._load_pair_matrices(data_digest, columns["Country"])
+        if pair_matrices is not None:
+            digest += ":matrices"
+        aliases = self._load_aliases()
+        if aliases:
+            digest += ":" + hashlib.sha256(
+                json.dumps(aliases, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+        generation = read_generation(directory)
+        digest += f":generation-{generation}"
+        current = self._table
+        if current is not None and current.digest == digest:
+            self._stat_key = stat_key
+            self._snapshot = snapshot
+            return False
+
+        table = ConversionTable.from_columns(
+            columns=columns,
+            mtime=stat.st_mtime,
+            digest=digest,
+            series_columns=self.storage.load_columns(self.series_path) if has_series else None,
+            pair_matrices=pair_matrices,
+            aliases=aliases,
+            generation=generation,
+        )
+        # Single reference swap, readers never see a partially built table
+        self._table = table
+        self._stat_key = stat_key
+        self._snapshot = snapshot
+        # Keys carry the generation already; clearing just frees the memory
+        self.cache.clear()
+
+        app.logger.info(
+            "Conversion data generation %s loaded with %s countries from %s",
+            generation,
+            len(table),
+            self.data_path,
+        )
+        return True
+
+    def _load_pair_matrices(self, data_digest: str, countries: np.ndarray) -> tuple:
+        """Memory-maps the precomputed pair matrices if they were built from
+        the data being loaded
+
+        Args:
+            data_digest (str): Digest of the final merged data being loaded
+            countries (np.ndarray): Country column of that data
+
+        Returns:
+            tuple: (modes, matrices), or None if missing or stale
+        """
+        if not os.path.exists(self.pair_matrices_index_path):
+            return None
+
+        try:
+            index, matrices = load_pair_matrices(
+                self.pair_matrices_path, self.pair_matrices_index_path
+            )
+        except (OSError, ValueError) as e:
+            app.logger.warning("Ignoring unreadable pair matrices: %s", str(e))
+            return None
+
+        size = len(countries)
+        if (
+            index.get("source_digest") != data_digest
+            or index.get("countries") != list(countries)
+            or matrices.shape != (len(index.get("modes", [])), size, size)
+        ):
+            app.logger.info("Pair matrices are stale, converting from per-country factors")
+            return None
+
+        return index["modes"], matrices
+
+    def _load_aliases(self) -> dict:
+        """Loads the resolution index saved at generation time
+
+        Returns:
+            dict: Normalized alias -> country, empty if missing or unreadable
+        """
+        try:
+            return CountryResolver.load_index(self.resolution_index_path)
+        except (OSError, ValueError) as e:
+            app.logger.warning("Ignoring unreadable resolution index: %s", str(e))
+            return {}
+
+    def _watch(self) -> None:
+        """Background loop checking the data file for changes"""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                app.logger.error("Conversion data reload failed: %s", str(e))
+
+    def start(self) -> None:
+        """Loads the data (if present) and starts the background watcher"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        try:
+            self.reload_if_changed()
+        except Exception as e:
+            app.logger.error("Conversion data load failed: %s", str(e))
+
+        self._stop_event.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            name="conversion-data-watcher",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop(self) -> None:
+        """Stops the background watcher"""
+        self._stop_event.set()
+
+    def convert(
+        self,
+        amount: float,
+        from_country: str,
+        to_country: str,
+        mode: str = "ppp",
+        year: int = None,
+    ) -> float:
+        """Converts a salary value from one country to another; results are
+        cached per (generation, amount, from, to, mode, year)
+
+        Args:
+            amount (float): Salary in the source country's currency
+            from_country (str): Source country name or currency code
+            to_country (str): Target country name or currency code
+            mode (str): 'ppp' for PPP adjusted or 'exchange' for plain
+                        exchange rate conversion
+            year (int): Use PPP factors as of this year ('ppp' mode only)
+
+        Raises:
+            ConversionError: If the amount is invalid, the data, countries,
+                             mode or year are unavailable, or the result
+                             overflows
+
+        Returns:
+            float: Salary in the target country's currency
+        """
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            raise ConversionError(f"Invalid amount: {amount}") from None
+        # nan/inf would convert to nan/inf and fill the cache with junk keys
+        if not np.isfinite(amount):
+            raise ConversionError(f"Invalid amount: {amount}")
+
+        table = self.table
+        key = (
+            table.generation,
+            amount,
+            str(from_country).strip().upper(),
+            str(to_country).strip().upper(),
+            mode,
+            None if year is None else int(year),
+        )
+        hit, result = self.cache.get(key)
+        if hit:
+            return result
+
+        result = self._convert(table, amount, from_country, to_country, mode, year)
+        # e.g. an amount near the float maximum times a large factor
+        if not np.isfinite(result):
+            raise ConversionError(f"Conversion result out of range for amount: {amount}")
+        self.cache.put(key, result)
+
+        return result
+
+    def _convert(
+        self,
+        table: ConversionTable,
+        amount: float,
+        from_country: str,
+        to_country: str,
+        mode: str,
+        year: int,
+    ) -> float:
+        """Uncached conversion against one table, see convert"""
+        table.factor(mode)
+        src = table.resolve(from_country)
+        dst = table.resolve(to_country)
+
+        if year is None:
+            return amount * float(table.pair_multipliers(mode, src, dst))
+
+        _check_year_mode(mode)
+        if not _years_in_range(int(year)):
+            raise ConversionError(f"Invalid year: {year}")
+        src_factor, dst_factor = table.ppp_as_of(
+            rows=np.array([src, dst]), years=np.array([int(year), int(year)])
+        )
+        if np.isnan(src_factor) or np.isnan(dst_factor):
+            raise ConversionError(f"No PPP data available as of {year}")
+
+        with np.errstate(over="ignore"):
+            return float(amount / src_factor * dst_factor)
+
+    def convert_batch(
+        self,
+        amounts,
+        from_countries,
+        to_countries,
+        mode: str = "ppp",
+        years=None,
+    ) -> tuple:
+        """Converts many salary values with a single NumPy broadcast; rows that
+        can't be converted are reported instead of aborting the batch
+
+        Args:
+            amounts: Sequence of salaries in the source countries' currencies
+            from_countries: Source country/currency per row, or one for all rows
+            to_countries: Target country/currency per row, or one for all rows
+            mode (str): 'ppp' or 'exchange'
+            years: PPP year per row, or one for all rows ('ppp' mode only);
+                   None uses the latest PPP factors
+
+        Raises:
+            ConversionError: If the data or mode are unavailable or the inputs
+                             don't line up
+
+        Returns:
+            tuple: (np.ndarray of converted values with NaN for failed rows,
+                    list of {"index", "message"} dicts for the failed rows)
+        """
+        table = self.table
+        table.factor(mode)
+
+        values, bad_amount = _to_float_array(amounts)
+        size = len(values)
+        src = table.resolve_many(_check_keys(from_countries, size, "from"), size)
+        dst = table.resolve_many(_check_keys(to_countries, size, "to"), size)
+
+        bad_src = src < 0
+        bad_dst = dst < 0
+        resolved = ~(bad_src | bad_dst)
+        src_rows = np.where(bad_src, 0, src)
+        dst_rows = np.where(bad_dst, 0, dst)
+
+        if years is None:
+            bad_year = np.zeros(size, dtype=bool)
+            multipliers = table.pair_multipliers(mode, src_rows, dst_rows)
+        else:
+            _check_year_mode(mode)
+            year_values, bad_year = _to_float_array(
+                years if not np.isscalar(years) else np.full(size, years)
+            )
+            _check_keys(year_values, size, "years")
+            bad_year |= year_values != np.round(year_values)
+            bad_year |= ~_years_in_range(np.where(bad_year, 0, year_values))
+            year_values = np.where(bad_year, 0, year_values).astype(np.int64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                multipliers = table.ppp_as_of(dst_rows, year_values) / table.ppp_as_of(
+                    src_rows, year_values
+                )
+
+        no_factor = resolved & ~bad_year & ~np.isfinite(multipliers)
+        valid = ~(bad_amount | bad_src | bad_dst | bad_year | no_factor)
+
+        results = np.full(size, np.nan)
+        with np.errstate(over="ignore"):
+            results[valid] = values[valid] * multipliers[valid]
+        overflow = valid & ~np.isfinite(results)
+        valid &= ~overflow
+
+        errors = []
+        for index in np.flatnonzero(~valid).tolist():
+            if bad_amount[index]:
+                message = "Invalid amount"
+            elif bad_src[index]:
+                message = "Unknown source country or currency"
+            elif bad_dst[index]:
+                message = "Unknown target country or currency"
+            elif bad_year[index]:
+                message = "Invalid year"
+            elif overflow[index]:
+                message = "Conversion result out of range"
+            elif years is None:
+                message = "No conversion factor available"
+            else:
+                message = "No PPP data available as of the requested year"
+            errors.append({"index": index, "message": message})
+
+        return results, errors
+
+
+def _readlink(path: str):
+    try:
+        return os.readlink(path)
+    except OSError:
+        return None
+
+
+def _to_float_array(values) -> tuple:
+    """Converts amounts to a float array, flagging the ones which aren't
+    numbers; a nested list is an invalid entry, not more rows
+
+    Args:
+        values: Sequence of amounts
+
+    Returns:
+        tuple: (np.ndarray of amounts, np.ndarray mask of invalid amounts)
+    """
+    try:
+        array = np.asarray(values, dtype="float64")
+    except (TypeError, ValueError):
+        array = None
+
+    if array is None or array.ndim > 1:
+        array = np.empty(len(values), dtype="float64")
+        for index, value in enumerate(values):
+            try:
+                array[index] = float(value)
+            except (TypeError, ValueError):
+                array[index] = np.nan
+
+    array = array.reshape(-1)
+
+    return array, ~np.isfinite(array)
+
+
+def _years_in_range(years):
+    """Mask of the years within [PPP_MIN_YEAR, PPP_MAX_YEAR]
+
+    Args:
+        years: Year or np.ndarray of years
+
+    Returns:
+        bool | np.ndarray: True where the year is in range
+    """
+    return (years >= constants.PPP_MIN_YEAR) & (years <= constants.PPP_MAX_YEAR)
+
+
+def _check_year_mode(mode: str) -> None:
+    """As-of-year conversions only exist for PPP factors; exchange rates are
+    kept for the latest date only
+
+    Args:
+        mode (str): Requested conversion mode
+
+    Raises:
+        ConversionError: If the mode isn't 'ppp'
+    """
+    if mode != "ppp":
+        raise ConversionError("A year can only be given for 'ppp' conversions")
+
+
+def _check_keys(keys, size: int, name: str):
+    """Checks that per-row country/currency keys line up with the amounts
+
+    Args:
+        keys: A single key or a sequence of keys
+        size (int): Number of rows in the batch
+        name (str): Name of the input, used in error messages
+
+    Raises:
+        ConversionError: If a sequence doesn't match the batch size
+
+    Returns:
+        The keys unchanged
+    """
+    if not isinstance(keys, str) and len(keys) != size:
+        raise ConversionError(
+            f"'{name}' has {len(keys)} entries but {size} amounts were given"
+        )
+
+    return keys
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_conversion_engine() -> ConversionEngine:
+    """Returns the process wide conversion engine, starting it on first use
+
+    Returns:
+        ConversionEngine: Shared engine
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = ConversionEngine()
+                engine.start()
+                _engine = engine
+
+    return _engine
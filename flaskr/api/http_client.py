@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from flaskr import definitions as constants
+from flaskr.metrics import FETCH_BYTES, FETCH_REQUESTS, FETCH_SECONDS
+
+
+class FetchClient:
+    """Pooled, keep-alive HTTP client shared by all the upstream fetchers so a
+    refresh cycle pays one TCP+TLS handshake per host instead of one per attempt"""
+
+    def __init__(
+        self,
+        connect_timeout: float = constants.HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = constants.HTTP_READ_TIMEOUT,
+        pool_maxsize: int = constants.HTTP_POOL_MAXSIZE,
+        max_per_host: int = constants.HTTP_MAX_CONCURRENCY_PER_HOST,
+    ) -> None:
+        """Constructor
+
+        Args:
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait between bytes of the response
+            pool_maxsize (int): Connections kept alive per host
+            max_per_host (int): Requests allowed in flight per host
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_per_host = max_per_host
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_maxsize,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            }
+        )
+
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        """Returns the semaphore limiting concurrent requests to a host
+
+        Args:
+            host (str): Network location of the request
+
+        Returns:
+            threading.BoundedSemaphore: Semaphore of the host
+        """
+        with self._host_limits_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.max_per_host)
+                self._host_limits[host] = limit
+
+        return limit
+
+    def get(
+        self,
+        url: str,
+        params: dict = None,
+        headers: dict = None,
+    ) -> requests.Response:
+        """Sends a GET request over the pooled session; gzip/deflate encoded
+        bodies are decoded transparently
+
+        Args:
+            url (str): URL to request
+            params (dict): Query parameters
+            headers (dict): Extra request headers
+
+        Returns:
+            requests.Response: Response with its body already read
+        """
+        host = urlsplit(url).netloc
+        status = "error"
+        start = time.perf_counter()
+        try:
+            with self._host_limit(host):
+                response = self.session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            status = response.status_code
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - start, host=host, status=status)
+            FETCH_REQUESTS.inc(host=host, status=status)
+
+        FETCH_BYTES.inc(len(response.content), host=host)
+        return response
+
+    def close(self) -> None:
+        """Closes the pooled connections"""
+        self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_fetch_client() -> FetchClient:
+    """Returns the process wide fetch client; a forked worker process gets its
+    own client instead of sharing the parent's sockets
+
+    Returns:
+        FetchClient: Shared client
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = FetchClient()
+                _client_pid = pid
+
+    return _client
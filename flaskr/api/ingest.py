@@ -0,0 +1,175 @@
+import math
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.api.http_client import get_fetch_client
+
+
+class PPPColumns:
+    """Columnar buffers World Bank indicator records are parsed into page by
+    page; country names are dictionary encoded so repeated names cost 4 bytes"""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.country_names = []
+        # ISO 3166 alpha-2 and alpha-3 codes of every country name
+        self.country_iso2 = []
+        self.country_iso3 = []
+        self._country_index = {}
+        self.country_codes = array("i")
+        self.dates = array("i")
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def extend(self, records: list) -> None:
+        """Appends the records of one page, one column at a time
+
+        Args:
+            records (list): Records as decoded from the World Bank JSON
+        """
+        if not records:
+            return
+
+        index = self._country_index
+        names = [record["country"]["value"] for record in records]
+        try:
+            codes = list(map(index.__getitem__, names))
+        except KeyError:
+            # New countries on this page; known ones keep their codes
+            for name, record in zip(names, records):
+                if name not in index:
+                    index[name] = len(index)
+                    self.country_names.append(name)
+                    self.country_iso2.append(record["country"].get("id") or "")
+                    self.country_iso3.append(record.get("countryiso3code") or "")
+            codes = list(map(index.__getitem__, names))
+        self.country_codes.extend(codes)
+
+        dates = np.array([record["date"] for record in records], dtype=np.int32)
+        # None (missing observation) becomes NaN
+        values = np.array([record["value"] for record in records], dtype=np.float64)
+        self.dates.frombytes(dates.tobytes())
+        self.values.frombytes(values.tobytes())
+
+    def encoded(self) -> dict:
+        """Exposes the buffers as NumPy arrays without copying them; the buffers
+        can't be extended while the arrays are alive
+
+        Returns:
+            dict: 'country_names', 'country_iso2' and 'country_iso3' (lists),
+                  'country_codes' (int32 codes into country_names), 'dates'
+                  (int32) and 'values' (float64)
+        """
+        return {
+            "country_names": self.country_names,
+            "country_iso2": self.country_iso2,
+            "country_iso3": self.country_iso3,
+            "country_codes": np.frombuffer(self.country_codes, dtype=np.int32),
+            "dates": np.frombuffer(self.dates, dtype=np.int32),
+            "values": np.frombuffer(self.values, dtype=np.float64),
+        }
+
+
+class WorldBankIngester:
+    """Streams a World Bank indicator: follows the 'pages' metadata of the
+    first page, fetches the remaining pages concurrently and parses each page
+    into PPPColumns as soon as it arrives, so only a few pages of raw JSON are
+    ever held in memory"""
+
+    def __init__(
+        self,
+        url: str,
+        params: dict,
+        per_page: int = constants.WORLD_BANK_PER_PAGE,
+        max_workers: int = constants.WORLD_BANK_PAGE_WORKERS,
+    ) -> None:
+        """Constructor
+
+        Args:
+            url (str): Indicator endpoint
+            params (dict): Query parameters other than paging
+            per_page (int): Records requested per page
+            max_workers (int): Pages fetched concurrently
+        """
+        self.url = url
+        self.params = dict(params, format="json", per_page=per_page)
+        self.max_workers = max(1, max_workers)
+        # Response bytes of every page fetched so far
+        self.bytes_fetched = 0
+        self._bytes_lock = threading.Lock()
+
+    def _fetch_page(self, page: int, headers: dict = None) -> requests.Response:
+        response = get_fetch_client().get(
+            self.url,
+            params=dict(self.params, page=page),
+            headers=headers,
+        )
+        response.raise_for_status()
+        with self._bytes_lock:
+            self.bytes_fetched += len(response.content)
+
+        return response
+
+    def _page_records(self, page: int) -> list:
+        _, records = _split_page(self._fetch_page(page).json())
+        return records
+
+    def ingest(self, headers: dict = None) -> tuple:
+        """Fetches and parses every page of the indicator
+
+        Args:
+            headers (dict): Conditional request headers, sent with the first page
+
+        Returns:
+            tuple: (first page requests.Response, PPPColumns or None if the
+                    first page came back 304 Not Modified)
+        """
+        first_response = self._fetch_page(1, headers=headers)
+        if first_response.status_code == 304:
+            return first_response, None
+
+        meta, records = _split_page(first_response.json())
+        columns = PPPColumns()
+        columns.extend(records)
+        del records
+
+        pages = int(meta.get("pages") or 1)
+        app.logger.info(
+            "World Bank indicator has %s records over %s pages", meta.get("total"), pages
+        )
+
+        # Keeps at most max_workers pages in flight and consumes them in page
+        # order so the output doesn't depend on which request finished first
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = []
+            for page in range(2, pages + 1):
+                pending.append(pool.submit(self._page_records, page))
+                if len(pending) >= self.max_workers:
+                    columns.extend(pending.pop(0).result())
+            for future in pending:
+                columns.extend(future.result())
+
+        return first_response, columns
+
+
+def _split_page(data: list) -> tuple:
+    """Splits a World Bank response body into its metadata and records
+
+    Args:
+        data (list): Decoded [metadata, records] body
+
+    Returns:
+        tuple: (dict metadata, list records)
+    """
+    meta = data[0] if len(data) > 0 and isinstance(data[0], dict) else {}
+    records = data[1] if len(data) > 1 and data[1] else []
+
+    return meta, records
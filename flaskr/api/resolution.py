@@ -0,0 +1,297 @@
+"""
+Country name resolution: alias map between World Bank and ISO 4217 names,
+ISO codes and common user spellings, plus a prefix trie for type-ahead
+"""
+import json
+import os
+import re
+import unicodedata
+
+from flaskr import definitions as constants
+from flaskr.data.storage import _publish, _temp_path
+
+
+# World Bank country name -> ISO 4217 entity name, for the pairs that
+# normalization and qualifier stripping can't match on their own
+COUNTRY_ALIASES = {
+    "CONGO, DEM. REP.": "CONGO (THE DEMOCRATIC REPUBLIC OF THE)",
+    "CONGO, REP.": "CONGO (THE)",
+    "HONG KONG SAR, CHINA": "HONG KONG",
+    "KOREA, DEM. PEOPLE'S REP.": "KOREA (THE DEMOCRATIC PEOPLE'S REPUBLIC OF)",
+    "KOREA, REP.": "KOREA (THE REPUBLIC OF)",
+    "KYRGYZ REPUBLIC": "KYRGYZSTAN",
+    "LAO PDR": "LAO PEOPLE'S DEMOCRATIC REPUBLIC (THE)",
+    "MACAO SAR, CHINA": "MACAO",
+    "SLOVAK REPUBLIC": "SLOVAKIA",
+    "UNITED KINGDOM": "UNITED KINGDOM OF GREAT BRITAIN AND NORTHERN IRELAND (THE)",
+    "UNITED STATES": "UNITED STATES OF AMERICA (THE)",
+}
+
+# Common user spellings -> World Bank country name
+USER_ALIASES = {
+    "CZECH REPUBLIC": "CZECHIA",
+    "HONG KONG": "HONG KONG SAR, CHINA",
+    "IRAN": "IRAN, ISLAMIC REP.",
+    "LAOS": "LAO PDR",
+    "MACAU": "MACAO SAR, CHINA",
+    "NORTH KOREA": "KOREA, DEM. PEOPLE'S REP.",
+    "RUSSIA": "RUSSIAN FEDERATION",
+    "SOUTH KOREA": "KOREA, REP.",
+    "SYRIA": "SYRIAN ARAB REPUBLIC",
+    "TURKEY": "TURKIYE",
+    "UAE": "UNITED ARAB EMIRATES",
+    "UK": "UNITED KINGDOM",
+    "USA": "UNITED STATES",
+    "VIETNAM": "VIET NAM",
+}
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes a country name so spelling variants compare equal: accents,
+    punctuation, 'THE' and the 'ST.' abbreviation are dropped or expanded
+
+    Args:
+        name (str): Country name as published or entered
+
+    Returns:
+        str: Normalized name, e.g. "Bahamas, The" -> "BAHAMAS"
+    """
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.upper().replace("&", " AND ")
+    text = re.sub(r"['’`]", "", text)
+    text = re.sub(r"[^A-Z0-9]+", " ", text)
+
+    words = ["SAINT" if word == "ST" else word for word in text.split() if word != "THE"]
+    return " ".join(words)
+
+
+def base_name(name: str) -> str:
+    """Normalized name without its qualifiers: parenthesized parts and
+    everything after the first comma
+
+    Args:
+        name (str): Country name as published
+
+    Returns:
+        str: e.g. "Venezuela, RB" -> "VENEZUELA"
+    """
+    text = re.sub(r"\(.*?\)", " ", str(name)).split(",")[0]
+    return normalize_name(text)
+
+
+def match_entities(countries, entities) -> dict:
+    """Matches World Bank country names to ISO 4217 entity names: exact name,
+    then the alias table, then normalized name, then unambiguous base name
+
+    Args:
+        countries: Upper-cased World Bank country names
+        entities: Upper-cased ISO 4217 entity names
+
+    Returns:
+        dict: Country -> entity, for every country that matched
+    """
+    entities = [entity for entity in entities if isinstance(entity, str)]
+    exact = set(entities)
+    by_key = {}
+    by_base = {}
+    for entity in entities:
+        by_key.setdefault(normalize_name(entity), entity)
+        base = base_name(entity)
+        # Ambiguous bases (e.g. the two Congos) are left to the alias table
+        by_base[base] = None if by_base.get(base, entity) != entity else entity
+
+    aliases = {normalize_name(country): entity for country, entity in COUNTRY_ALIASES.items()}
+
+    matches = {}
+    for country in countries:
+        if country in exact:
+            matches[country] = country
+            continue
+
+        key = normalize_name(country)
+        alias = aliases.get(key)
+        entity = (
+            (alias if alias in exact else None)
+            or by_key.get(key)
+            or by_base.get(base_name(country))
+        )
+        if entity is not None:
+            matches[country] = entity
+
+    return matches
+
+
+def build_aliases(countries, entity_by_country: dict, codes_by_country: dict) -> dict:
+    """Alias map of the merged countries: their own names, ISO codes, matched
+    ISO 4217 entity names and the common user spellings
+
+    Args:
+        countries: Countries of the final merged data
+        entity_by_country (dict): Country -> matched ISO 4217 entity name
+        codes_by_country (dict): Country -> list of ISO country codes
+
+    Returns:
+        dict: Normalized alias -> country
+    """
+    countries = list(dict.fromkeys(countries))
+    aliases = {}
+
+    def add(alias: str, country: str) -> None:
+        key = normalize_name(alias)
+        if key:
+            aliases.setdefault(key, country)
+
+    # Full names first so they win over codes and bases of other countries
+    for country in countries:
+        add(country, country)
+        if country in entity_by_country:
+            add(entity_by_country[country], country)
+    for country in countries:
+        for code in codes_by_country.get(country, []):
+            add(code, country)
+    for alias, country in USER_ALIASES.items():
+        if country in countries:
+            add(alias, country)
+
+    bases = {}
+    for country in countries:
+        for name in (country, entity_by_country.get(country, country)):
+            base = base_name(name)
+            bases[base] = None if bases.get(base, country) != country else country
+    for base, country in bases.items():
+        if country is not None:
+            aliases.setdefault(base, country)
+
+    return aliases
+
+
+class PrefixTrie:
+    """Character trie over normalized aliases; every node keeps the first
+    few distinct countries below it so a completion is O(len(prefix))"""
+
+    __slots__ = ("children", "matches")
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.children = {}
+        self.matches = []
+
+    def insert(self, term: str, value: str, limit: int) -> None:
+        """Adds a term; values inserted earlier rank first
+
+        Args:
+            term (str): Normalized alias
+            value (str): Country the alias resolves to
+            limit (int): Most values kept per node
+        """
+        node = self
+        for char in term:
+            node = node.children.setdefault(char, PrefixTrie())
+            if len(node.matches) < limit and value not in node.matches:
+                node.matches.append(value)
+
+    def complete(self, prefix: str) -> list:
+        """Values of the terms starting with a prefix
+
+        Args:
+            prefix (str): Normalized prefix
+
+        Returns:
+            list: Matching values, best first
+        """
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        return list(node.matches)
+
+
+class CountryResolver:
+    """Resolves user-entered country names through the alias map and serves
+    prefix completions"""
+
+    def __init__(
+        self,
+        countries,
+        aliases: dict = None,
+        limit: int = constants.COUNTRY_SUGGEST_LIMIT,
+    ) -> None:
+        """Constructor
+
+        Args:
+            countries: Countries that can be resolved to
+            aliases (dict): Normalized alias -> country
+            limit (int): Most suggestions returned per prefix
+        """
+        countries = list(dict.fromkeys(countries))
+        known = set(countries)
+        self.aliases = {normalize_name(country): country for country in countries}
+        for alias, country in (aliases or {}).items():
+            if country in known:
+                self.aliases.setdefault(alias, country)
+
+        self.limit = limit
+        self.trie = PrefixTrie()
+        for country in sorted(countries):
+            self.trie.insert(normalize_name(country), country, limit)
+        for alias, country in sorted(self.aliases.items()):
+            self.trie.insert(alias, country, limit)
+
+    def resolve(self, name: str):
+        """Resolves a user-entered name
+
+        Args:
+            name (str): Country name, alias or ISO code
+
+        Returns:
+            str | None: Country, None if unknown
+        """
+        return self.aliases.get(normalize_name(name))
+
+    def suggest(self, prefix: str, limit: int = None) -> list:
+        """Countries whose name or alias starts with a prefix
+
+        Args:
+            prefix (str): What the user typed so far
+            limit (int): Most suggestions returned, capped at the trie's limit
+
+        Returns:
+            list: Countries, best first
+        """
+        key = normalize_name(prefix)
+        if not key:
+            return []
+
+        return self.trie.complete(key)[: limit or self.limit]
+
+    @staticmethod
+    def save_index(aliases: dict, path: str) -> None:
+        """Persists an alias map built at generation time
+
+        Args:
+            aliases (dict): Normalized alias -> country
+            path (str): Index file path
+        """
+        temp_path = _temp_path(path)
+        with open(temp_path, "w") as file:
+            json.dump({"aliases": aliases}, file)
+        _publish(temp_path, path)
+
+    @staticmethod
+    def load_index(path: str) -> dict:
+        """Loads a persisted alias map
+
+        Args:
+            path (str): Index file path
+
+        Returns:
+            dict: Normalized alias -> country, empty if missing
+        """
+        if not os.path.exists(path):
+            return {}
+
+        with open(path, "r") as file:
+            return json.load(file).get("aliases", {})
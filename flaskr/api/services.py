@@ -1,11 +1,23 @@
 import io
+import json
 import os
+import time
+import numpy as np
 import pandas as pd
 import requests
-from retrying import retry
 
 from flaskr import app
 from flaskr import definitions as constants
+from flaskr.api.http_client import get_fetch_client
+from flaskr.api.ingest import PPPColumns, WorldBankIngester
+from flaskr.api.resolution import CountryResolver, build_aliases, match_entities
+from flaskr.api.validators import DatasetValidators
+from flaskr.data import bump_generation, build_pair_matrices, get_storage, save_pair_matrices
+from flaskr.log_handlers import LazyPreview
+from flaskr.metrics import DATASET_ROWS, MERGE_SECONDS, STAGE_SECONDS
+from flaskr.refresh_policy import CallLedger
+from flaskr.retries import is_retryable
+from flaskr.snapshots import SnapshotStore, snapshot_name
 
 
 class PPPData:
@@ -16,9 +28,23 @@ class PPPData:
         if not os.path.exists(constants.FETCHED_DATA_PATH):
             os.makedirs(constants.FETCHED_DATA_PATH)
 
-        self.ppp_data_path = os.path.join(
-            constants.FETCHED_DATA_PATH, constants.PPP_FILE_NAME
+        self.storage = get_storage()
+        self.ppp_data_path = self.storage.path_for(
+            os.path.join(constants.FETCHED_DATA_PATH, constants.PPP_FILE_NAME)
         )
+        self.ppp_series_path = self.storage.path_for(
+            os.path.join(constants.FETCHED_DATA_PATH, constants.PPP_SERIES_FILE_NAME)
+        )
+        self.validators = DatasetValidators(self.ppp_data_path)
+        # Set when the latest fetch saved new data
+        self.changed = False
+        # Set when upstream answered the latest fetch (200 or 304)
+        self.fetched = False
+        # Network/5xx/429 error of the latest fetch, worth retrying later
+        self.upstream_error = None
+        # Response bytes and parsed rows of the latest fetch, for the run ledger
+        self.bytes_fetched = 0
+        self.rows_parsed = None
 
     def _get_ppp_data(self) -> bool:
         """Requests PPP data from Wold Bank API
@@ -30,106 +56,211 @@ class PPPData:
 
         app.logger.info("Fetching the PPP data from World Bank API: Started")
         try:
-            all_data = self._request_ppp_data()
-            if all_data is None:
+            series_exists = self.storage.exists(self.ppp_series_path)
+            response, all_data = self._request_ppp_data(
+                headers=self.validators.conditional_headers() if series_exists else {}
+            )
+            self.fetched = response.status_code == 304 or len(all_data) > 0
+            if response.status_code == 304:
+                app.logger.info("PPP data not modified upstream, skipping parse and save")
+                return True
+
+            if len(all_data) == 0:
                 app.logger.error("400 Bad Request: No ppp data recieved from api")
                 return False
         except Exception as e:
             app.logger.error(str(e))
+            if is_retryable(e):
+                self.upstream_error = str(e)
             return False
 
         app.logger.info("Data fetched successfully from World Bank API")
 
-        # Getting parsed and filtered data
-        parsed_df = self._parse_ppp_data(ppp_data=all_data)
-        parsed_df = parsed_df[["Country", "Date", "Value"]]
-        app.logger.info("Data parsed and filtered into a DataFrame")
+        # Getting parsed and filtered data: the full series and its latest year
+        with STAGE_SECONDS.time(dataset="ppp", stage="parse"):
+            series_df = self._parse_ppp_series(ppp_data=all_data)
+            parsed_df = self._latest_per_country(series_df=series_df)
+            parsed_df = parsed_df[["Country", "Date", "Value"]]
+        self.rows_parsed = series_df.shape[0]
+        app.logger.info(
+            "Data parsed and filtered into a DataFrame (%s observations, %s countries)",
+            series_df.shape[0],
+            parsed_df.shape[0],
+        )
 
-        # Saving the data as csv in data dir
-        self._save_ppp_data(parsed_ppp_data=parsed_df)
+        self.validators.update_from_response(response)
+        fingerprint = DatasetValidators.fingerprint(series_df)
+        if self.validators.is_unchanged(fingerprint) and series_exists:
+            self.validators.save()
+            app.logger.info("PPP data unchanged since the last fetch, skipping save")
+            return True
+
+        # Saving the data in data dir
+        with STAGE_SECONDS.time(dataset="ppp", stage="save"):
+            self.storage.save(series_df, self.ppp_series_path)
+            self._save_ppp_data(parsed_ppp_data=parsed_df)
+        DATASET_ROWS.set(parsed_df.shape[0], dataset="ppp")
+        DATASET_ROWS.set(series_df.shape[0], dataset="ppp_series")
+        self.validators.sha256 = fingerprint
+        self.validators.save()
+        self.changed = True
 
         app.logger.debug(
             "Top 10 data from the fetched PPP data = \n%s",
-            parsed_df.head(10).to_string(index=False),
+            LazyPreview(parsed_df),
         )
         app.logger.info("PPP data fetched, parsed and saved in data directory")
 
         return True
 
-    @retry(
-        stop_max_attempt_number=constants.REQUEST_TRY_COUNT,  # Maximum number of retries
-        wait_fixed=1000,  # Wait 1 second between retries
-        retry_on_exception=lambda exc: isinstance(
-            exc, requests.exceptions.RequestException
-        ),  # Retry on network-related exceptions
-    )
-    def _request_ppp_data(self) -> list:
-        """Requests the ppp data from world bank api endpoint
+    def _request_ppp_data(self, headers: dict = None) -> tuple:
+        """Requests the ppp data from world bank api endpoint, page by page
+
+        Args:
+            headers (dict): Conditional request headers
 
         Returns:
-            list: list containing required data
+            tuple: (first page requests.Response, PPPColumns with every record
+                    or None if the first page came back 304 Not Modified)
         """
         app.logger.info("Started Requesting the data from World Bank API Endpoint")
 
         url = "https://api.worldbank.org/v2/country/all/indicator/PA.NUS.PPP"
 
         params = {
-            "format": "json",
-            "per_page": 10000,  # Number of records per page
             "date": "2019:2022",
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
+        ingester = WorldBankIngester(url=url, params=params)
+        response, columns = ingester.ingest(headers=headers)
+        self.bytes_fetched = ingester.bytes_fetched
+
+        return response, columns
+
+    def _parse_ppp_series(self, ppp_data: PPPColumns) -> pd.DataFrame:
+        """Parse the fetched ppp data into the full time series: one row per
+        (country, year) with a value, sorted by country then year
+
+        Args:
+            ppp_data (PPPColumns): Columnar buffers with ppp data in them
+
+        Returns:
+            pd.DataFrame: ["Country", "Date", "Value", "ISO2", "ISO3"] series
+        """
+        columns = ppp_data.encoded()
+        codes = columns["country_codes"]
+        dates = columns["dates"].astype(np.int64)
+        values = columns["values"]
+
+        # Making the Country values all cap on the dictionary instead of every
+        # row; names that collide once upper-cased share a code
+        upper_index = {}
+        remap = np.fromiter(
+            (upper_index.setdefault(name.upper(), len(upper_index)) for name in columns["country_names"]),
+            dtype=np.int64,
+            count=len(columns["country_names"]),
+        )
+        upper_names = np.array(list(upper_index), dtype=object)
+        # ISO codes of the first spelling of every upper-cased name
+        first_spelling = np.unique(remap, return_index=True)[1]
+        iso2 = np.array(columns["country_iso2"], dtype=object)[first_spelling]
+        iso3 = np.array(columns["country_iso3"], dtype=object)[first_spelling]
+        name_order = np.argsort(upper_names, kind="stable")
+        ranks = np.empty(len(upper_names), dtype=np.int64)
+        ranks[name_order] = np.arange(len(upper_names))
+        country_ranks = ranks[remap[codes]]
+
+        # Discarding Nan data and implausible years, then one sort by (country,
+        # date, -position): the last row of every (country, date) run is its
+        # first observation
+        bad_dates = (dates < constants.PPP_MIN_YEAR) | (dates > constants.PPP_MAX_YEAR)
+        if bad_dates.any():
+            app.logger.warning(
+                "Dropping %s PPP records with a year outside %s-%s",
+                int(bad_dates.sum()),
+                constants.PPP_MIN_YEAR,
+                constants.PPP_MAX_YEAR,
+            )
+        kept = np.flatnonzero(~np.isnan(values) & ~bad_dates)
+        order = kept[self._sort_order(country_ranks[kept], dates[kept], kept, len(values))]
+        sorted_ranks = country_ranks[order]
+        sorted_dates = dates[order]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = (sorted_ranks[1:] != sorted_ranks[:-1]) | (
+            sorted_dates[1:] != sorted_dates[:-1]
+        )
+        observations = order[is_last]
+
+        observed_ranks = country_ranks[observations]
+        series_df = pd.DataFrame(
+            {
+                "Country": upper_names[name_order][observed_ranks],
+                "Date": dates[observations],
+                "Value": values[observations],
+                "ISO2": iso2[name_order][observed_ranks],
+                "ISO3": iso3[name_order][observed_ranks],
+            }
+        )
 
-        data = response.json()
-        all_data = data[1]
+        return series_df
 
-        return all_data if len(all_data) > 0 else None
+    def _latest_per_country(self, series_df: pd.DataFrame) -> pd.DataFrame:
+        """Keeps only the most recent year of every country of a sorted series
+
+        Args:
+            series_df (pd.DataFrame): Series from _parse_ppp_series
 
-    def _parse_ppp_data(self, ppp_data: list) -> pd.DataFrame:
+        Returns:
+            pd.DataFrame: One row per country, same columns as the series
+        """
+        countries = series_df["Country"].to_numpy()
+        is_last = np.ones(len(countries), dtype=bool)
+        is_last[:-1] = countries[1:] != countries[:-1]
+
+        return series_df.loc[is_last].reset_index(drop=True)
+
+    def _parse_ppp_data(self, ppp_data: PPPColumns) -> pd.DataFrame:
         """Parse the fetched ppp data into a pandas dataframe after filtering it
 
         Args:
-            ppp_data (list): List with ppp data in them
+            ppp_data (PPPColumns): Columnar buffers with ppp data in them
 
         Returns:
             pd.DataFrame: DataFrame containing parsed data as per requirement
         """
-        records = []
-
-        for record in ppp_data:
-            country = record["country"]["value"]
-            date = record["date"]
-            value = record["value"]
-            records.append([country, date, value])
+        return self._latest_per_country(self._parse_ppp_series(ppp_data=ppp_data))
 
-        parsed_df = pd.DataFrame(records, columns=["Country", "Date", "Value"])
-        parsed_df["Value"] = parsed_df["Value"].astype("float")
-        parsed_df["Date"] = parsed_df["Date"].astype("int")
+    @staticmethod
+    def _sort_order(ranks: np.ndarray, dates: np.ndarray, positions: np.ndarray, size: int) -> np.ndarray:
+        """Order sorting rows by (country rank, date, -position); the three keys
+        are packed into one int64 so a single argsort does it
 
-        # Discarding Nan data and keeping only one record for every country with most recent date/year
-        filter1_df = parsed_df.loc[parsed_df["Value"].notna()].copy()
+        Args:
+            ranks (np.ndarray): Country rank of every row
+            dates (np.ndarray): Year of every row
+            positions (np.ndarray): Original position of every row
+            size (int): Number of rows before filtering
 
-        # Making the Country column values all cap
-        filter1_df["Country"] = filter1_df["Country"].str.upper()
+        Returns:
+            np.ndarray: Indices into the given arrays in sorted order
+        """
+        if len(dates) == 0:
+            return np.empty(0, dtype=np.int64)
 
-        filter2_df = filter1_df.loc[
-            filter1_df.groupby(by="Country")["Date"].idxmax()
-        ].reset_index()
+        date_min = int(dates.min())
+        date_span = int(dates.max()) - date_min + 1
+        if (int(ranks.max()) + 1) * date_span * size >= 2**63:
+            return np.lexsort((-positions, dates, ranks))
 
-        return filter2_df
+        keys = (ranks * date_span + (dates - date_min)) * size + (size - 1 - positions)
+        return np.argsort(keys)
 
     def _save_ppp_data(self, parsed_ppp_data: pd.DataFrame) -> None:
-        """Saves the parsed and filtered PPP data as csv in 'flaskr/data' directory
+        """Saves the parsed and filtered PPP data in 'flaskr/data' directory
 
         Args:
             parsed_ppp_data (pd.DataFrame): PPP data after parsing and filtering
         """
-        parsed_ppp_data.to_csv(
-            self.ppp_data_path,
-            sep="|",
-            index=False,
-        )
+        self.storage.save(parsed_ppp_data, self.ppp_data_path)
 
     def _check_available_data(self) -> bool:
         """Check if there is data file is available or not
@@ -162,9 +293,20 @@ class ExchangeRateData:
         if not os.path.exists(constants.FETCHED_DATA_PATH):
             os.makedirs(constants.FETCHED_DATA_PATH)
 
-        self.exch_rate_data_path = os.path.join(
-            constants.FETCHED_DATA_PATH, constants.EXCH_RATE_FILE_NAME
+        self.storage = get_storage()
+        self.exch_rate_data_path = self.storage.path_for(
+            os.path.join(constants.FETCHED_DATA_PATH, constants.EXCH_RATE_FILE_NAME)
         )
+        self.validators = DatasetValidators(self.exch_rate_data_path)
+        # Set when the latest fetch saved new data
+        self.changed = False
+        # Set when upstream answered the latest fetch (200 or 304)
+        self.fetched = False
+        # Network/5xx/429 error of the latest fetch, worth retrying later
+        self.upstream_error = None
+        # Response bytes and parsed rows of the latest fetch, for the run ledger
+        self.bytes_fetched = 0
+        self.rows_parsed = None
 
     def _get_exch_rate_data(self) -> bool:
         """Generates the exchange rate data after fetching from openexchangerates.org
@@ -177,23 +319,51 @@ class ExchangeRateData:
             "Fetching the Echange Rate data from openexchangerates.org: Started"
         )
         try:
-            response = self._request_exch_rate_data()
+            response = self._request_exch_rate_data(
+                headers=self.validators.conditional_headers()
+            )
         except Exception as e:
             app.logger.error(str(e))
+            if is_retryable(e):
+                self.upstream_error = str(e)
             return False
 
+        self.fetched = True
+        self.bytes_fetched = len(response.content)
+        if response.status_code == 304:
+            app.logger.info(
+                "Exchange Rate data not modified upstream, skipping parse and save"
+            )
+            return True
+
         app.logger.info("Data fetched successfully from openexchangerates.org")
 
         # Getting parsed and filtered data
         all_data = response.json()
-        parsed_df = self._parse_exch_rate_data(exch_rate_data=all_data)
+        with STAGE_SECONDS.time(dataset="exchange_rate", stage="parse"):
+            parsed_df = self._parse_exch_rate_data(exch_rate_data=all_data)
+        self.rows_parsed = parsed_df.shape[0]
         app.logger.info("Data parsed and filtered into a DataFrame")
 
+        self.validators.update_from_response(response)
+        fingerprint = DatasetValidators.fingerprint(parsed_df)
+        if self.validators.is_unchanged(fingerprint):
+            self.validators.save()
+            app.logger.info(
+                "Exchange Rate data unchanged since the last fetch, skipping save"
+            )
+            return True
+
         # Saving the data as csv in data dir
-        self._save_exch_rate_data(parsed_exch_rate_data=parsed_df)
+        with STAGE_SECONDS.time(dataset="exchange_rate", stage="save"):
+            self._save_exch_rate_data(parsed_exch_rate_data=parsed_df)
+        DATASET_ROWS.set(parsed_df.shape[0], dataset="exchange_rate")
+        self.validators.sha256 = fingerprint
+        self.validators.save()
+        self.changed = True
         app.logger.debug(
             "Top 10 data from the fetched exchange rate data = \n%s",
-            parsed_df.head(10).to_string(index=False),
+            LazyPreview(parsed_df),
         )
         app.logger.info(
             "Exchange Rate data fetched, parsed and saved in data directory"
@@ -201,16 +371,12 @@ class ExchangeRateData:
 
         return True
 
-    @retry(
-        stop_max_attempt_number=constants.REQUEST_TRY_COUNT,  # Maximum number of retries
-        wait_fixed=1000,  # Wait 1 second between retries
-        retry_on_exception=lambda exc: isinstance(
-            exc, requests.exceptions.RequestException
-        ),  # Retry on network-related exceptions
-    )
-    def _request_exch_rate_data(self) -> requests.Response:
+    def _request_exch_rate_data(self, headers: dict = None) -> requests.Response:
         """Requests the exchange rate data from openexchangerates.org api endpoint
 
+        Args:
+            headers (dict): Conditional request headers
+
         Returns:
             list: list containing required data
         """
@@ -222,7 +388,9 @@ class ExchangeRateData:
             "app_id": "d0f60989add94a08a9aa685f1f2a9d34",
         }
 
-        response = requests.get(url, params=params)
+        # Every attempt counts against the monthly quota
+        CallLedger().record_call("exchange_rate")
+        response = get_fetch_client().get(url, params=params, headers=headers)
         response.raise_for_status()
 
         return response
@@ -244,16 +412,12 @@ class ExchangeRateData:
         return exch_rate_df
 
     def _save_exch_rate_data(self, parsed_exch_rate_data: pd.DataFrame) -> None:
-        """Saves the parsed and filtered data as csv in 'flaskr/data' directory
+        """Saves the parsed and filtered data in 'flaskr/data' directory
 
         Args:
             parsed_exch_rate_data (pd.DataFrame): PPP data after parsing and filtering
         """
-        parsed_exch_rate_data.to_csv(
-            self.exch_rate_data_path,
-            sep="|",
-            index=False,
-        )
+        self.storage.save(parsed_exch_rate_data, self.exch_rate_data_path)
 
     def _check_available_data(self) -> bool:
         """Check if there is data file is available or not
@@ -289,73 +453,101 @@ class CurrencyData:
         if not os.path.exists(constants.FETCHED_DATA_PATH):
             os.makedirs(constants.FETCHED_DATA_PATH)
 
-        self.data_file_path = os.path.join(
-            constants.FETCHED_DATA_PATH,
-            constants.CURRENCY_FILE_NAME,
+        self.storage = get_storage()
+        self.data_file_path = self.storage.path_for(
+            os.path.join(
+                constants.FETCHED_DATA_PATH,
+                constants.CURRENCY_FILE_NAME,
+            )
         )
+        self.validators = DatasetValidators(self.data_file_path)
+        # Set when the latest fetch saved new data
+        self.changed = False
+        # Set when upstream answered the latest fetch (200 or 304)
+        self.fetched = False
+        # Network/5xx/429 error of the latest fetch, worth retrying later
+        self.upstream_error = None
+        # Response bytes and parsed rows of the latest fetch, for the run ledger
+        self.bytes_fetched = 0
+        self.rows_parsed = None
 
     def _get_currency_data(self) -> bool:
         """Request data from the URL, parse it and save it at
-        "flaskr/data/fetched" if doesn't exist
+        "flaskr/data/fetched"; a conditional request, so an unchanged upstream
+        file isn't downloaded again
 
         Returns:
-            bool: True if file fetched or exists
-                    False if file doesn't exist and failed to fetch a new
+            bool: True if file fetched or unchanged
+                    False if failed to fetch
         """
-        # Check if file exists; if yes then return True
-        if self._check_available_data():
-            app.logger.info("Currency data already exists, skipping the fetching")
-            return True
-
-        # File doesn't exist, so fetch a new
         app.logger.info("Fetching the Currencies data: Started")
         try:
-            response = self._request_currency_data()
+            response = self._request_currency_data(
+                headers=self.validators.conditional_headers()
+            )
 
         except Exception as e:
             app.logger.error(str(e))
+            if is_retryable(e):
+                self.upstream_error = str(e)
             return False
 
+        self.fetched = True
+        self.bytes_fetched = len(response.content)
+        if response.status_code == 304:
+            app.logger.info("Currency data not modified upstream, skipping parse and save")
+            return True
+
         app.logger.info("Data fetched successfully")
 
         # Parsing the data fetched
         data = response.content
-        parsed_df = self._parse_data(data=data)
-        parsed_df = parsed_df[["Entity", "Currency", "AlphabeticCode"]]
+        with STAGE_SECONDS.time(dataset="currency", stage="parse"):
+            parsed_df = self._parse_data(data=data)
+            parsed_df = parsed_df[["Entity", "Currency", "AlphabeticCode"]]
+        self.rows_parsed = parsed_df.shape[0]
         app.logger.info(
             "Parsed the fetched data into dataframe with %s records",
             parsed_df.shape[0],
         )
 
-        self._save_currency_data(dataframe=parsed_df)
+        self.validators.update_from_response(response)
+        fingerprint = DatasetValidators.fingerprint(parsed_df)
+        if self.validators.is_unchanged(fingerprint):
+            self.validators.save()
+            app.logger.info("Currency data unchanged since the last fetch, skipping save")
+            return True
+
+        with STAGE_SECONDS.time(dataset="currency", stage="save"):
+            self._save_currency_data(dataframe=parsed_df)
+        DATASET_ROWS.set(parsed_df.shape[0], dataset="currency")
+        self.validators.sha256 = fingerprint
+        self.validators.save()
+        self.changed = True
         app.logger.info(
             "Currency data fetched, parsed and saved at %s",
             self.data_file_path,
         )
         app.logger.debug(
             "Top 10 data final currency data = \n%s",
-            parsed_df.head(10).to_string(index=False),
+            LazyPreview(parsed_df),
         )
 
         return True
 
-    @retry(
-        stop_max_attempt_number=constants.REQUEST_TRY_COUNT,  # Maximum number of retries
-        wait_fixed=1000,  # Wait 1 second between retries
-        retry_on_exception=lambda exc: isinstance(
-            exc, requests.exceptions.RequestException
-        ),  # Retry on network-related exceptions
-    )
-    def _request_currency_data(self) -> requests.Response:
+    def _request_currency_data(self, headers: dict = None) -> requests.Response:
         """Requests the new file from url and returns a response object
 
+        Args:
+            headers (dict): Conditional request headers
+
         Returns:
             requests.Response: Response returned from the request of get data
         """
 
         url = "https://datahub.io/core/currency-codes/r/0.csv"
 
-        response = requests.get(url=url)
+        response = get_fetch_client().get(url=url, headers=headers)
         response.raise_for_status()
 
         return response
@@ -376,17 +568,13 @@ class CurrencyData:
         return data_frame
 
     def _save_currency_data(self, dataframe: pd.DataFrame):
-        """Saves the currency dataset as csv in data dir
+        """Saves the currency dataset in data dir
 
         Args:
             dataframe (pd.DataFrame): dataframe containing the currency data
         """
 
-        dataframe.to_csv(
-            self.data_file_path,
-            sep="|",
-            index=False,
-        )
+        self.storage.save(dataframe, self.data_file_path)
 
     def _check_available_data(self) -> bool:
         """Check if there is data file is available or not
@@ -412,27 +600,76 @@ class GenerateData:
     """class to handle data generation from the fetched data"""
 
     def __init__(self) -> None:
-        if not os.path.exists(constants.GENERATED_DATA_PATH):
-            os.makedirs(constants.GENERATED_DATA_PATH)
+        self.snapshots = SnapshotStore()
+        self.snapshots.ensure_layout()
+
+        self.storage = get_storage()
+        self.currency_file_path = self.storage.path_for(
+            os.path.join(
+                constants.FETCHED_DATA_PATH,
+                constants.CURRENCY_FILE_NAME,
+            )
+        )
 
-        self.final_merged_data_file_path = os.path.join(
-            constants.GENERATED_DATA_PATH,
-            constants.FINAL_MERGED_DATA_FILE_NAME,
+        self.ppp_file_path = self.storage.path_for(
+            os.path.join(
+                constants.FETCHED_DATA_PATH,
+                constants.PPP_FILE_NAME,
+            )
         )
 
-        self.currency_file_path = os.path.join(
-            constants.FETCHED_DATA_PATH,
-            constants.CURRENCY_FILE_NAME,
+        self.exch_rate_file_path = self.storage.path_for(
+            os.path.join(
+                constants.FETCHED_DATA_PATH,
+                constants.EXCH_RATE_FILE_NAME,
+            )
         )
 
-        self.ppp_file_path = os.path.join(
-            constants.FETCHED_DATA_PATH,
-            constants.PPP_FILE_NAME,
+        self.ppp_series_file_path = self.storage.path_for(
+            os.path.join(
+                constants.FETCHED_DATA_PATH,
+                constants.PPP_SERIES_FILE_NAME,
+            )
         )
 
-        self.exch_rate_file_path = os.path.join(
-            constants.FETCHED_DATA_PATH,
-            constants.EXCH_RATE_FILE_NAME,
+        self._set_generated_data_dir(constants.GENERATED_DATA_PATH)
+
+        # Which path the latest generation took: 'full', 'exchange_rate_refresh'
+        # or 'skipped'
+        self.merge_path = None
+        # Number of the generation written by the latest run, None if nothing
+        # new was written
+        self.generation = None
+        # Rows of the latest merged data and countries the merge dropped
+        self.rows_merged = None
+        self.rows_dropped = None
+
+    def _set_generated_data_dir(self, directory: str) -> None:
+        """Points the generated data paths at a directory: the current
+        snapshot, or the staging directory of the generation being written
+
+        Args:
+            directory (str): Generated data directory
+        """
+        self.generated_data_dir = directory
+        self.final_merged_data_file_path = self.storage.path_for(
+            os.path.join(directory, constants.FINAL_MERGED_DATA_FILE_NAME)
+        )
+        self.final_merged_series_file_path = self.storage.path_for(
+            os.path.join(directory, constants.FINAL_MERGED_SERIES_FILE_NAME)
+        )
+        self.join_index_file_path = self.storage.path_for(
+            os.path.join(directory, constants.JOIN_INDEX_FILE_NAME)
+        )
+        self.merge_state_file_path = os.path.join(directory, constants.MERGE_STATE_FILE_NAME)
+        self.pair_matrices_file_path = os.path.join(
+            directory, constants.PAIR_MATRICES_FILE_NAME
+        )
+        self.pair_matrices_index_file_path = os.path.join(
+            directory, constants.PAIR_MATRICES_INDEX_FILE_NAME
+        )
+        self.resolution_index_file_path = os.path.join(
+            directory, constants.RESOLUTION_INDEX_FILE_NAME
         )
 
     def _generate_merged_final_data(self) -> bool:
@@ -464,38 +701,100 @@ class GenerateData:
                 )
                 return False
 
-        # Data is available - Proceeding with final data generation
-
-        app.logger.info("Final Merged Data generation: Started")
-        currency_file_df = pd.read_csv(
-            self.currency_file_path,
-            sep="|",
+        # Data is available - Picking the cheapest path the changed inputs allow
+        fingerprints = self._input_fingerprints()
+        previous = self._load_merge_state()
+        changed_inputs = sorted(
+            name for name, digest in fingerprints.items() if previous.get(name) != digest
         )
-        ppp_file_df = pd.read_csv(
-            self.ppp_file_path,
-            sep="|",
+
+        if not changed_inputs and os.path.exists(self.final_merged_data_file_path):
+            self.merge_path = "skipped"
+            app.logger.info("Final Merged Data inputs unchanged, merge path: skipped")
+            if not os.path.exists(self.pair_matrices_file_path):
+                self._save_pair_matrices(
+                    merged_df=self.storage.load(self.final_merged_data_file_path)
+                )
+                self.generation = self._bump_generation()
+            return True
+
+        if (
+            changed_inputs == ["exchange_rate"]
+            and os.path.exists(self.join_index_file_path)
+            and os.path.exists(self.final_merged_data_file_path)
+        ):
+            self.merge_path = "exchange_rate_refresh"
+        else:
+            self.merge_path = "full"
+
+        with MERGE_SECONDS.time(path=self.merge_path):
+            if self.merge_path == "full":
+                merged_df = self._full_merge()
+            else:
+                merged_df = self._refresh_exchange_rates()
+
+            # Saving the final data in generated data dir
+            self._save_date_in_file(data_frame=merged_df)
+            self._save_pair_matrices(merged_df=merged_df)
+            self._save_merge_state(fingerprints=fingerprints)
+            self.generation = self._bump_generation()
+        self.rows_merged = merged_df.shape[0]
+        DATASET_ROWS.set(merged_df.shape[0], dataset="merged")
+        app.logger.info(
+            "Final merged data generation %s completed and data is saved, merge path: %s "
+            "(changed inputs: %s, rows: %s)",
+            self.generation,
+            self.merge_path,
+            ", ".join(changed_inputs) or "none",
+            merged_df.shape[0],
         )
 
-        exch_rate_file_df = pd.read_csv(
-            self.exch_rate_file_path,
-            sep="|",
+        return True
+
+    def _full_merge(self) -> pd.DataFrame:
+        """Reads all the fetched data and merges it from scratch; the
+        PPP x currency join is persisted as the join index for later refreshes
+
+        Returns:
+            pd.DataFrame: Final merged data
+        """
+        app.logger.info("Final Merged Data generation: Started")
+        currency_file_df = self.storage.load(self.currency_file_path)
+        ppp_file_df = self.storage.load(self.ppp_file_path)
+
+        exch_rate_file_df = self.storage.load(self.exch_rate_file_path)
+
+        # Joining on the resolved ISO 4217 entity of every country instead of
+        # the exact upper-cased name, which drops every spelling mismatch
+        entity_by_country = match_entities(
+            countries=ppp_file_df["Country"].unique(),
+            entities=currency_file_df["Entity"].unique(),
         )
 
-        # Getting ["Country", "AlphabeticCode", "Value"] columns
+        # Getting ["Country", "AlphabeticCode", "Date", "Value"] columns
         merge1 = pd.merge(
-            left=ppp_file_df,
-            left_on="Country",
+            left=ppp_file_df.assign(
+                Entity=ppp_file_df["Country"].map(entity_by_country)
+            ).dropna(subset=["Entity"]),
             right=currency_file_df,
-            right_on="Entity",
+            on="Entity",
             how="inner",
         )
-        merge1 = merge1[["Country", "AlphabeticCode", "Value"]]
+        recovered = merge1["Country"] != merge1["Entity"]
+        app.logger.info(
+            "Country resolution recovered %s rows (%s countries) the exact name join dropped",
+            int(recovered.sum()),
+            merge1.loc[recovered, "Country"].nunique(),
+        )
+        merge1 = merge1[["Country", "AlphabeticCode", "Date", "Value"]]
+        merge1 = merge1.sort_values(by=["Country"], kind="stable")
+        self.storage.save(merge1, self.join_index_file_path)
         app.logger.debug(
             "Top 10 data after first merge [ppp and currency data] =\n%s",
-            merge1.head(10).to_string(index=False),
+            LazyPreview(merge1),
         )
 
-        # Getting ["Country", "AlphabeticCode", "Value", "ExchangeRate"] columns
+        # Getting ["Country", "AlphabeticCode", "Date", "Value", "ExchangeRate"] columns
         merge2 = pd.merge(
             left=merge1,
             right=exch_rate_file_df,
@@ -503,17 +802,173 @@ class GenerateData:
             how="inner",
         )
 
-        merge2.sort_values(by=["Country"], inplace=True)
+        merge2.sort_values(by=["Country"], kind="stable", inplace=True)
         app.logger.debug(
             "Top 10 data after second merge [merged1 and exchange rate data] =\n%s",
-            merge2.head(10).to_string(index=False),
+            LazyPreview(merge2),
         )
 
-        # Saving the final data in generated data dir
-        self._save_date_in_file(data_frame=merge2)
-        app.logger.info("Final merged data generation completed and data is saved")
+        self.rows_dropped = ppp_file_df["Country"].nunique() - merge2["Country"].nunique()
+        self._save_merged_series(countries=merge2["Country"])
+        self._save_resolution_index(
+            countries=merge2["Country"], entity_by_country=entity_by_country
+        )
 
-        return True
+        return merge2
+
+    def _save_merged_series(self, countries: pd.Series) -> None:
+        """Saves the PPP time series of the merged countries, sorted by country
+        then year, for as-of-year conversions
+
+        Args:
+            countries (pd.Series): Countries present in the final merged data
+        """
+        if not self.storage.exists(self.ppp_series_file_path):
+            app.logger.warning("PPP series unavailable, merged series not generated")
+            return
+
+        series_df = self.storage.load(self.ppp_series_file_path)
+        merged_series = series_df.loc[
+            series_df["Country"].isin(countries), ["Country", "Date", "Value"]
+        ]
+        self.storage.save(merged_series, self.final_merged_series_file_path)
+        app.logger.info(
+            "Merged PPP series saved with %s observations", merged_series.shape[0]
+        )
+
+    def _save_resolution_index(self, countries: pd.Series, entity_by_country: dict) -> None:
+        """Saves the alias map user-entered country names are resolved with:
+        ISO codes, World Bank and ISO 4217 names and common spellings
+
+        Args:
+            countries (pd.Series): Countries present in the final merged data
+            entity_by_country (dict): Country -> matched ISO 4217 entity name
+        """
+        codes_by_country = {}
+        if self.storage.exists(self.ppp_series_file_path):
+            series_df = self.storage.load(self.ppp_series_file_path)
+            if {"ISO2", "ISO3"}.issubset(series_df.columns):
+                codes_df = series_df.drop_duplicates(subset="Country")
+                codes_by_country = {
+                    country: [code for code in (iso2, iso3) if isinstance(code, str)]
+                    for country, iso2, iso3 in codes_df[["Country", "ISO2", "ISO3"]].itertuples(
+                        index=False
+                    )
+                }
+
+        aliases = build_aliases(
+            countries=countries.tolist(),
+            entity_by_country=entity_by_country,
+            codes_by_country=codes_by_country,
+        )
+        CountryResolver.save_index(aliases, self.resolution_index_file_path)
+        app.logger.info("Resolution index saved with %s aliases", len(aliases))
+
+    def _refresh_exchange_rates(self) -> pd.DataFrame:
+        """Rebuilds the final data from the persisted join index when only the
+        exchange rates changed: a vectorized column refresh instead of both merges
+
+        Returns:
+            pd.DataFrame: Final merged data with refreshed exchange rates
+        """
+        app.logger.info("Final Merged Data exchange rate refresh: Started")
+        join_index_df = self.storage.load(self.join_index_file_path)
+        exch_rate_file_df = self.storage.load(self.exch_rate_file_path)
+
+        rates = exch_rate_file_df.set_index("AlphabeticCode")["ExchangeRate"]
+        refreshed = join_index_df.assign(
+            ExchangeRate=join_index_df["AlphabeticCode"].map(rates)
+        )
+        refreshed = refreshed.loc[refreshed["ExchangeRate"].notna()]
+        self.rows_dropped = (
+            join_index_df["Country"].nunique() - refreshed["Country"].nunique()
+        )
+
+        return refreshed
+
+    def _save_pair_matrices(self, merged_df: pd.DataFrame) -> None:
+        """Precomputes the cross exchange rate and PPP ratio of every pair of
+        merged countries, so a conversion is a single indexed read
+
+        Args:
+            merged_df (pd.DataFrame): Final merged data, as saved
+        """
+        columns = {"ppp": "Value", "exchange": "ExchangeRate"}
+        modes = list(constants.CONVERSION_MODES)
+
+        started = time.perf_counter()
+        matrices = build_pair_matrices(
+            [merged_df[columns[mode]].to_numpy(dtype="float64") for mode in modes]
+        )
+        save_pair_matrices(
+            matrices=matrices,
+            matrices_path=self.pair_matrices_file_path,
+            index_path=self.pair_matrices_index_file_path,
+            countries=merged_df["Country"].tolist(),
+            modes=modes,
+            source_digest=self.storage.digest(self.final_merged_data_file_path),
+        )
+        app.logger.info(
+            "Pair matrices built for %s countries x %s modes in %.3fs (%.1f KiB)",
+            matrices.shape[1],
+            matrices.shape[0],
+            time.perf_counter() - started,
+            matrices.nbytes / 1024,
+        )
+
+    def _input_fingerprints(self) -> dict:
+        """SHA-256 of every fetched input
+
+        Returns:
+            dict: Input name -> hex digest
+        """
+        paths = {
+            "ppp": self.ppp_file_path,
+            "currency": self.currency_file_path,
+            "exchange_rate": self.exch_rate_file_path,
+        }
+        if self.storage.exists(self.ppp_series_file_path):
+            paths["ppp_series"] = self.ppp_series_file_path
+
+        return {name: self.storage.digest(path) for name, path in paths.items()}
+
+    def _load_merge_state(self) -> dict:
+        """Loads the input fingerprints of the last generation
+
+        Returns:
+            dict: Input name -> hex digest, empty if unknown
+        """
+        if not os.path.exists(self.merge_state_file_path):
+            return {}
+
+        try:
+            with open(self.merge_state_file_path, "r") as file:
+                return json.load(file).get("inputs", {})
+        except (OSError, ValueError) as e:
+            app.logger.warning("Ignoring unreadable merge state: %s", str(e))
+            return {}
+
+    def _save_merge_state(self, fingerprints: dict) -> None:
+        """Persists the input fingerprints of the generation just saved
+
+        Args:
+            fingerprints (dict): Input name -> hex digest
+        """
+        # Replaced, not rewritten: the file may be linked from a published snapshot
+        temp_path = f"{self.merge_state_file_path}.tmp-{os.getpid()}"
+        with open(temp_path, "w") as file:
+            json.dump({"inputs": fingerprints}, file)
+        os.replace(temp_path, self.merge_state_file_path)
+
+    def _bump_generation(self) -> int:
+        """Numbers the generation being written, above every published one
+
+        Returns:
+            int: New generation number
+        """
+        return bump_generation(
+            self.generated_data_dir, floor=self.snapshots.latest_generation()
+        )
 
     def _check_if_files_exist(self) -> bool:
         """Checks if all the files for merged file generation, exist
@@ -530,26 +985,43 @@ class GenerateData:
         else:
             return False
 
+    def final_data_exists(self) -> bool:
+        """Checks if final merged data has already been generated
+
+        Returns:
+            bool: True if the final merged data file exists
+        """
+        return os.path.exists(self.final_merged_data_file_path)
+
     def _save_date_in_file(self, data_frame: pd.DataFrame):
-        """Saving the data in dataframe as csv file
+        """Saving the data in dataframe as a file in the configured storage format
 
         Args:
             data_frame (pd.DataFrame): dataframe containing the data to be saved
         """
-        data_frame.to_csv(
-            self.final_merged_data_file_path,
-            sep="|",
-            index=False,
-        )
+        self.storage.save(data_frame, self.final_merged_data_file_path)
 
     def generate_merged_final_data(self) -> bool:
         """Public method to call the private generate_merged_final_data
-        method
+        method; the generation is written to a staging copy of the current
+        snapshot and published as a new snapshot once complete
 
         Returns:
             bool: True if generated sucessfully else False
         """
-        flag = self._generate_merged_final_data()
+        staging = self.snapshots.stage()
+        self._set_generated_data_dir(staging)
+        self.generation = None
+        published = False
+        try:
+            flag = self._generate_merged_final_data()
+            if self.generation is not None:
+                self.snapshots.publish(staging, snapshot_name(self.generation))
+                published = True
+        finally:
+            if not published:
+                self.snapshots.discard(staging)
+            self._set_generated_data_dir(constants.GENERATED_DATA_PATH)
 
         return flag
 
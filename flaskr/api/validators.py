@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import requests
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.data.storage import _publish, _temp_path
+
+
+class DatasetValidators:
+    """ETag, Last-Modified and content fingerprint of a fetched dataset,
+    persisted beside the dataset file so unchanged upstream data can be skipped"""
+
+    def __init__(self, data_path: str) -> None:
+        """Constructor
+
+        Args:
+            data_path (str): Path of the dataset file the validators belong to
+        """
+        self.data_path = data_path
+        self.meta_path = data_path + constants.VALIDATORS_FILE_SUFFIX
+
+        self.etag = None
+        self.last_modified = None
+        self.sha256 = None
+        self._load()
+
+    def _load(self) -> None:
+        """Loads the persisted validators, if any"""
+        if not os.path.exists(self.meta_path):
+            return
+
+        try:
+            with open(self.meta_path, "r") as file:
+                meta = json.load(file)
+        except (OSError, ValueError) as e:
+            app.logger.warning("Ignoring unreadable validators %s: %s", self.meta_path, str(e))
+            return
+
+        self.etag = meta.get("etag")
+        self.last_modified = meta.get("last_modified")
+        self.sha256 = meta.get("sha256")
+
+    def save(self) -> None:
+        """Persists the validators beside the dataset file; the file is
+        replaced atomically so a crash never leaves it half written"""
+        meta = {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "sha256": self.sha256,
+        }
+        temp_path = _temp_path(self.meta_path)
+        with open(temp_path, "w") as file:
+            json.dump(meta, file)
+        _publish(temp_path, self.meta_path)
+
+    def conditional_headers(self) -> dict:
+        """Request headers asking upstream to answer 304 if nothing changed;
+        empty when the dataset file itself is missing
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers
+        """
+        headers = {}
+        if not os.path.exists(self.data_path):
+            return headers
+
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+    def update_from_response(self, response: requests.Response) -> None:
+        """Remembers the validators sent with a successful response
+
+        Args:
+            response (requests.Response): Upstream response
+        """
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+    def is_unchanged(self, fingerprint: str) -> bool:
+        """Checks if parsed data matches the data already saved
+
+        Args:
+            fingerprint (str): Fingerprint of the freshly parsed data
+
+        Returns:
+            bool: True if the saved dataset has the same fingerprint
+        """
+        return fingerprint == self.sha256 and os.path.exists(self.data_path)
+
+    @staticmethod
+    def fingerprint(data_frame: pd.DataFrame) -> str:
+        """SHA-256 of a parsed dataset's values and column names
+
+        Args:
+            data_frame (pd.DataFrame): Parsed dataset
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update("|".join(map(str, data_frame.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data_frame, index=False).values.tobytes())
+
+        return digest.hexdigest()
@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 
 from celery import Celery
@@ -6,6 +7,10 @@ from flaskr import app
 from flaskr import definitions as constants
 
 
+# Result store used by the chord of the refresh task flow
+if not os.path.exists(constants.CELERY_RESULTS_PATH):
+    os.makedirs(constants.CELERY_RESULTS_PATH)
+
 # Configuring Celery
 celery_app = Celery(
     app.name,
@@ -18,15 +23,16 @@ celery_app.conf.update(
     task_track_started=True,
     imports=("flaskr.tasks",), 
     beat_schedule={
-        "run_task_daily": {
+        # Refreshes whichever datasets are due, see flaskr.refresh_policy
+        "refresh_tick": {
             "task": "flaskr.tasks.task_flow_ConversionModuleData",
             "schedule": timedelta(
-                days=1,
-                # seconds=60,
-            ),  # Run the task every 24 hours
+                seconds=constants.REFRESH_TICK_INTERVAL,
+            ),
             "args": (),  # Optional arguments for the task
+            "kwargs": {"trigger": "beat"},
             "options" : {
-                "expires" : 3600.0,
+                "expires" : float(constants.REFRESH_TICK_INTERVAL),
             },
         },
     },
@@ -19,13 +19,14 @@ class Config(object):
             },
         },
         "handlers": {
+            # Rolls over to the next day's folder at midnight; the handlers
+            # run on a background thread, see flaskr.log_handlers
             "file_handler": {
-                "class": "logging.handlers.RotatingFileHandler",
+                "class": "flaskr.log_handlers.DailyDirectoryFileHandler",
                 "level": "DEBUG",
                 "formatter": "default",
-                "filename": constants.APP_LOG_FILE_PATH,
-                "maxBytes": 1024 * 1024,
-                "backupCount": 10,
+                "directory": constants.LOG_DIR_PATH,
+                "filename": constants.APP_LOG_FILE_NAME,
             },
         },
         "root": {"level": "INFO", "handlers": ["file_handler"]},
@@ -44,13 +45,14 @@ class DevelopmentConfig(Config):
             },
         },
         "handlers": {
+            # Rolls over to the next day's folder at midnight; the handlers
+            # run on a background thread, see flaskr.log_handlers
             "file_handler": {
-                "class": "logging.handlers.RotatingFileHandler",
+                "class": "flaskr.log_handlers.DailyDirectoryFileHandler",
                 "level": "DEBUG",
                 "formatter": "default",
-                "filename": constants.APP_LOG_FILE_PATH,
-                "maxBytes": 1024 * 1024,
-                "backupCount": 10,
+                "directory": constants.LOG_DIR_PATH,
+                "filename": constants.APP_LOG_FILE_NAME,
             },
         },
         "root": {"level": "DEBUG", "handlers": ["file_handler"]},
@@ -0,0 +1,5 @@
+from .generation import bump_generation, read_generation
+from .matrices import build_pair_matrices, load_pair_matrices, save_pair_matrices
+from .storage import ColumnarStorage, CsvStorage, get_storage
+
+# Added storage backends, pair matrices and generation helpers to package level
@@ -0,0 +1,55 @@
+"""
+Generation number of the generated data, bumped on every refresh so caches
+in front of the data can invalidate by number instead of by wall clock
+"""
+import json
+import os
+import time
+
+from flaskr import definitions as constants
+
+from .storage import _publish, _temp_path
+
+
+def generation_path(directory: str = None) -> str:
+    return os.path.join(
+        directory or constants.GENERATED_DATA_PATH, constants.GENERATION_FILE_NAME
+    )
+
+
+def read_generation(directory: str = None) -> int:
+    """Reads the current generation number
+
+    Args:
+        directory (str): Generated data directory
+
+    Returns:
+        int: Generation number, 0 before the first refresh
+    """
+    try:
+        with open(generation_path(directory), "r") as file:
+            return int(json.load(file).get("generation", 0))
+    except (OSError, ValueError, TypeError):
+        return 0
+
+
+def bump_generation(directory: str = None, floor: int = 0) -> int:
+    """Increments the generation number; called by the only writer of the
+    generated data, once a refresh has been saved completely
+
+    Args:
+        directory (str): Generated data directory
+        floor (int): Number the new generation must be above, e.g. the
+                     latest snapshot after a rollback
+
+    Returns:
+        int: New generation number
+    """
+    generation = max(read_generation(directory), floor) + 1
+    target = generation_path(directory)
+    temp_path = _temp_path(target)
+    with open(temp_path, "w") as file:
+        json.dump({"generation": generation, "written_at": time.time()}, file)
+    _publish(temp_path, target)
+
+    return generation
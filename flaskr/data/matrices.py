@@ -0,0 +1,78 @@
+"""
+Dense pairwise conversion matrices precomputed from the final merged data
+"""
+import json
+import time
+
+import numpy as np
+
+from .storage import _publish, _temp_path
+
+
+def build_pair_matrices(factors: list) -> np.ndarray:
+    """Builds one N x N matrix per conversion mode where [m, i, j] is the
+    multiplier taking an amount in country i to country j: factor_j / factor_i
+
+    Args:
+        factors (list): One array of per-country factors per mode, all of length N
+
+    Returns:
+        np.ndarray: float64 array of shape (modes, N, N)
+    """
+    stacked = np.asarray(factors, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return stacked[:, np.newaxis, :] / stacked[:, :, np.newaxis]
+
+
+def save_pair_matrices(
+    matrices: np.ndarray,
+    matrices_path: str,
+    index_path: str,
+    countries: list,
+    modes: list,
+    source_digest: str,
+) -> None:
+    """Writes the matrices as a .npy file readers can memory-map, plus a JSON
+    index with the row order; both files are replaced atomically, matrices first
+
+    Args:
+        matrices (np.ndarray): Output of build_pair_matrices
+        matrices_path (str): Path of the .npy file
+        index_path (str): Path of the JSON index
+        countries (list): Country of every row/column
+        modes (list): Conversion mode of every matrix
+        source_digest (str): Digest of the final merged data the matrices
+                             were built from
+    """
+    temp_path = _temp_path(matrices_path)
+    with open(temp_path, "wb") as file:
+        np.save(file, np.ascontiguousarray(matrices, dtype="<f8"))
+    _publish(temp_path, matrices_path)
+
+    index = {
+        "modes": list(modes),
+        "countries": list(countries),
+        "source_digest": source_digest,
+        "built_at": time.time(),
+    }
+    temp_path = _temp_path(index_path)
+    with open(temp_path, "w") as file:
+        json.dump(index, file)
+    _publish(temp_path, index_path)
+
+
+def load_pair_matrices(matrices_path: str, index_path: str) -> tuple:
+    """Memory-maps the matrices and reads their index
+
+    Args:
+        matrices_path (str): Path of the .npy file
+        index_path (str): Path of the JSON index
+
+    Returns:
+        tuple: (dict index, np.ndarray read-only memmap of shape (modes, N, N))
+    """
+    with open(index_path, "r") as file:
+        index = json.load(file)
+    matrices = np.load(matrices_path, mmap_mode="r")
+
+    return index, matrices
@@ -0,0 +1,311 @@
+"""
+Pluggable storage backends for the fetched and generated datasets
+"""
+import csv
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from flaskr import definitions as constants
+
+
+class CsvStorage:
+    """'|' separated CSV files, the original storage format"""
+
+    name = "csv"
+    extension = ".csv"
+
+    def path_for(self, path: str) -> str:
+        """Maps a dataset path to the file this backend stores it in
+
+        Args:
+            path (str): Dataset path, with or without an extension
+
+        Returns:
+            str: Path of the backing file
+        """
+        return os.path.splitext(path)[0] + self.extension
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.path_for(path))
+
+    def save(self, data_frame, path: str) -> None:
+        """Writes a DataFrame; the file is replaced atomically so readers never
+        see it half written
+
+        Args:
+            data_frame (pd.DataFrame): Data to be saved
+            path (str): Dataset path
+        """
+        target = self.path_for(path)
+        temp_path = _temp_path(target)
+        data_frame.to_csv(temp_path, sep="|", index=False)
+        _publish(temp_path, target)
+
+    def load(self, path: str):
+        """Reads a dataset into a DataFrame
+
+        Args:
+            path (str): Dataset path
+
+        Returns:
+            pd.DataFrame: Stored data
+        """
+        import pandas as pd
+
+        return pd.read_csv(self.path_for(path), sep="|")
+
+    def load_columns(self, path: str) -> dict:
+        """Reads a dataset into one NumPy array per column without pandas;
+        values are left as strings
+
+        Args:
+            path (str): Dataset path
+
+        Returns:
+            dict: Column name -> np.ndarray
+        """
+        with open(self.path_for(path), "r", newline="") as file:
+            reader = csv.reader(file, delimiter="|")
+            header = next(reader, [])
+            rows = list(reader)
+
+        return {
+            name: np.array([row[pos] for row in rows], dtype=object)
+            for pos, name in enumerate(header)
+        }
+
+    def digest(self, path: str) -> str:
+        """SHA-256 of the stored data
+
+        Args:
+            path (str): Dataset path
+
+        Returns:
+            str: Hex digest
+        """
+        with open(self.path_for(path), "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+
+class ColumnarStorage:
+    """Binary columnar files: numeric columns are fixed-width little-endian
+    arrays readers memory-map without copying, string columns are dictionary
+    encoded as int32 codes. Optionally exports a CSV copy beside every file.
+
+    File layout: 8 byte magic, uint64 header length, JSON header, then every
+    column buffer aligned to COLUMNAR_ALIGNMENT bytes.
+    """
+
+    name = "columnar"
+    extension = ".wsc"
+    magic = b"WSCOL\x00\x01\x00"
+
+    def __init__(self, csv_export: bool = constants.DATA_CSV_EXPORT) -> None:
+        """Constructor
+
+        Args:
+            csv_export (bool): Also write a CSV copy of every saved dataset
+        """
+        self.csv_export = csv_export
+
+    def path_for(self, path: str) -> str:
+        return os.path.splitext(path)[0] + self.extension
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.path_for(path))
+
+    def save(self, data_frame, path: str) -> None:
+        """Writes a DataFrame in the columnar format; the file is replaced
+        atomically so memory-mapped readers keep their old copy intact
+
+        Args:
+            data_frame (pd.DataFrame): Data to be saved
+            path (str): Dataset path
+        """
+        import pandas as pd
+
+        buffers = []
+        columns = []
+        for name in data_frame.columns:
+            series = data_frame[name]
+            if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(
+                series.dtype
+            ):
+                dtype = "<f8" if pd.api.types.is_float_dtype(series.dtype) else "<i8"
+                buffer = np.ascontiguousarray(series.to_numpy(), dtype=dtype)
+                columns.append({"name": str(name), "kind": "numeric", "dtype": dtype})
+            else:
+                codes, uniques = pd.factorize(series, use_na_sentinel=True)
+                buffer = np.ascontiguousarray(codes, dtype="<i4")
+                columns.append(
+                    {
+                        "name": str(name),
+                        "kind": "dictionary",
+                        "dtype": "<i4",
+                        "dictionary": [str(value) for value in uniques],
+                    }
+                )
+            buffers.append(buffer)
+
+        digest = hashlib.sha256()
+        for column, buffer in zip(columns, buffers):
+            digest.update(json.dumps(column, sort_keys=True).encode("utf-8"))
+            digest.update(buffer.tobytes())
+
+        # Offsets are relative to the aligned end of the header
+        offset = 0
+        for column, buffer in zip(columns, buffers):
+            offset = _align(offset)
+            column["offset"] = offset
+            offset += buffer.nbytes
+        header = {
+            "version": 1,
+            "rows": int(data_frame.shape[0]),
+            "digest": digest.hexdigest(),
+            "columns": columns,
+        }
+        header_bytes = self._encode_header(header)
+
+        target = self.path_for(path)
+        temp_path = _temp_path(target)
+        with open(temp_path, "wb") as file:
+            file.write(header_bytes)
+            for column, buffer in zip(columns, buffers):
+                file.write(b"\x00" * (len(header_bytes) + column["offset"] - file.tell()))
+                file.write(buffer.tobytes())
+        _publish(temp_path, target)
+
+        if self.csv_export:
+            CsvStorage().save(data_frame, path)
+
+    def _encode_header(self, header: dict) -> bytes:
+        """Serializes the header, padded so the column data starts aligned
+
+        Args:
+            header (dict): Header to be written
+
+        Returns:
+            bytes: Magic, header length and padded JSON header
+        """
+        body = json.dumps(header).encode("utf-8")
+        prefix_length = len(self.magic) + 8
+        body += b" " * (_align(prefix_length + len(body)) - prefix_length - len(body))
+
+        return self.magic + struct.pack("<Q", len(body)) + body
+
+    def read_header(self, path: str) -> dict:
+        """Reads the header of a columnar file
+
+        Args:
+            path (str): Dataset path
+
+        Raises:
+            ValueError: If the file isn't in the columnar format
+
+        Returns:
+            dict: Row count, digest and column descriptions
+        """
+        with open(self.path_for(path), "rb") as file:
+            if file.read(len(self.magic)) != self.magic:
+                raise ValueError(f"{self.path_for(path)} is not a columnar data file")
+            (length,) = struct.unpack("<Q", file.read(8))
+            header = json.loads(file.read(length))
+
+        header["data_offset"] = len(self.magic) + 8 + length
+        return header
+
+    def load_columns(self, path: str, decode: bool = True) -> dict:
+        """Memory-maps a dataset; numeric columns are zero-copy views of the
+        file, dictionary columns are decoded to object arrays unless asked not to
+
+        Args:
+            path (str): Dataset path
+            decode (bool): Decode dictionary columns, else return their codes
+
+        Returns:
+            dict: Column name -> np.ndarray
+        """
+        header = self.read_header(path)
+        rows = header["rows"]
+        target = self.path_for(path)
+
+        columns = {}
+        for column in header["columns"]:
+            if rows == 0:
+                array = np.empty(0, dtype=column["dtype"])
+            else:
+                array = np.memmap(
+                    target,
+                    dtype=column["dtype"],
+                    mode="r",
+                    offset=header["data_offset"] + column["offset"],
+                    shape=(rows,),
+                )
+            if column["kind"] == "dictionary" and decode:
+                dictionary = np.array(column["dictionary"] + [None], dtype=object)
+                array = dictionary[np.asarray(array)]
+            columns[column["name"]] = array
+
+        return columns
+
+    def load(self, path: str):
+        """Reads a dataset into a DataFrame
+
+        Args:
+            path (str): Dataset path
+
+        Returns:
+            pd.DataFrame: Stored data
+        """
+        import pandas as pd
+
+        columns = self.load_columns(path)
+        return pd.DataFrame({name: np.asarray(array) for name, array in columns.items()})
+
+    def digest(self, path: str) -> str:
+        return self.read_header(path)["digest"]
+
+
+STORAGE_BACKENDS = {
+    CsvStorage.name: CsvStorage,
+    ColumnarStorage.name: ColumnarStorage,
+}
+
+
+def get_storage(name: str = None):
+    """Returns an instance of the configured storage backend
+
+    Args:
+        name (str): Backend name, defaults to constants.DATA_STORAGE_BACKEND
+
+    Returns:
+        CsvStorage | ColumnarStorage: Storage backend
+    """
+    return STORAGE_BACKENDS[name or constants.DATA_STORAGE_BACKEND]()
+
+
+def _align(offset: int) -> int:
+    alignment = constants.COLUMNAR_ALIGNMENT
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _temp_path(target: str) -> str:
+    directory = os.path.dirname(target)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    return f"{target}.tmp-{os.getpid()}"
+
+
+def _publish(temp_path: str, target: str) -> None:
+    """Flushes a fully written temporary file to disk and atomically moves
+    it into place"""
+    fd = os.open(temp_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(temp_path, target)
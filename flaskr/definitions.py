@@ -12,28 +12,121 @@ APP_LOG_FILE_NAME = "app.log"
 DATA_DIR_NAME = "data"
 FETCHED_DATA_NAME = "fetched"
 GENERATED_DATA_NAME = "generated"
+SNAPSHOTS_DIR_NAME = "snapshots"  # Published generations of the generated data
+CURRENT_SNAPSHOT_LINK_NAME = "current"  # Symlink to the generation being served
 # DATABASE_DIR_NAME = 'databases'
 PPP_FILE_NAME = "ppp_data.csv"
+PPP_SERIES_FILE_NAME = "ppp_series.csv"  # Every (country, year) observation
 EXCH_RATE_FILE_NAME= "exchange_rates.csv"
 CURRENCY_FILE_NAME = "currencies.csv"
 FINAL_MERGED_DATA_FILE_NAME = "final_merged_data.csv"
+FINAL_MERGED_SERIES_FILE_NAME = "final_merged_series.csv"  # PPP series of the merged countries
+JOIN_INDEX_FILE_NAME = "join_index.csv"  # Country -> AlphabeticCode/Value of the PPP x currency join
+MERGE_STATE_FILE_NAME = "merge_state.json"  # Input fingerprints of the last merge
+PAIR_MATRICES_FILE_NAME = "pair_matrices.npy"  # (mode, from, to) conversion multipliers
+PAIR_MATRICES_INDEX_FILE_NAME = "pair_matrices.json"  # Country order and source digest of the matrices
+RESOLUTION_INDEX_FILE_NAME = "resolution_index.json"  # Country alias -> merged country name
+GENERATION_FILE_NAME = "generation.json"  # Number bumped on every refresh of the generated data
+VALIDATORS_FILE_SUFFIX = ".meta.json"  # ETag/Last-Modified/SHA-256 beside a fetched file
+CALL_LEDGER_FILE_NAME = "call_ledger.json"  # Upstream calls per month and last refresh per dataset
 
 
-# Request tries for fetching data
+# Dataset storage: "columnar" (memory-mappable binary) or "csv"
+DATA_STORAGE_BACKEND = "columnar"
+DATA_CSV_EXPORT = True  # Also export a '|' separated CSV beside columnar files
+COLUMNAR_ALIGNMENT = 64  # Byte alignment of every column buffer
+
+# Request tries for fetching data; retries are rescheduled, not slept through
 REQUEST_TRY_COUNT = 5
+RETRY_BASE_DELAY = 2  # Seconds, doubled on every retry, with jitter
+RETRY_MAX_DELAY = 60  # Seconds, cap of a single backoff
+RETRY_MAX_TOTAL = 600  # Seconds from the first attempt after which a fetch gives up
+BREAKER_FAILURE_THRESHOLD = 3  # Failed fetches in a row that open an upstream's breaker
+BREAKER_RESET_TIMEOUT = 300  # Seconds an open breaker waits before a trial fetch
+
+# World Bank API paging
+WORLD_BANK_PER_PAGE = 1000  # Records per page
+WORLD_BANK_PAGE_WORKERS = 4  # Pages fetched concurrently
+
+# Shared HTTP client for upstream fetches
+HTTP_CONNECT_TIMEOUT = 5  # Seconds
+HTTP_READ_TIMEOUT = 30  # Seconds
+HTTP_POOL_MAXSIZE = 10  # Kept-alive connections per host
+HTTP_MAX_CONCURRENCY_PER_HOST = 4
+
+# Salary conversion engine
+CONVERSION_MODES = ("ppp", "exchange")
+CONVERSION_RELOAD_INTERVAL = 30  # Seconds between checks of the merged data file
+BATCH_CONVERSION_MAX_ROWS = 100000
+COUNTRY_SUGGEST_LIMIT = 10  # Most type-ahead suggestions per prefix
+CONVERSION_CACHE_SIZE = 10000  # Cached conversion results per process
+CONVERSION_CACHE_TTL = 3600  # Seconds; entries also drop when the data generation changes
+PPP_MIN_YEAR = 1900  # Years outside this range are dropped from the PPP series
+PPP_MAX_YEAR = 2999  # and rejected in as-of-year conversions
+
+# Static asset build: fingerprinted copies, image variants and a manifest
+ASSETS_DIST_DIR_NAME = "dist"  # Under the web blueprint's static folder
+ASSET_MANIFEST_FILE_NAME = "manifest.json"
+ASSET_HASH_LENGTH = 12  # Hex digits of the content hash in built file names
+ASSET_IMAGE_WIDTHS = (640, 1280, 1920)  # Resized variants, only below the original width
+ASSET_JPEG_QUALITY = 82
+ASSET_WEBP_QUALITY = 80
+ASSET_GZIP_EXTENSIONS = (".css", ".js", ".svg", ".ico", ".json", ".txt", ".html", ".map")
+ASSET_MAX_AGE = 31536000  # Seconds; built files never change under the same name
+PAGE_CACHE_SIZE = 256  # Rendered pages and fragments kept per process
+
+# Logging: records are written by a background thread behind a bounded queue
+LOG_QUEUE_SIZE = 10000  # Records queued before new ones are dropped
 
 # Paths
 ROOTDIR = os.path.dirname(Path(os.path.abspath(__file__)))
 VENVDIR = os.path.dirname(Path(os.path.abspath(__file__)).parent)
-LOG_TODAY_DIR = os.path.join(ROOTDIR, LOG_DIR_NAME, TODAY)
+LOG_DIR_PATH = os.path.join(ROOTDIR, LOG_DIR_NAME)  # One folder per day under it
+LOG_TODAY_DIR = os.path.join(LOG_DIR_PATH, TODAY)
 APP_LOG_FILE_PATH = os.path.join(LOG_TODAY_DIR, APP_LOG_FILE_NAME)
 FETCHED_DATA_PATH = os.path.join(ROOTDIR, DATA_DIR_NAME, FETCHED_DATA_NAME)
-GENERATED_DATA_PATH = os.path.join(ROOTDIR, DATA_DIR_NAME, GENERATED_DATA_NAME)
+# The current snapshot of the generated data, see flaskr.snapshots
+GENERATED_DATA_PATH = os.path.join(
+    ROOTDIR, DATA_DIR_NAME, GENERATED_DATA_NAME, CURRENT_SNAPSHOT_LINK_NAME
+)
+SNAPSHOT_KEEP = 5  # Generations of the generated data kept for rollbacks
 # DATABASE_DIR_PATH = os.path.join(ROOTDIR, DATABASE_DIR_NAME)
 
+# Data refresh: Celery beat and the embedded scheduler tick at this interval
+# and refresh the datasets that are due per their own cadence
+REFRESH_TICK_INTERVAL = 300  # Seconds
+DATASET_REFRESH_INTERVALS = {  # Seconds between refreshes of a dataset
+    "ppp": 7 * 24 * 3600,  # Published yearly
+    "exchange_rate": 1800,  # Shortest cadence, stretched to fit the quota
+    "currency": 30 * 24 * 3600,  # ISO 4217 list changes a few times a year
+}
+DATASET_STALENESS_BUDGETS = {  # Seconds a dataset may go unrefreshed before it's flagged
+    "ppp": 60 * 24 * 3600,
+    "exchange_rate": 24 * 3600,
+    "currency": 180 * 24 * 3600,
+}
+EXCHANGE_RATE_MONTHLY_QUOTA = 1000  # openexchangerates.org calls per calendar month
+EXCHANGE_RATE_QUOTA_RESERVE = 0.1  # Share of the quota kept for retries and manual runs
+EMBEDDED_SCHEDULER_WORKERS = 3  # Fetch branches run concurrently
+REFRESH_LOCK_BACKEND = "file"  # "file" (shared by the processes of a host) or "memory"
+REFRESH_LOCK_TTL = 3600  # Seconds before the lease of a crashed refresh expires
+RUN_LEDGER_PATH = os.path.join(ROOTDIR, DATA_DIR_NAME, "run_ledger.sqlite3")  # Refresh run history
+RUN_LEDGER_TIMEOUT = 30  # Seconds a ledger write waits for another writer
+RUN_LEDGER_MAX_ROWS = 500  # Most runs returned by /api/runs
+
+# Metrics: every process snapshots its metrics here, /metrics merges them
+METRICS_PATH = os.path.join(ROOTDIR, DATA_DIR_NAME, "metrics")
+METRICS_SNAPSHOT_INTERVAL = 15  # Seconds between snapshots of a busy process
+METRICS_SNAPSHOT_MAX_AGE = 7 * 24 * 3600  # Snapshots older than this are deleted
+
 # Celery-related app config
 
-CELERY_BROKER_URL = 'amqp://localhost'
-CELERY_RESULT_BACKEND = 'rpc://' # old and deprecated soon
+# An empty broker URL (CELERY_BROKER_URL="" in the environment) runs the
+# refresh in the app process instead, see flaskr.scheduler
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", 'amqp://localhost')
+# Chords (parallel fetches + merge callback) need a backend that stores results;
+# the rpc:// backend doesn't support them
+CELERY_RESULTS_PATH = os.path.join(ROOTDIR, DATA_DIR_NAME, "celery", "results")
+CELERY_RESULT_BACKEND = "file://" + CELERY_RESULTS_PATH
 CELERY_LOG_FILE_NAME = "celery.log"
 CELERY_LOG_FILE_PATH = os.path.join(LOG_TODAY_DIR, CELERY_LOG_FILE_NAME)
\ No newline at end of file
@@ -1,8 +1,70 @@
+import threading
+import time
+
+import click
+
 from flaskr import app
-from flaskr.tasks import task_flow_ConversionModuleData
+from flaskr.metrics import STARTUP_SECONDS
+from flaskr.scheduler import get_scheduler, use_embedded_scheduler
+
+
+def _trigger_refresh() -> None:
+    """Queues the data refresh task flow; runs off the startup path because
+    publishing blocks while the broker is unreachable"""
+    # Celery is only imported here, serving requests doesn't need it
+    from flaskr.tasks import task_flow_ConversionModuleData
 
-def app_startup():
-    """Gets executed before flask app starts serving any requests
+    try:
+        task_flow_ConversionModuleData.apply_async(kwargs={"trigger": "startup"})
+        app.logger.info("Data refresh task flow queued")
+    except Exception as e:
+        app.logger.warning("Couldn't queue the data refresh task flow: %s", str(e))
+
+
+def cli_command_running() -> bool:
+    """Checks if the app is being loaded by a `flask` CLI command other than
+    `run`; those must neither warm the data nor start the refresh
+
+    Returns:
+        bool: True inside any `flask` command but `flask run`
     """
-    app.logger.info("Starting the async execution of tasks")
-    task_flow_ConversionModuleData.apply_async()
\ No newline at end of file
+    context = click.get_current_context(silent=True)
+    return context is not None and context.info_name != "run"
+
+
+def app_startup(refresh: bool = True) -> float:
+    """Warms the conversion data from the local files and fires the data
+    refresh in the background; called once by the serving entry point before
+    it takes requests. Without a broker the embedded scheduler runs the
+    refresh now and then on the beat cadence.
+
+    Args:
+        refresh (bool): Whether to start the data refresh
+
+    Returns:
+        float: Seconds the warm-up took
+    """
+    from flaskr.api.conversion import get_conversion_engine
+
+    start = time.perf_counter()
+    engine = get_conversion_engine()
+    duration = time.perf_counter() - start
+    STARTUP_SECONDS.set(duration, phase="warmup")
+    app.logger.info(
+        "Conversion data warmed up in %.3fs (loaded=%s)",
+        duration,
+        engine._table is not None,
+    )
+
+    if refresh and use_embedded_scheduler():
+        app.logger.info("No Celery broker configured, using the embedded scheduler")
+        get_scheduler().start()
+    elif refresh:
+        app.logger.info("Starting the async execution of tasks")
+        threading.Thread(
+            target=_trigger_refresh,
+            name="refresh-trigger",
+            daemon=True,
+        ).start()
+
+    return duration
@@ -0,0 +1,251 @@
+"""
+Single-flight lease lock of the data refresh: however many triggers fire
+(Celery beat, app startup in every worker, manual runs), one refresh runs at a
+time and the others join it instead of fetching again
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.metrics import registry
+
+
+REFRESH_TRIGGERS = registry.counter(
+    "wagescale_refresh_triggers_total",
+    "Data refresh triggers by source and outcome (started or coalesced)",
+    ("trigger", "outcome"),
+)
+
+
+class MemoryLeaseBackend:
+    """Leases held in process memory; only coordinates the threads of one
+    process (embedded scheduler, tests)"""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name: str, lease: dict) -> tuple:
+        """Takes a lease unless an unexpired one is held
+
+        Args:
+            name (str): Lease name
+            lease (dict): 'token', 'expires_at' and details of the new holder
+
+        Returns:
+            tuple: (True, lease) if taken, (False, current holder) if not
+        """
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current["expires_at"] > time.time():
+                return False, dict(current)
+            self._leases[name] = dict(lease)
+            return True, dict(lease)
+
+    def release(self, name: str, token: str) -> bool:
+        """Drops a lease if it is still held by the given token
+
+        Args:
+            name (str): Lease name
+            token (str): Token returned on acquire
+
+        Returns:
+            bool: True if the lease was released
+        """
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current["token"] != token:
+                return False
+            del self._leases[name]
+            return True
+
+    def holder(self, name: str):
+        """Current unexpired lease, None if free"""
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current["expires_at"] <= time.time():
+                return None
+            return dict(current)
+
+
+class FileLeaseBackend:
+    """Leases stored as JSON files in a local directory, so every process on
+    the host (WSGI workers, Celery workers and beat) shares them; an flock on
+    a side file serializes the read-modify-write of a lease"""
+
+    def __init__(self, directory: str = None) -> None:
+        """Constructor
+
+        Args:
+            directory (str): Where the lease files go, defaults to the fetched
+                             data folder the refresh writes to
+        """
+        self.directory = directory or constants.FETCHED_DATA_PATH
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f".{name}.lease")
+
+    def _read(self, name: str):
+        try:
+            with open(self._path(name), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _locked(self, name: str):
+        """Opens and flocks the side file of a lease; closing releases it"""
+        os.makedirs(self.directory, exist_ok=True)
+        file = open(self._path(name) + ".lock", "a")
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+    def acquire(self, name: str, lease: dict) -> tuple:
+        """Takes a lease unless an unexpired one is held
+
+        Args:
+            name (str): Lease name
+            lease (dict): 'token', 'expires_at' and details of the new holder
+
+        Returns:
+            tuple: (True, lease) if taken, (False, current holder) if not
+        """
+        with self._locked(name):
+            current = self._read(name)
+            if current is not None and current.get("expires_at", 0) > time.time():
+                return False, current
+
+            temp_path = f"{self._path(name)}.tmp-{os.getpid()}"
+            with open(temp_path, "w") as file:
+                json.dump(lease, file)
+            os.replace(temp_path, self._path(name))
+            return True, dict(lease)
+
+    def release(self, name: str, token: str) -> bool:
+        """Drops a lease if it is still held by the given token
+
+        Args:
+            name (str): Lease name
+            token (str): Token returned on acquire
+
+        Returns:
+            bool: True if the lease was released
+        """
+        with self._locked(name):
+            current = self._read(name)
+            if current is None or current.get("token") != token:
+                return False
+            os.remove(self._path(name))
+            return True
+
+    def holder(self, name: str):
+        """Current unexpired lease, None if free"""
+        current = self._read(name)
+        if current is None or current.get("expires_at", 0) <= time.time():
+            return None
+        return current
+
+
+LEASE_BACKENDS = {
+    "file": FileLeaseBackend,
+    "memory": MemoryLeaseBackend,
+}
+
+
+class SingleFlight:
+    """Lease-based single-flight guard. The lease expires after a TTL, so a
+    run that dies without releasing it only blocks refreshes until then."""
+
+    def __init__(
+        self,
+        backend,
+        name: str = "refresh",
+        ttl: float = constants.REFRESH_LOCK_TTL,
+    ) -> None:
+        """Constructor
+
+        Args:
+            backend: FileLeaseBackend, MemoryLeaseBackend or anything with the
+                     same acquire/release/holder methods
+            name (str): Lease name
+            ttl (float): Seconds before an unreleased lease expires
+        """
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+
+    def acquire(self, trigger: str):
+        """Starts a run unless one is in flight; a coalesced trigger is logged
+        and counted
+
+        Args:
+            trigger (str): What fired the run, e.g. 'beat', 'startup', 'manual'
+
+        Returns:
+            str | None: Lease token to release when the run ends, None if the
+                        trigger joined the run in flight
+        """
+        now = time.time()
+        lease = {
+            "token": uuid.uuid4().hex,
+            "trigger": trigger,
+            "pid": os.getpid(),
+            "acquired_at": now,
+            "expires_at": now + self.ttl,
+        }
+        acquired, holder = self.backend.acquire(self.name, lease)
+        if not acquired:
+            REFRESH_TRIGGERS.inc(trigger=trigger, outcome="coalesced")
+            app.logger.info(
+                "Refresh trigger %s joined the run in flight "
+                "(trigger %s, pid %s, started %.0fs ago)",
+                trigger,
+                holder.get("trigger"),
+                holder.get("pid"),
+                now - holder.get("acquired_at", now),
+            )
+            return None
+
+        REFRESH_TRIGGERS.inc(trigger=trigger, outcome="started")
+        app.logger.info("Refresh started by trigger %s", trigger)
+        return lease["token"]
+
+    def release(self, token: str) -> None:
+        """Ends a run
+
+        Args:
+            token (str): Token returned by acquire
+        """
+        if not self.backend.release(self.name, token):
+            app.logger.warning("Refresh lease had already expired or been taken over")
+
+    def holder(self):
+        """Lease of the run in flight, None if no run is
+
+        Returns:
+            dict | None: 'trigger', 'pid', 'acquired_at' and 'expires_at'
+        """
+        return self.backend.holder(self.name)
+
+
+# One backend instance per process, the memory backend only works shared
+_backends = {}
+
+
+def get_refresh_lock() -> SingleFlight:
+    """Returns the single-flight guard of the data refresh over the
+    configured backend
+
+    Returns:
+        SingleFlight: Refresh guard
+    """
+    name = constants.REFRESH_LOCK_BACKEND
+    if name not in _backends:
+        _backends[name] = LEASE_BACKENDS[name]()
+
+    return SingleFlight(_backends[name])
@@ -0,0 +1,156 @@
+"""
+Non-blocking logging: the handlers configured in Config.LOGGING run on a
+background writer thread behind a bounded queue, the file handler moves on to
+the next day's log folder at midnight, and DataFrame previews are only
+rendered for records that are actually emitted
+"""
+import atexit
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from flaskr import definitions as constants
+from flaskr.metrics import registry
+
+
+LOG_RECORDS_DROPPED = registry.counter(
+    "wagescale_log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+
+
+class DailyDirectoryFileHandler(logging.FileHandler):
+    """Appends to <directory>/<YYYYMMDD>/<filename>, the log folder layout
+    of the app and Celery, switching to the new day's folder with the first
+    record after midnight"""
+
+    def __init__(self, directory: str, filename: str, encoding: str = None) -> None:
+        """Constructor
+
+        Args:
+            directory (str): Log root, one folder per day is created under it
+            filename (str): Log file name inside the day's folder
+            encoding (str): File encoding
+        """
+        self.directory = directory
+        self.log_file_name = filename
+        self.rollover_at = 0
+        super().__init__(self._path_for(time.time()), encoding=encoding, delay=True)
+
+    def _path_for(self, now: float) -> str:
+        """Log file of the day of a timestamp; also sets the next rollover"""
+        day = time.localtime(now)
+        self.rollover_at = time.mktime(
+            (day.tm_year, day.tm_mon, day.tm_mday + 1, 0, 0, 0, 0, 0, -1)
+        )
+        directory = os.path.join(self.directory, time.strftime("%Y%m%d", day))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, self.log_file_name)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.created >= self.rollover_at:
+            self.acquire()
+            try:
+                if self.stream is not None:
+                    self.stream.close()
+                    self.stream = None
+                self.baseFilename = os.path.abspath(self._path_for(record.created))
+            finally:
+                self.release()
+
+        super().emit(record)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Puts records on the logging queue without formatting them, so the
+    message (lazy previews included) is rendered on the writer thread. A full
+    queue drops the record instead of blocking the caller."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, the record needs no pickling
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LazyPreview:
+    """First rows of a DataFrame for a log argument, rendered with
+    to_string only if the record is emitted:
+    app.logger.debug("Parsed data =\\n%s", LazyPreview(parsed_df))"""
+
+    def __init__(self, data_frame, rows: int = 10) -> None:
+        """Constructor
+
+        Args:
+            data_frame (pd.DataFrame): Data to preview
+            rows (int): Rows shown
+        """
+        # A cheap slice taken now, the caller may change the frame afterwards
+        self.data_frame = data_frame.head(rows)
+
+    def __str__(self) -> str:
+        return self.data_frame.to_string(index=False)
+
+
+_listener = None
+_queue_handler = None
+
+
+def start_queue_logging(
+    logger: logging.Logger = None, maxsize: int = constants.LOG_QUEUE_SIZE
+) -> QueueListener:
+    """Moves the handlers of a logger behind a queue served by a background
+    writer thread; the queue is drained at exit, and a forked child process
+    (Celery prefork, preloading WSGI servers) starts a writer of its own
+
+    Args:
+        logger (logging.Logger): Logger whose handlers are moved, defaults to root
+        maxsize (int): Records the queue holds before dropping new ones
+
+    Returns:
+        QueueListener: Started listener
+    """
+    global _listener, _queue_handler
+    logger = logger or logging.getLogger()
+    handlers = [
+        handler for handler in logger.handlers if not isinstance(handler, AsyncQueueHandler)
+    ]
+    first_start = _listener is None
+    if not first_start:
+        _listener.stop()
+        if not handlers:
+            handlers = list(_listener.handlers)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    _queue_handler = AsyncQueueHandler(queue.Queue(maxsize))
+    logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if first_start:
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_restart_listener)
+
+    return _listener
+
+
+def _stop_listener() -> None:
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener() -> None:
+    """Gives a forked child a fresh queue (its lock may have been held at
+    fork time) and a writer thread of its own"""
+    log_queue = queue.Queue(_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _listener.queue = log_queue
+    _listener._thread = None
+    _listener.start()
@@ -1,3 +1,11 @@
 from flaskr import (
     app,
 )  # importing the "app object" set in __init__.py in the flaskr package
+from flaskr.initialize import app_startup, cli_command_running
+
+# Serving entry point (`flask run`, see .flaskenv, or a WSGI server pointed
+# at flaskr.main:app): warming the conversion data before the first request and
+# queueing the data refresh in the background. Other `flask` commands loading
+# it start neither.
+if not cli_command_running():
+    app_startup()
@@ -0,0 +1,534 @@
+"""
+Process-local metrics registry with Prometheus text exposition
+
+The web app and the Celery workers are separate processes, so every process
+periodically writes a snapshot of its metrics to constants.METRICS_PATH and
+the /metrics endpoint merges the snapshots of all processes with its own live
+metrics: counters and histograms are summed, the most recently set gauge wins.
+"""
+import contextlib
+import json
+import math
+import os
+import socket
+import threading
+import time
+
+from flaskr import definitions as constants
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    """Base of the metric types: a family of samples keyed by label values"""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        """Constructor
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Names of the labels every sample carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> dict:
+        """Copy of the samples
+
+        Returns:
+            dict: Label values tuple -> sample value
+        """
+        with self._lock:
+            return {key: _copy(value) for key, value in self._samples.items()}
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down; samples remember when they were set so
+    the newest value wins when processes are merged"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = [float(value), time.time()]
+
+
+class Histogram(_Metric):
+    """Distribution of observations over cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> None:
+        """Constructor
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Names of the labels every sample carries
+            buckets (tuple): Upper bounds of the buckets, +Inf is implied
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._samples[key] = sample
+            for pos, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][pos] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """Metrics of this process plus the snapshots of the other processes"""
+
+    def __init__(self, snapshot_dir: str = constants.METRICS_PATH) -> None:
+        """Constructor
+
+        Args:
+            snapshot_dir (str): Directory the per-process snapshots go to
+        """
+        self.snapshot_dir = snapshot_dir
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._last_snapshot = 0.0
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector) -> None:
+        """Registers a callable run before every scrape, to set gauges that
+        are cheaper to compute on demand (e.g. dataset ages)
+
+        Args:
+            collector: Zero-argument callable
+        """
+        self._collectors.append(collector)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.snapshot_dir, f"{socket.gethostname()}-{os.getpid()}.json")
+
+    def snapshot(self) -> dict:
+        """Serializable state of this process' metrics
+
+        Returns:
+            dict: Metric name -> description and samples
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        snapshot = {}
+        for metric in metrics:
+            entry = {
+                "type": metric.type_name,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "samples": [[list(key), value] for key, value in metric.samples().items()],
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            snapshot[metric.name] = entry
+
+        return snapshot
+
+    def write_snapshot(self, force: bool = True) -> None:
+        """Writes this process' snapshot atomically
+
+        Args:
+            force (bool): Write even if the last snapshot is recent
+        """
+        now = time.time()
+        if not force and now - self._last_snapshot < constants.METRICS_SNAPSHOT_INTERVAL:
+            return
+
+        with self._snapshot_lock:
+            self._last_snapshot = now
+            if not os.path.exists(self.snapshot_dir):
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+            target = self.snapshot_path
+            temp_path = f"{target}.tmp"
+            with open(temp_path, "w") as file:
+                json.dump({"written_at": now, "metrics": self.snapshot()}, file)
+            os.replace(temp_path, target)
+
+    def _other_snapshots(self) -> list:
+        """Snapshots written by the other live processes; the ones left by
+        exited processes of this host or older than METRICS_SNAPSHOT_MAX_AGE
+        are deleted, so their counters stop adding up and the folder can't
+        grow with every restart"""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+
+        own = os.path.basename(self.snapshot_path)
+        oldest = time.time() - constants.METRICS_SNAPSHOT_MAX_AGE
+        snapshots = []
+        for name in os.listdir(self.snapshot_dir):
+            if name == own or not name.endswith(".json"):
+                continue
+            path = os.path.join(self.snapshot_dir, name)
+            if _exited(name):
+                _remove(path)
+                continue
+            try:
+                with open(path, "r") as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get("written_at", 0) >= oldest:
+                snapshots.append(snapshot["metrics"])
+            else:
+                _remove(path)
+
+        return snapshots
+
+    def collect(self) -> dict:
+        """Merges the live metrics with the other processes' snapshots
+
+        Returns:
+            dict: Metric name -> description and merged samples
+        """
+        for collector in self._collectors:
+            collector()
+
+        merged = {}
+        for snapshot in [self.snapshot()] + self._other_snapshots():
+            for name, entry in snapshot.items():
+                target = merged.setdefault(
+                    name, dict(entry, samples={})
+                )
+                if target["type"] != entry["type"]:
+                    continue
+                for key, value in entry["samples"]:
+                    key = tuple(key)
+                    target["samples"][key] = _merge_sample(
+                        entry["type"], target["samples"].get(key), value
+                    )
+
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text exposition (version 0.0.4) of the merged metrics
+
+        Returns:
+            str: Exposition body
+        """
+        lines = []
+        for name, entry in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(entry['help'])}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            labelnames = entry["labelnames"]
+            for key, value in sorted(entry["samples"].items()):
+                labels = list(zip(labelnames, key))
+                if entry["type"] == "histogram":
+                    for bound, count in zip(entry["buckets"], value["buckets"]):
+                        lines.append(
+                            _sample_line(f"{name}_bucket", labels + [("le", _format(bound))], count)
+                        )
+                    lines.append(
+                        _sample_line(f"{name}_bucket", labels + [("le", "+Inf")], value["count"])
+                    )
+                    lines.append(_sample_line(f"{name}_sum", labels, value["sum"]))
+                    lines.append(_sample_line(f"{name}_count", labels, value["count"]))
+                elif entry["type"] == "gauge":
+                    lines.append(_sample_line(name, labels, value[0]))
+                else:
+                    lines.append(_sample_line(name, labels, value))
+
+        return "\n".join(lines) + "\n"
+
+
+def _exited(snapshot_name: str) -> bool:
+    """Checks if the process that wrote a snapshot is known to have exited;
+    only processes of this host can be checked
+
+    Args:
+        snapshot_name (str): '<hostname>-<pid>.json' file name
+
+    Returns:
+        bool: True if the writer was a process of this host that is gone
+    """
+    hostname, _, pid = snapshot_name[: -len(".json")].rpartition("-")
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return False
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # Alive, but owned by another user
+        return False
+
+    return False
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _merge_sample(type_name: str, current, value):
+    """Combines the samples of one series from two processes"""
+    if current is None:
+        return _copy(value)
+    if type_name == "gauge":
+        return _copy(value) if value[1] >= current[1] else current
+    if type_name == "histogram":
+        return {
+            "buckets": [a + b for a, b in zip(current["buckets"], value["buckets"])],
+            "sum": current["sum"] + value["sum"],
+            "count": current["count"] + value["count"],
+        }
+    return current + value
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return f"{value:.1f}"
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _sample_line(name: str, labels: list, value) -> str:
+    if labels:
+        rendered = ",".join(
+            '{}="{}"'.format(
+                label, str(label_value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            )
+            for label, label_value in labels
+        )
+        return f"{name}{{{rendered}}} {_format(value)}"
+    return f"{name} {_format(value)}"
+
+
+registry = MetricsRegistry()
+
+# Upstream fetches
+FETCH_SECONDS = registry.histogram(
+    "wagescale_fetch_duration_seconds",
+    "Latency of upstream HTTP requests",
+    ("host", "status"),
+)
+FETCH_REQUESTS = registry.counter(
+    "wagescale_fetch_requests_total",
+    "Upstream HTTP requests by response status",
+    ("host", "status"),
+)
+FETCH_BYTES = registry.counter(
+    "wagescale_fetch_response_bytes_total",
+    "Bytes received from upstream",
+    ("host",),
+)
+FETCH_RETRIES = registry.counter(
+    "wagescale_fetch_retries_total",
+    "Retried upstream fetches",
+    ("dataset",),
+)
+CIRCUIT_OPEN = registry.gauge(
+    "wagescale_circuit_breaker_open",
+    "1 while the circuit breaker of an upstream is open",
+    ("upstream",),
+)
+
+# Pipeline stages
+STAGE_SECONDS = registry.histogram(
+    "wagescale_stage_duration_seconds",
+    "Duration of the parse and save stages of every dataset",
+    ("dataset", "stage"),
+)
+MERGE_SECONDS = registry.histogram(
+    "wagescale_merge_duration_seconds",
+    "Duration of the final data generation by merge path",
+    ("path",),
+)
+DATASET_ROWS = registry.gauge(
+    "wagescale_dataset_rows",
+    "Rows in the latest saved dataset",
+    ("dataset",),
+)
+DATASET_AGE = registry.gauge(
+    "wagescale_dataset_age_seconds",
+    "Seconds since the dataset file was last written",
+    ("dataset",),
+)
+
+# Refresh cadence
+REFRESH_INTERVAL_SECONDS = registry.gauge(
+    "wagescale_refresh_interval_seconds",
+    "Current refresh interval of every dataset",
+    ("dataset",),
+)
+QUOTA_REMAINING = registry.gauge(
+    "wagescale_upstream_quota_remaining",
+    "Upstream calls left this month for scheduled refreshes",
+    ("dataset",),
+)
+DATASET_STALE = registry.gauge(
+    "wagescale_dataset_stale",
+    "1 if the dataset is over its staleness budget or was never fetched",
+    ("dataset",),
+)
+
+# Celery tasks
+TASK_SECONDS = registry.histogram(
+    "wagescale_celery_task_duration_seconds",
+    "Duration of Celery tasks by final state",
+    ("task", "state"),
+)
+TASKS = registry.counter(
+    "wagescale_celery_tasks_total",
+    "Finished Celery tasks by final state",
+    ("task", "state"),
+)
+
+# App startup
+STARTUP_SECONDS = registry.gauge(
+    "wagescale_startup_duration_seconds",
+    "Duration of the app startup phases: package import and data warm-up",
+    ("phase",),
+)
+
+# Flask routes
+REQUEST_SECONDS = registry.histogram(
+    "wagescale_http_request_duration_seconds",
+    "Latency of the Flask routes",
+    ("endpoint", "method", "status"),
+)
+
+
+def _collect_dataset_ages() -> None:
+    """Sets the age gauge of every dataset file that exists"""
+    from flaskr.data import get_storage
+
+    storage = get_storage()
+    paths = {
+        "ppp": os.path.join(constants.FETCHED_DATA_PATH, constants.PPP_FILE_NAME),
+        "exchange_rate": os.path.join(constants.FETCHED_DATA_PATH, constants.EXCH_RATE_FILE_NAME),
+        "currency": os.path.join(constants.FETCHED_DATA_PATH, constants.CURRENCY_FILE_NAME),
+        "merged": os.path.join(
+            constants.GENERATED_DATA_PATH, constants.FINAL_MERGED_DATA_FILE_NAME
+        ),
+    }
+    now = time.time()
+    for dataset, path in paths.items():
+        try:
+            mtime = os.path.getmtime(storage.path_for(path))
+        except OSError:
+            continue
+        DATASET_AGE.set(now - mtime, dataset=dataset)
+
+
+registry.add_collector(_collect_dataset_ages)
+
+
+def init_request_metrics(app) -> None:
+    """Times every Flask request by endpoint, method and status
+
+    Args:
+        app (Flask): Application to instrument
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop("metrics_request_start", None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                endpoint=request.endpoint or "unmatched",
+                method=request.method,
+                status=response.status_code,
+            )
+            try:
+                registry.write_snapshot(force=False)
+            except OSError as e:
+                app.logger.warning("Metrics snapshot failed: %s", str(e))
+        return response
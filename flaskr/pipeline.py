@@ -0,0 +1,164 @@
+"""
+Plain-Python steps of the data refresh pipeline, shared by the Celery tasks
+"""
+import time
+
+from flaskr import app
+from flaskr.refresh_policy import CallLedger
+from flaskr.retries import UPSTREAMS, CircuitBreaker
+
+
+# Dataset name -> (service class, method fetching, parsing and saving that
+# dataset and returning success)
+FETCHERS = {
+    "ppp": ("PPPData", "get_ppp_data"),
+    "exchange_rate": ("ExchangeRateData", "get_exch_rate_data"),
+    "currency": ("CurrencyData", "get_currency_data"),
+}
+
+
+def _service(dataset: str):
+    # The services (and pandas) are imported on first use, so the web app can
+    # import the tasks to queue them without loading them
+    from flaskr.api import services
+
+    return getattr(services, FETCHERS[dataset][0])()
+
+
+def fetch_dataset(dataset: str) -> dict:
+    """Runs one independent fetch branch of the refresh and times it; the
+    upstream isn't called while its circuit breaker is open
+
+    Args:
+        dataset (str): One of the FETCHERS keys
+
+    Returns:
+        dict: Outcome of the branch with 'dataset', 'success', 'changed'
+              (new data saved), 'fetched' (upstream answered), 'retryable'
+              (failed on an error worth retrying), 'breaker_open',
+              'bytes_fetched', 'rows_parsed' (None if nothing was parsed),
+              'started_at' (epoch seconds) and 'duration' (seconds)
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    breaker = CircuitBreaker(UPSTREAMS[dataset])
+    changed, fetched, retryable, breaker_open = False, False, False, False
+    bytes_fetched, rows_parsed = 0, None
+    try:
+        serve_api = _service(dataset)
+        if not breaker.allow():
+            breaker_open = True
+            app.logger.warning(
+                "Circuit breaker of %s is open, keeping the %s data already fetched",
+                UPSTREAMS[dataset],
+                dataset,
+            )
+            success = serve_api._check_available_data()
+        else:
+            success = getattr(serve_api, FETCHERS[dataset][1])()
+            changed, fetched = serve_api.changed, serve_api.fetched
+            bytes_fetched, rows_parsed = serve_api.bytes_fetched, serve_api.rows_parsed
+            if fetched:
+                breaker.record_success()
+            elif serve_api.upstream_error is not None:
+                breaker.record_failure()
+                retryable = True
+    except Exception as e:
+        app.logger.exception("Fetch branch %s failed: %s", dataset, str(e))
+        success = False
+    duration = time.perf_counter() - start
+    # Only an upstream answer counts as a refresh, not falling back to old data
+    if fetched:
+        # The branch still has to return its outcome, or the merge never runs
+        try:
+            CallLedger().record_refresh(dataset, now=started_at)
+        except OSError as e:
+            app.logger.warning("Call ledger write failed for %s: %s", dataset, str(e))
+
+    app.logger.info(
+        "Fetch branch %s finished in %.3fs (success=%s, changed=%s, retryable=%s)",
+        dataset,
+        duration,
+        success,
+        changed,
+        retryable,
+    )
+    return {
+        "dataset": dataset,
+        "success": success,
+        "changed": changed,
+        "fetched": fetched,
+        "retryable": retryable,
+        "breaker_open": breaker_open,
+        "bytes_fetched": bytes_fetched,
+        "rows_parsed": rows_parsed,
+        "started_at": started_at,
+        "duration": duration,
+    }
+
+
+def merge_datasets(branch_results: list = None) -> dict:
+    """Merges the fetched datasets once every fetch branch has finished; the
+    merge is skipped when no branch saved new data and merged data exists
+
+    Args:
+        branch_results (list): Outcomes returned by fetch_dataset
+
+    Returns:
+        dict: Outcome of the merge with the generation published, the merged
+              rows and the countries dropped (None when nothing was merged),
+              and the branch outcomes under 'branches'
+    """
+    branch_results = [
+        result for result in (branch_results or []) if isinstance(result, dict)
+    ]
+    for result in branch_results:
+        app.logger.info(
+            "Branch %s: success=%s, duration=%.3fs, retries=%s",
+            result.get("dataset"),
+            result.get("success"),
+            result.get("duration", 0.0),
+            result.get("retries", 0),
+        )
+
+    from flaskr.api.services import GenerateData
+
+    started_at = time.time()
+    start = time.perf_counter()
+    generator = GenerateData()
+    skipped = (
+        len(branch_results) > 0
+        and not any(result.get("changed") for result in branch_results)
+        and generator.final_data_exists()
+    )
+    if skipped:
+        app.logger.info("No fetched dataset changed, skipping the merge")
+        generator.merge_path = "skipped"
+        success = True
+    else:
+        try:
+            success = generator.generate_merged_final_data()
+        except Exception as e:
+            app.logger.exception("Merge of fetched data failed: %s", str(e))
+            success = False
+    duration = time.perf_counter() - start
+
+    app.logger.info(
+        "Merge finished in %.3fs (success=%s, path=%s)",
+        duration,
+        success,
+        generator.merge_path,
+    )
+    return {
+        "dataset": "merged",
+        "success": success,
+        "skipped": skipped,
+        "merge_path": generator.merge_path,
+        "generation": generator.generation,
+        "rows_merged": generator.rows_merged,
+        "rows_dropped": generator.rows_dropped,
+        "started_at": started_at,
+        "duration": duration,
+        "retries": sum(result.get("retries", 0) for result in branch_results),
+        "branches": branch_results,
+    }
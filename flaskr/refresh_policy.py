@@ -0,0 +1,261 @@
+"""
+Per-dataset refresh cadence: every dataset has its own interval and
+staleness budget, and the exchange rate interval stretches to keep the
+openexchangerates.org calls within the monthly quota. Upstream calls and
+refresh times are kept in a persisted ledger so restarts don't reset them.
+"""
+import calendar
+import fcntl
+import json
+import os
+import time
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.metrics import DATASET_STALE, QUOTA_REMAINING, REFRESH_INTERVAL_SECONDS
+
+
+# Dataset -> fetched file, whose mtime stands in for a refresh the ledger
+# doesn't know about (data fetched before the ledger existed)
+DATASET_FILES = {
+    "ppp": constants.PPP_FILE_NAME,
+    "exchange_rate": constants.EXCH_RATE_FILE_NAME,
+    "currency": constants.CURRENCY_FILE_NAME,
+}
+
+
+def _month(now: float) -> str:
+    return time.strftime("%Y-%m", time.gmtime(now))
+
+
+def _seconds_to_month_end(now: float) -> float:
+    current = time.gmtime(now)
+    days = calendar.monthrange(current.tm_year, current.tm_mon)[1]
+    month_end = calendar.timegm((current.tm_year, current.tm_mon, days, 0, 0, 0)) + 86400
+    return max(month_end - now, 0.0)
+
+
+class CallLedger:
+    """Upstream calls per dataset and calendar month (UTC) and the time of
+    the last successful refresh of every dataset, persisted as JSON beside
+    the fetched data; an flock on a side file serializes the writers"""
+
+    def __init__(self, path: str = None) -> None:
+        """Constructor
+
+        Args:
+            path (str): Ledger file path
+        """
+        self.path = path or os.path.join(
+            constants.FETCHED_DATA_PATH, constants.CALL_LEDGER_FILE_NAME
+        )
+
+    def _locked(self):
+        """Opens and flocks the side file of the ledger; closing releases it"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        file = open(self.path + ".lock", "a")
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r") as file:
+                ledger = json.load(file)
+        except FileNotFoundError:
+            ledger = {}
+        except (OSError, ValueError) as e:
+            app.logger.warning("Ignoring unreadable call ledger: %s", str(e))
+            ledger = {}
+
+        ledger.setdefault("calls", {})
+        ledger.setdefault("refreshed_at", {})
+        return ledger
+
+    def _write(self, ledger: dict) -> None:
+        temp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(temp_path, "w") as file:
+            json.dump(ledger, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def record_call(self, dataset: str, now: float = None) -> int:
+        """Counts one upstream call of a dataset
+
+        Args:
+            dataset (str): Dataset the call fetched
+            now (float): Epoch seconds of the call
+
+        Returns:
+            int: Calls of the dataset this month, this one included
+        """
+        now = time.time() if now is None else now
+        with self._locked():
+            ledger = self._read()
+            entry = ledger["calls"].get(dataset, {})
+            if entry.get("month") != _month(now):
+                entry = {"month": _month(now), "count": 0}
+            entry["count"] += 1
+            ledger["calls"][dataset] = entry
+            self._write(ledger)
+
+        return entry["count"]
+
+    def calls_this_month(self, dataset: str, now: float = None) -> int:
+        """Upstream calls of a dataset in the current calendar month
+
+        Args:
+            dataset (str): Dataset name
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            int: Call count
+        """
+        now = time.time() if now is None else now
+        entry = self._read()["calls"].get(dataset, {})
+        return entry.get("count", 0) if entry.get("month") == _month(now) else 0
+
+    def record_refresh(self, dataset: str, now: float = None) -> None:
+        """Stores the time of a successful refresh of a dataset
+
+        Args:
+            dataset (str): Dataset name
+            now (float): Epoch seconds of the refresh
+        """
+        with self._locked():
+            ledger = self._read()
+            ledger["refreshed_at"][dataset] = time.time() if now is None else now
+            self._write(ledger)
+
+    def last_refresh(self, dataset: str):
+        """Time of the last successful refresh of a dataset
+
+        Args:
+            dataset (str): Dataset name
+
+        Returns:
+            float | None: Epoch seconds, None if never recorded
+        """
+        return self._read()["refreshed_at"].get(dataset)
+
+
+class RefreshPolicy:
+    """Decides which datasets are due for a refresh"""
+
+    def __init__(
+        self,
+        ledger: CallLedger = None,
+        intervals: dict = None,
+        staleness_budgets: dict = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            ledger (CallLedger): Call and refresh ledger
+            intervals (dict): Dataset -> seconds between refreshes
+            staleness_budgets (dict): Dataset -> seconds before it's flagged stale
+        """
+        self.ledger = ledger or CallLedger()
+        self.intervals = intervals or constants.DATASET_REFRESH_INTERVALS
+        self.staleness_budgets = staleness_budgets or constants.DATASET_STALENESS_BUDGETS
+
+    def exchange_rate_budget(self, now: float = None) -> int:
+        """openexchangerates.org calls left this month for scheduled
+        refreshes, the reserve excluded
+
+        Args:
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            int: Calls left, 0 or less when the budget is spent
+        """
+        quota = int(
+            constants.EXCHANGE_RATE_MONTHLY_QUOTA * (1 - constants.EXCHANGE_RATE_QUOTA_RESERVE)
+        )
+        return quota - self.ledger.calls_this_month("exchange_rate", now)
+
+    def interval(self, dataset: str, now: float = None) -> float:
+        """Seconds between refreshes of a dataset; for the exchange rates the
+        calls left this month are spread evenly over the rest of the month
+
+        Args:
+            dataset (str): Dataset name
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            float: Interval, inf when the exchange rate budget is spent
+        """
+        now = time.time() if now is None else now
+        interval = float(self.intervals[dataset])
+        if dataset == "exchange_rate":
+            budget = self.exchange_rate_budget(now)
+            QUOTA_REMAINING.set(budget, dataset=dataset)
+            if budget <= 0:
+                interval = float("inf")
+            else:
+                interval = max(interval, _seconds_to_month_end(now) / budget)
+
+        REFRESH_INTERVAL_SECONDS.set(interval, dataset=dataset)
+        return interval
+
+    def last_refresh(self, dataset: str):
+        """Time of the last refresh: from the ledger, else the mtime of the
+        fetched file
+
+        Args:
+            dataset (str): Dataset name
+
+        Returns:
+            float | None: Epoch seconds, None if the dataset was never fetched
+        """
+        refreshed_at = self.ledger.last_refresh(dataset)
+        if refreshed_at is not None:
+            return refreshed_at
+
+        from flaskr.data import get_storage
+
+        path = get_storage().path_for(
+            os.path.join(constants.FETCHED_DATA_PATH, DATASET_FILES[dataset])
+        )
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def due_datasets(self, now: float = None) -> list:
+        """Datasets whose interval has elapsed since their last refresh (or
+        that were never fetched); datasets over their staleness budget are
+        logged and flagged
+
+        Args:
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            list: Due dataset names
+        """
+        now = time.time() if now is None else now
+        due = []
+        for dataset in self.intervals:
+            refreshed_at = self.last_refresh(dataset)
+            interval = self.interval(dataset, now)
+            if refreshed_at is None:
+                due.append(dataset)
+                DATASET_STALE.set(1, dataset=dataset)
+                continue
+
+            age = now - refreshed_at
+            stale = age > self.staleness_budgets[dataset]
+            DATASET_STALE.set(1 if stale else 0, dataset=dataset)
+            if stale:
+                app.logger.warning(
+                    "%s data is %.0fs old, over its staleness budget of %ss",
+                    dataset,
+                    age,
+                    self.staleness_budgets[dataset],
+                )
+            if age >= interval:
+                due.append(dataset)
+            elif interval == float("inf"):
+                app.logger.warning(
+                    "%s quota spent for this month, not refreshing it", dataset
+                )
+
+        return due
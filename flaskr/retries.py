@@ -0,0 +1,145 @@
+"""
+Retry policy of the upstream fetches: exponential backoff with full jitter
+under a cap on the total retry time, and per-upstream circuit breakers
+persisted beside the fetched data so every process sees the same state.
+Retries are rescheduled (Celery countdown, embedded scheduler wake-up), never
+slept through.
+"""
+import json
+import os
+import random
+import time
+
+import requests
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.metrics import CIRCUIT_OPEN
+
+
+# Dataset -> upstream it's fetched from, one circuit breaker per upstream
+UPSTREAMS = {
+    "ppp": "worldbank",
+    "exchange_rate": "openexchangerates",
+    "currency": "datahub",
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request is worth retrying: connection errors,
+    timeouts, 429 and 5xx answers
+
+    Args:
+        error (Exception): Error raised by the request
+
+    Returns:
+        bool: True if a later attempt may succeed
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = getattr(error.response, "status_code", None)
+        return status is None or status == 429 or status >= 500
+
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+def retry_delay(attempt: int, first_attempt_at: float, now: float = None):
+    """Delay before the next attempt: exponential backoff with full jitter
+
+    Args:
+        attempt (int): Retries made so far (0 after the first attempt failed)
+        first_attempt_at (float): Epoch seconds of the first attempt
+        now (float): Epoch seconds, defaults to now
+
+    Returns:
+        float | None: Seconds to wait, None if the attempts or the total
+                      retry time are used up
+    """
+    if attempt + 1 >= constants.REQUEST_TRY_COUNT:
+        return None
+
+    now = time.time() if now is None else now
+    ceiling = min(constants.RETRY_MAX_DELAY, constants.RETRY_BASE_DELAY * 2**attempt)
+    delay = random.uniform(constants.RETRY_BASE_DELAY / 2, ceiling)
+    if now + delay - first_attempt_at > constants.RETRY_MAX_TOTAL:
+        return None
+
+    return delay
+
+
+class CircuitBreaker:
+    """Circuit breaker of one upstream: opens after a run of failed fetches,
+    lets one trial fetch through once the reset timeout has passed (half
+    open) and closes again on a success"""
+
+    def __init__(self, upstream: str, directory: str = None) -> None:
+        """Constructor
+
+        Args:
+            upstream (str): Upstream name, see UPSTREAMS
+            directory (str): Where the state file goes, defaults to the
+                             fetched data folder
+        """
+        self.upstream = upstream
+        self.path = os.path.join(
+            directory or constants.FETCHED_DATA_PATH, f".{upstream}.breaker.json"
+        )
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"failures": 0, "opened_at": None}
+
+    def _write(self, state: dict) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.path)
+        CIRCUIT_OPEN.set(0 if state["opened_at"] is None else 1, upstream=self.upstream)
+
+    def allow(self, now: float = None) -> bool:
+        """Whether a fetch may go out: the breaker is closed, or open for
+        longer than the reset timeout
+
+        Args:
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            bool: True if the upstream may be called
+        """
+        opened_at = self._read()["opened_at"]
+        if opened_at is None:
+            return True
+
+        now = time.time() if now is None else now
+        return now - opened_at >= constants.BREAKER_RESET_TIMEOUT
+
+    def record_success(self) -> None:
+        """Closes the breaker"""
+        state = self._read()
+        if state["failures"] or state["opened_at"] is not None:
+            if state["opened_at"] is not None:
+                app.logger.info("Circuit breaker of %s closed", self.upstream)
+            self._write({"failures": 0, "opened_at": None})
+
+    def record_failure(self, now: float = None) -> None:
+        """Counts a failed fetch, opening (or re-opening, after a failed
+        trial) the breaker at the threshold
+
+        Args:
+            now (float): Epoch seconds, defaults to now
+        """
+        now = time.time() if now is None else now
+        state = self._read()
+        state["failures"] += 1
+        if state["failures"] >= constants.BREAKER_FAILURE_THRESHOLD:
+            if state["opened_at"] is None:
+                app.logger.warning(
+                    "Circuit breaker of %s opened after %s failed fetches",
+                    self.upstream,
+                    state["failures"],
+                )
+            state["opened_at"] = now
+        self._write(state)
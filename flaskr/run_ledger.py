@@ -0,0 +1,345 @@
+"""
+History of the data refresh runs in a local SQLite file: trigger, outcome and
+duration of every run, and per stage (fetch branches and merge) the timing,
+bytes fetched and rows parsed, merged or dropped, to spot a slow upstream or
+a shrinking merge
+"""
+import os
+import sqlite3
+import time
+import uuid
+
+import click
+from flask.cli import AppGroup
+
+from flaskr import app
+from flaskr import definitions as constants
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    trigger TEXT NOT NULL,
+    datasets TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    duration REAL,
+    outcome TEXT NOT NULL,
+    merge_path TEXT,
+    generation INTEGER,
+    rows_merged INTEGER,
+    rows_dropped INTEGER,
+    retries INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    changed INTEGER,
+    bytes_fetched INTEGER,
+    rows INTEGER,
+    rows_dropped INTEGER,
+    retries INTEGER,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+RUN_COLUMNS = (
+    "id",
+    "trigger",
+    "datasets",
+    "started_at",
+    "finished_at",
+    "duration",
+    "outcome",
+    "merge_path",
+    "generation",
+    "rows_merged",
+    "rows_dropped",
+    "retries",
+)
+
+
+def _outcome(result: dict) -> str:
+    """'success', 'partial' (merged, but a fetch branch failed) or 'failure'"""
+    if not result or not result.get("success"):
+        return "failure"
+    if not all(branch.get("success") for branch in result.get("branches", [])):
+        return "partial"
+    return "success"
+
+
+class RunLedger:
+    """Run and stage rows in SQLite; every call opens its own connection, so
+    the web app, the embedded scheduler and the Celery workers can share the
+    file. Failures to write are logged, never raised into the refresh."""
+
+    def __init__(self, path: str = None) -> None:
+        """Constructor
+
+        Args:
+            path (str): SQLite file, defaults to constants.RUN_LEDGER_PATH
+        """
+        self.path = path or constants.RUN_LEDGER_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=constants.RUN_LEDGER_TIMEOUT)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _write(self, statements: list) -> bool:
+        """Runs (sql, params) statements in one transaction
+
+        Returns:
+            bool: False if the ledger couldn't be written
+        """
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    for sql, params in statements:
+                        connection.execute(sql, params)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            app.logger.warning("Run ledger write failed: %s", str(e))
+            return False
+
+        return True
+
+    def start_run(self, trigger: str, datasets: list, now: float = None) -> str:
+        """Records a run that just started; runs still unfinished after the
+        refresh lease TTL are marked abandoned
+
+        Args:
+            trigger (str): What fired the run, e.g. 'beat', 'startup', 'manual'
+            datasets (list): Datasets the run fetches
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            str: Run id to pass to finish_run
+        """
+        now = time.time() if now is None else now
+        run_id = uuid.uuid4().hex
+        self._write(
+            [
+                (
+                    "UPDATE runs SET outcome = 'abandoned' "
+                    "WHERE outcome = 'running' AND started_at < ?",
+                    (now - constants.REFRESH_LOCK_TTL,),
+                ),
+                (
+                    "INSERT INTO runs (id, trigger, datasets, started_at, outcome) "
+                    "VALUES (?, ?, ?, ?, 'running')",
+                    (run_id, trigger, ",".join(datasets), now),
+                ),
+            ]
+        )
+        return run_id
+
+    def finish_run(self, run_id: str, result: dict = None, now: float = None) -> None:
+        """Records the outcome of a run and its stages
+
+        Args:
+            run_id (str): Id returned by start_run
+            result (dict): Outcome of pipeline.merge_datasets, with the branch
+                           outcomes; None if the run failed before the merge
+            now (float): Epoch seconds, defaults to now
+        """
+        now = time.time() if now is None else now
+        result = result or {}
+        # (stage, outcome, rows, rows dropped, retries)
+        stages = [
+            (branch["dataset"], branch, branch.get("rows_parsed"), None, branch.get("retries", 0))
+            for branch in result.get("branches", [])
+        ]
+        if "started_at" in result:
+            stages.append(
+                ("merge", result, result.get("rows_merged"), result.get("rows_dropped"), None)
+            )
+
+        statements = [
+            (
+                "UPDATE runs SET finished_at = ?, duration = ? - started_at, outcome = ?, "
+                "merge_path = ?, generation = ?, rows_merged = ?, rows_dropped = ?, retries = ? "
+                "WHERE id = ?",
+                (
+                    now,
+                    now,
+                    _outcome(result),
+                    result.get("merge_path"),
+                    result.get("generation"),
+                    result.get("rows_merged"),
+                    result.get("rows_dropped"),
+                    result.get("retries", 0),
+                    run_id,
+                ),
+            )
+        ]
+        for stage, outcome, rows, rows_dropped, retries in stages:
+            statements.append(
+                (
+                    "INSERT OR REPLACE INTO stages (run_id, stage, started_at, finished_at, "
+                    "duration, success, changed, bytes_fetched, rows, rows_dropped, retries) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        stage,
+                        outcome["started_at"],
+                        outcome["started_at"] + outcome["duration"],
+                        outcome["duration"],
+                        int(bool(outcome.get("success"))),
+                        None if "changed" not in outcome else int(bool(outcome["changed"])),
+                        outcome.get("bytes_fetched"),
+                        rows,
+                        rows_dropped,
+                        retries,
+                    ),
+                )
+            )
+        self._write(statements)
+
+    def runs(self, limit: int = 20, trigger: str = None) -> list:
+        """Latest runs, newest first, with their stages
+
+        Args:
+            limit (int): Most runs returned
+            trigger (str): Only the runs fired by this trigger
+
+        Returns:
+            list: One dict per run, its stages under 'stages'
+        """
+        where, params = "", []
+        if trigger:
+            where, params = "WHERE trigger = ?", [trigger]
+        connection = self._connect()
+        try:
+            runs = [
+                dict(row)
+                for row in connection.execute(
+                    f"SELECT {', '.join(RUN_COLUMNS)} FROM runs {where} "
+                    "ORDER BY started_at DESC LIMIT ?",
+                    params + [limit],
+                )
+            ]
+            for run in runs:
+                run["datasets"] = run["datasets"].split(",") if run["datasets"] else []
+                run["stages"] = [
+                    dict(row)
+                    for row in connection.execute(
+                        "SELECT stage, started_at, finished_at, duration, success, changed, "
+                        "bytes_fetched, rows, rows_dropped, retries FROM stages "
+                        "WHERE run_id = ? ORDER BY started_at",
+                        (run["id"],),
+                    )
+                ]
+        finally:
+            connection.close()
+
+        return runs
+
+    def trends(self, days: int = 30, now: float = None) -> list:
+        """Per stage over a window: run count, failures, mean and latest
+        duration, bytes and rows, so a slowing upstream or a shrinking merge
+        stands out against its own average
+
+        Args:
+            days (int): Window, counted back from now
+            now (float): Epoch seconds, defaults to now
+
+        Returns:
+            list: One dict per stage
+        """
+        now = time.time() if now is None else now
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                """
+                SELECT stage,
+                       COUNT(*) AS runs,
+                       SUM(success = 0) AS failures,
+                       AVG(duration) AS mean_duration,
+                       MAX(duration) AS max_duration,
+                       AVG(bytes_fetched) AS mean_bytes_fetched,
+                       AVG(rows) AS mean_rows,
+                       MIN(rows) AS min_rows,
+                       MAX(rows) AS max_rows
+                FROM stages
+                WHERE started_at >= ?
+                GROUP BY stage
+                ORDER BY stage
+                """,
+                (now - days * 86400,),
+            ).fetchall()
+            trends = []
+            for row in rows:
+                trend = dict(row)
+                latest = connection.execute(
+                    "SELECT duration, bytes_fetched, rows FROM stages "
+                    "WHERE stage = ? AND started_at >= ? ORDER BY started_at DESC LIMIT 1",
+                    (row["stage"], now - days * 86400),
+                ).fetchone()
+                trend["latest_duration"] = latest["duration"]
+                trend["latest_bytes_fetched"] = latest["bytes_fetched"]
+                trend["latest_rows"] = latest["rows"]
+                trends.append(trend)
+        finally:
+            connection.close()
+
+        return trends
+
+
+runs_cli = AppGroup("runs", help="Data refresh run history")
+
+
+def _format(value, unit: str = "", scale: float = 1.0, digits: int = 0) -> str:
+    return "-" if value is None else f"{value * scale:.{digits}f}{unit}"
+
+
+@runs_cli.command("list")
+@click.option("--limit", default=20, show_default=True, help="Runs shown")
+@click.option("--trigger", default=None, help="Only runs fired by this trigger")
+def list_command(limit, trigger):
+    """Lists the latest runs with the duration and rows of every stage"""
+    for run in RunLedger().runs(limit=limit, trigger=trigger):
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+        print(
+            f"{started} {run['trigger']:>8} {run['outcome']:>9} "
+            f"{_format(run['duration'], 's', digits=1):>8} merged {_format(run['rows_merged'])} "
+            f"dropped {_format(run['rows_dropped'])} path {run['merge_path'] or '-'}"
+        )
+        for stage in run["stages"]:
+            print(
+                f"    {stage['stage']:>13} {_format(stage['duration'], 's', digits=2):>8} "
+                f"{_format(stage['bytes_fetched'], ' KiB', 1 / 1024, 1):>12} "
+                f"rows {_format(stage['rows'])} {'ok' if stage['success'] else 'FAILED'}"
+            )
+
+
+@runs_cli.command("trends")
+@click.option("--days", default=30, show_default=True, help="Window in days")
+def trends_command(days):
+    """Per stage means against the latest run, to spot slow upstreams and
+    shrinking merges"""
+    print(
+        f"{'stage':>13} {'runs':>5} {'failed':>6} {'mean s':>8} {'latest s':>8} "
+        f"{'mean KiB':>9} {'latest KiB':>10} {'mean rows':>9} {'latest rows':>11}"
+    )
+    for trend in RunLedger().trends(days=days):
+        print(
+            f"{trend['stage']:>13} {trend['runs']:>5} {trend['failures']:>6} "
+            f"{_format(trend['mean_duration'], digits=2):>8} "
+            f"{_format(trend['latest_duration'], digits=2):>8} "
+            f"{_format(trend['mean_bytes_fetched'], scale=1 / 1024, digits=1):>9} "
+            f"{_format(trend['latest_bytes_fetched'], scale=1 / 1024, digits=1):>10} "
+            f"{_format(trend['mean_rows']):>9} {_format(trend['latest_rows']):>11}"
+        )
+
+
+app.cli.add_command(runs_cli)
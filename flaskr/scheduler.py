@@ -0,0 +1,222 @@
+"""
+Embedded scheduler running the data refresh inside the app process, for
+deployments without a Celery broker (CELERY_BROKER_URL set to "")
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr import pipeline
+from flaskr.locks import get_refresh_lock
+from flaskr.refresh_policy import RefreshPolicy
+from flaskr.retries import retry_delay
+from flaskr.run_ledger import RunLedger
+from flaskr.metrics import FETCH_RETRIES, TASK_SECONDS, TASKS, registry
+
+
+def use_embedded_scheduler() -> bool:
+    """Whether the refresh runs in-process, i.e. no broker is configured
+
+    Returns:
+        bool: True if CELERY_BROKER_URL is empty
+    """
+    return not constants.CELERY_BROKER_URL
+
+
+class EmbeddedScheduler:
+    """Background thread ticking on the beat cadence and running the same
+    fetch branches and merge as the Celery task flow for the datasets that
+    are due; the fetch branches run concurrently on a thread pool, the merge
+    once all of them have finished. A branch failing on a retryable error is
+    rescheduled with backoff: the thread wakes up early for it."""
+
+    def __init__(
+        self,
+        interval: float = constants.REFRESH_TICK_INTERVAL,
+        workers: int = constants.EMBEDDED_SCHEDULER_WORKERS,
+    ) -> None:
+        """Constructor
+
+        Args:
+            interval (float): Seconds between ticks
+            workers (int): Fetch branches run concurrently
+        """
+        self.interval = interval
+        self.workers = workers
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+        # Dataset -> {"retries", "first_attempt_at", "due_at"} of pending retries
+        self._retries = {}
+
+    def run_refresh(self, trigger: str = "manual", datasets: list = None) -> dict:
+        """Runs one refresh: the fetch branches of the due datasets, then the
+        merge; joins the refresh in flight instead if another worker or
+        trigger started one
+
+        Args:
+            trigger (str): What fired the refresh: 'startup', 'schedule' or 'manual'
+            datasets (list): Datasets to fetch regardless of the policy, by
+                             default the ones that are due
+
+        Returns:
+            dict | None: Outcome of the merge with the branch outcomes, see
+                         pipeline.merge_datasets; None if coalesced or
+                         nothing was due
+        """
+        lock = get_refresh_lock()
+        lease_token = lock.acquire(trigger)
+        if lease_token is None:
+            return None
+
+        start = time.perf_counter()
+        try:
+            if not datasets:
+                now = time.time()
+                datasets = RefreshPolicy().due_datasets(now)
+                datasets += [
+                    dataset
+                    for dataset, pending in self._retries.items()
+                    if pending["due_at"] <= now and dataset not in datasets
+                ]
+            if not datasets:
+                app.logger.debug("No dataset due for a refresh (trigger %s)", trigger)
+                return None
+
+            app.logger.info("Refreshing %s (trigger %s)", ", ".join(datasets), trigger)
+            ledger = RunLedger()
+            run_id = ledger.start_run(trigger, datasets)
+            result = None
+            try:
+                with ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="refresh-fetch"
+                ) as executor:
+                    branch_results = list(executor.map(pipeline.fetch_dataset, datasets))
+                for branch_result in branch_results:
+                    self._schedule_retry(branch_result)
+                result = pipeline.merge_datasets(branch_results=branch_results)
+            finally:
+                ledger.finish_run(run_id, result)
+        finally:
+            lock.release(lease_token)
+
+        state = "SUCCESS" if result["success"] else "FAILURE"
+        TASK_SECONDS.observe(time.perf_counter() - start, task="scheduler.refresh", state=state)
+        TASKS.inc(task="scheduler.refresh", state=state)
+        try:
+            registry.write_snapshot()
+        except OSError as e:
+            app.logger.warning("Metrics snapshot failed: %s", str(e))
+
+        return result
+
+    def _schedule_retry(self, branch_result: dict) -> None:
+        """Sets the retry count of a branch outcome and schedules its next
+        attempt if it failed on a retryable error
+
+        Args:
+            branch_result (dict): Outcome of a fetch branch, updated in place
+        """
+        dataset = branch_result["dataset"]
+        pending = self._retries.pop(dataset, None)
+        branch_result["retries"] = pending["retries"] if pending else 0
+        if not branch_result["retryable"]:
+            return
+
+        first_attempt_at = pending["first_attempt_at"] if pending else branch_result["started_at"]
+        delay = retry_delay(branch_result["retries"], first_attempt_at)
+        if delay is None:
+            app.logger.error(
+                "Giving up on the %s fetch after %s retries", dataset, branch_result["retries"]
+            )
+            return
+
+        FETCH_RETRIES.inc(dataset=dataset)
+        self._retries[dataset] = {
+            "retries": branch_result["retries"] + 1,
+            "first_attempt_at": first_attempt_at,
+            "due_at": time.time() + delay,
+        }
+        app.logger.warning(
+            "Retrying the %s fetch in %.1fs (retry %s)",
+            dataset,
+            delay,
+            branch_result["retries"] + 1,
+        )
+
+    def _next_wait(self) -> float:
+        """Seconds until the next tick or pending retry, whichever is first"""
+        if not self._retries:
+            return self.interval
+
+        due_at = min(pending["due_at"] for pending in self._retries.values())
+        return max(0.0, min(self.interval, due_at - time.time()))
+
+    def _run(self, run_now: bool) -> None:
+        """Scheduler loop; a failed refresh is logged and retried next time"""
+        trigger = "startup"
+        if not run_now:
+            trigger = "schedule"
+            self._wake_event.wait(self._next_wait())
+        while not self._stop_event.is_set():
+            if self._wake_event.is_set():
+                trigger = "manual"
+            self._wake_event.clear()
+            try:
+                self.run_refresh(trigger)
+            except Exception as e:
+                app.logger.exception("Embedded data refresh failed: %s", str(e))
+            trigger = "schedule"
+            self._wake_event.wait(self._next_wait())
+
+    def start(self, run_now: bool = True) -> None:
+        """Starts the scheduler thread
+
+        Args:
+            run_now (bool): Refresh right away instead of after one interval
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._wake_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(run_now,),
+            name="embedded-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+        app.logger.info(
+            "Embedded scheduler started, checking for due datasets every %ss", self.interval
+        )
+
+    def trigger(self) -> None:
+        """Runs a refresh now instead of at the next scheduled time"""
+        self._wake_event.set()
+
+    def stop(self) -> None:
+        """Stops the scheduler after the refresh in progress, if any"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> EmbeddedScheduler:
+    """Returns the process wide embedded scheduler (not started)
+
+    Returns:
+        EmbeddedScheduler: Shared scheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = EmbeddedScheduler()
+
+    return _scheduler
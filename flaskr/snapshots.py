@@ -0,0 +1,253 @@
+"""
+Versioned snapshots of the generated data: every merge is written to a
+private staging directory, fsynced, then published as an immutable generation
+directory by atomically flipping the `current` symlink the readers go
+through. The last SNAPSHOT_KEEP generations are kept to roll back to.
+"""
+import os
+import shutil
+import time
+import uuid
+
+import click
+from flask.cli import AppGroup
+
+from flaskr import app
+from flaskr import definitions as constants
+from flaskr.data import read_generation
+
+STAGING_PREFIX = ".staging-"
+
+
+def snapshot_name(generation: int) -> str:
+    return f"{generation:08d}"
+
+
+def _fsync(path: str) -> None:
+    """Flushes a file or directory to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SnapshotStore:
+    """Generation directories of the generated data under `snapshots/` and
+    the `current` symlink pointing at the one being served. Published
+    directories are never written to again: a merge stages a hard-linked copy
+    of the current generation, and the savers replace files (new inodes)
+    instead of rewriting them."""
+
+    def __init__(self, link_path: str = None, keep: int = constants.SNAPSHOT_KEEP) -> None:
+        """Constructor
+
+        Args:
+            link_path (str): Path of the `current` symlink, defaults to
+                             constants.GENERATED_DATA_PATH
+            keep (int): Published generations kept, the current one included
+        """
+        self.link_path = link_path or constants.GENERATED_DATA_PATH
+        self.root = os.path.dirname(self.link_path)
+        self.directory = os.path.join(self.root, constants.SNAPSHOTS_DIR_NAME)
+        self.keep = keep
+
+    def current(self):
+        """Name of the generation the readers are pointed at
+
+        Returns:
+            str | None: Snapshot name, None before the first publish
+        """
+        try:
+            return os.path.basename(os.readlink(self.link_path))
+        except OSError:
+            return None
+
+    def list(self) -> list:
+        """Published generations, oldest first
+
+        Returns:
+            list: Snapshot names
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        return sorted(name for name in names if not name.startswith("."))
+
+    def latest_generation(self) -> int:
+        """Highest published generation number, 0 if none
+
+        Returns:
+            int: Generation number
+        """
+        names = [name for name in self.list() if name.isdigit()]
+        return int(names[-1]) if names else 0
+
+    def ensure_layout(self) -> None:
+        """Creates the snapshot directory and the `current` symlink on first
+        use; data files left directly in the generated data folder by an
+        older version are moved into the first generation"""
+        if os.path.lexists(self.link_path):
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        staging = self._new_staging()
+        legacy = [
+            name
+            for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name))
+        ]
+        for name in legacy:
+            os.replace(os.path.join(self.root, name), os.path.join(staging, name))
+
+        name = snapshot_name(read_generation(staging))
+        self.publish(staging, name)
+        if legacy:
+            app.logger.info(
+                "Moved %s generated data files into snapshot %s", len(legacy), name
+            )
+
+    def _new_staging(self) -> str:
+        staging = os.path.join(
+            self.directory, f"{STAGING_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        os.makedirs(staging)
+        return staging
+
+    def stage(self) -> str:
+        """Creates a staging directory holding hard links to the files of the
+        current generation, so a merge can read and replace them without
+        touching what the readers see
+
+        Returns:
+            str: Path of the staging directory
+        """
+        self.ensure_layout()
+        staging = self._new_staging()
+        current = os.path.realpath(self.link_path)
+        for name in os.listdir(current):
+            source = os.path.join(current, name)
+            if os.path.isfile(source):
+                os.link(source, os.path.join(staging, name))
+
+        return staging
+
+    def publish(self, staging: str, name: str) -> str:
+        """Makes a staged generation durable and points the readers at it:
+        fsyncs its files and directory, renames it into place, then replaces
+        the `current` symlink in one rename
+
+        Args:
+            staging (str): Staging directory returned by stage
+            name (str): Snapshot name, see snapshot_name
+
+        Raises:
+            FileExistsError: If a generation with that name was already published
+
+        Returns:
+            str: Path of the published generation
+        """
+        for filename in os.listdir(staging):
+            _fsync(os.path.join(staging, filename))
+        _fsync(staging)
+
+        target = os.path.join(self.directory, name)
+        if os.path.exists(target):
+            raise FileExistsError(f"Snapshot {name} already exists")
+        os.rename(staging, target)
+        _fsync(self.directory)
+
+        self._point_at(name)
+        app.logger.info("Published generated data snapshot %s", name)
+        self.prune()
+        return target
+
+    def discard(self, staging: str) -> None:
+        """Deletes a staging directory that won't be published
+
+        Args:
+            staging (str): Staging directory returned by stage
+        """
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def _point_at(self, name: str) -> None:
+        """Atomically flips the `current` symlink to a generation"""
+        temp_link = f"{self.link_path}.tmp-{os.getpid()}"
+        if os.path.lexists(temp_link):
+            os.remove(temp_link)
+        # Relative target, so the data folder can be moved as a whole
+        os.symlink(os.path.join(constants.SNAPSHOTS_DIR_NAME, name), temp_link)
+        os.replace(temp_link, self.link_path)
+        _fsync(self.root)
+
+    def rollback(self, name: str = None) -> str:
+        """Points the readers back at an earlier generation; takes effect on
+        their next request and holds until the next merge publishes
+
+        Args:
+            name (str): Snapshot to serve, defaults to the one published
+                        before the current one
+
+        Raises:
+            ValueError: If there is no such or no earlier snapshot
+
+        Returns:
+            str: Name of the snapshot now served
+        """
+        names = self.list()
+        current = self.current()
+        if name is None:
+            earlier = [snapshot for snapshot in names if current is None or snapshot < current]
+            if not earlier:
+                raise ValueError(f"No snapshot older than {current} to roll back to")
+            name = earlier[-1]
+        elif name not in names:
+            raise ValueError(f"Unknown snapshot {name}")
+
+        self._point_at(name)
+        app.logger.warning("Generated data rolled back from snapshot %s to %s", current, name)
+        return name
+
+    def prune(self) -> None:
+        """Deletes the oldest generations beyond the kept count, never the
+        current one, and staging directories of merges that died"""
+        current = self.current()
+        names = self.list()
+        for name in names[: max(len(names) - self.keep, 0)]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+        expired = time.time() - constants.REFRESH_LOCK_TTL
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(STAGING_PREFIX) and os.path.getmtime(path) < expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+snapshots_cli = AppGroup("snapshots", help="Generated data snapshots")
+
+
+@snapshots_cli.command("list")
+def list_command():
+    """Lists the published generations, marking the current one"""
+    store = SnapshotStore()
+    current = store.current()
+    for name in store.list():
+        marker = "*" if name == current else " "
+        print(f"{marker} {name}")
+
+
+@snapshots_cli.command("rollback")
+@click.option("--to", "name", default=None, help="Snapshot to serve, defaults to the previous one")
+def rollback_command(name):
+    """Serves an earlier generation until the next merge publishes"""
+    try:
+        name = SnapshotStore().rollback(name)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"Now serving snapshot {name}")
+
+
+app.cli.add_command(snapshots_cli)
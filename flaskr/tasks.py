@@ -1,80 +1,178 @@
-from flaskr.celery_conf import celery_app
-from flaskr.api.services import PPPData, ExchangeRateData, CurrencyData, GenerateData
-from celery import chain
+import time
 
+from flaskr import app
+from flaskr.celery_conf import celery_app
+from flaskr import pipeline
+from flaskr.locks import get_refresh_lock
+from flaskr.refresh_policy import RefreshPolicy
+from flaskr.retries import retry_delay
+from flaskr.run_ledger import RunLedger
+from flaskr.metrics import FETCH_RETRIES, TASK_SECONDS, TASKS, registry
+from celery import chord, group
+from celery.signals import task_postrun, task_prerun
+
+
+# Task id -> perf_counter at start, for the task duration metrics
+_task_starts = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, task=None, **kwargs):
+    _task_starts[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _observe_task(task_id=None, task=None, state=None, **kwargs):
+    """Records the duration and final state of every task and snapshots the
+    worker's metrics so the web app's /metrics endpoint sees them"""
+    start = _task_starts.pop(task_id, None)
+    name = getattr(task, "name", "unknown")
+    state = state or "UNKNOWN"
+    if start is not None:
+        TASK_SECONDS.observe(time.perf_counter() - start, task=name, state=state)
+    TASKS.inc(task=name, state=state)
+    try:
+        registry.write_snapshot()
+    except OSError as e:
+        app.logger.warning("Metrics snapshot failed: %s", str(e))
+
+
+def _fetch_with_retries(task, dataset: str, first_attempt_at: float = None) -> dict:
+    """Runs a fetch branch; a retryable failure reschedules the task with a
+    backoff countdown instead of sleeping, so the worker slot is free
+    between attempts
+
+    Args:
+        task: Bound Celery task
+        dataset (str): Dataset of the branch
+        first_attempt_at (float): Epoch seconds of the first attempt, carried
+                                  over by the retries
 
-@celery_app.task
-def work_PPP_gen(*args) -> bool:
+    Returns:
+        dict: Outcome of the branch with its 'retries' count, see
+              pipeline.fetch_dataset
+    """
+    first_attempt_at = first_attempt_at or time.time()
+    result = pipeline.fetch_dataset(dataset)
+    result["retries"] = task.request.retries
+    if result["retryable"]:
+        delay = retry_delay(task.request.retries, first_attempt_at)
+        if delay is not None:
+            FETCH_RETRIES.inc(dataset=dataset)
+            app.logger.warning(
+                "Retrying the %s fetch in %.1fs (retry %s)",
+                dataset,
+                delay,
+                task.request.retries + 1,
+            )
+            raise task.retry(countdown=delay, kwargs={"first_attempt_at": first_attempt_at})
+        app.logger.error(
+            "Giving up on the %s fetch after %s retries", dataset, task.request.retries
+        )
+
+    return result
+
+@celery_app.task(bind=True, max_retries=None)
+def work_PPP_gen(self, *args, first_attempt_at: float = None) -> dict:
     """Celery task to generate the PPP data asynchronously
 
     Returns:
-        bool: True if the task was successfull else False
+        dict: Outcome and timing of the branch, see pipeline.fetch_dataset
     """
-    
-    serve_api = PPPData()
-    flag = serve_api.get_ppp_data()
-    
-    return flag
+    return _fetch_with_retries(self, "ppp", first_attempt_at)
 
-@celery_app.task
-def work_ExchRate_gen(*args) -> bool:
+@celery_app.task(bind=True, max_retries=None)
+def work_ExchRate_gen(self, *args, first_attempt_at: float = None) -> dict:
     """Celery task to generate the Exchange rate data asynchronously
 
     Returns:
-        bool: True if the task was successfull else False
+        dict: Outcome and timing of the branch, see pipeline.fetch_dataset
     """
-    serve_api = ExchangeRateData()
-    flag = serve_api.get_exch_rate_data()
+    return _fetch_with_retries(self, "exchange_rate", first_attempt_at)
 
-    return flag
-
-@celery_app.task
-def work_Currency_gen(*args) -> bool:
+@celery_app.task(bind=True, max_retries=None)
+def work_Currency_gen(self, *args, first_attempt_at: float = None) -> dict:
     """Celery task to generate the Currency data asynchronously
 
     Returns:
-        bool: True if the task was successfull else False
+        dict: Outcome and timing of the branch, see pipeline.fetch_dataset
     """
-    serve_api = CurrencyData()
-    flag = serve_api.get_currency_data()
-
-    return flag
+    return _fetch_with_retries(self, "currency", first_attempt_at)
 
 @celery_app.task
-def work_MergedData_gen(*args) -> bool:
+def work_MergedData_gen(
+    branch_results=None, *args, lease_token: str = None, run_id: str = None
+) -> dict:
     """Celery task to generate the Final data after merging required ones
-    asynchronously
+    asynchronously; used as the chord callback of the fetch branches
+
+    Args:
+        branch_results (list): Outcomes of the fetch branches
+        lease_token (str): Refresh lease taken by the task flow, released
+                           once the merge has finished
+        run_id (str): Run ledger entry of the flow, finished with the outcome
 
     Returns:
-        bool: True if the task waas successfull else False
+        dict: Outcome and timing of the merge with the branch outcomes
     """
-    serve_api = GenerateData()
-    flag = serve_api.generate_merged_final_data()
-
-    return flag
+    result = None
+    try:
+        result = pipeline.merge_datasets(branch_results=branch_results)
+        return result
+    finally:
+        if run_id is not None:
+            RunLedger().finish_run(run_id, result)
+        if lease_token is not None:
+            get_refresh_lock().release(lease_token)
+
+# Dataset -> fetch task of its branch
+FETCH_TASKS = {
+    "ppp": work_PPP_gen,
+    "exchange_rate": work_ExchRate_gen,
+    "currency": work_Currency_gen,
+}
 
 @celery_app.task
-def task_flow_ConversionModuleData(*args):
+def task_flow_ConversionModuleData(*args, trigger: str = "manual", datasets: list = None):
     """Task flow for generation of data required by the salary value
-    conversion module __ to be run at a particular interval of time __
-    """
-    # Tasks to be executed in group
-    task_sign_ppp = work_PPP_gen.s()
-    task_sign_exch_rate = work_ExchRate_gen.s()
-    task_sign_currency = work_Currency_gen.s()
-    final_merge_task = work_MergedData_gen.s()
-    # Creating a chain to sequentially execute tasks
-    task_chain = chain(task_sign_ppp, task_sign_exch_rate, task_sign_currency, final_merge_task)
-    # Starting async execution
-    task_result = task_chain.apply_async()
-
-    return None
-
-
-
+    conversion module; beat fires it every few minutes and only the datasets
+    due per their refresh policy are fetched
 
+    The fetches are independent so they run concurrently as a group and
+    the merge fires as a chord callback once all of them have finished. Only
+    one flow runs at a time; a trigger firing while one is in flight joins it.
 
+    Args:
+        trigger (str): What fired the flow: 'beat', 'startup' or 'manual'
+        datasets (list): Datasets to fetch regardless of the policy, by
+                         default the ones that are due
 
-
-
-    
\ No newline at end of file
+    Returns:
+        str | None: Id of the chord result, None if the trigger was coalesced
+                    or nothing was due
+    """
+    lock = get_refresh_lock()
+    lease_token = lock.acquire(trigger)
+    if lease_token is None:
+        return None
+
+    datasets = datasets or RefreshPolicy().due_datasets()
+    if not datasets:
+        app.logger.info("No dataset due for a refresh (trigger %s)", trigger)
+        lock.release(lease_token)
+        return None
+
+    app.logger.info("Refreshing %s (trigger %s)", ", ".join(datasets), trigger)
+    ledger = RunLedger()
+    run_id = ledger.start_run(trigger, datasets)
+    fetch_group = group(*(FETCH_TASKS[dataset].s() for dataset in datasets))
+    final_merge_task = work_MergedData_gen.s(lease_token=lease_token, run_id=run_id)
+    # Starting async execution
+    try:
+        task_result = chord(fetch_group)(final_merge_task)
+    except Exception:
+        ledger.finish_run(run_id)
+        lock.release(lease_token)
+        raise
+
+    return task_result.id
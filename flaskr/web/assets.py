@@ -0,0 +1,261 @@
+"""
+Static asset pipeline: a build step writing content-hashed copies, resized
+and WebP image variants and gzip copies of the static files plus a manifest,
+and the helpers serving them with immutable caching
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+
+from flask import abort, request, send_from_directory, url_for
+
+from flaskr import app
+from flaskr import definitions as constants
+
+
+IMAGE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+# Built file names carry the content hash before the extension
+HASHED_NAME = re.compile(rf"\.([0-9a-f]{{{constants.ASSET_HASH_LENGTH}}})\.[^./]+$")
+
+
+class AssetManifest:
+    """Source path -> built file names, reloaded when the manifest file changes"""
+
+    def __init__(self, path: str) -> None:
+        """Constructor
+
+        Args:
+            path (str): Manifest file path
+        """
+        self.path = path
+        self._entries = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def entries(self) -> dict:
+        """Current manifest entries, empty if no build has been run
+
+        Returns:
+            dict: Source path -> {"file", "etag", "variants"}
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return {}
+
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(self.path, "r") as file:
+                            self._entries = json.load(file)["assets"]
+                        self._mtime = mtime
+                    except (OSError, ValueError, KeyError) as e:
+                        app.logger.warning("Ignoring unreadable asset manifest: %s", str(e))
+
+        return self._entries
+
+    def built_file(self, path: str, variant: str = None):
+        """Built file name of a source file or one of its variants
+
+        Args:
+            path (str): Source path relative to the static folder
+            variant (str): e.g. 'webp', '640w' or '640w.webp'; None for the
+                           fingerprinted original
+
+        Returns:
+            str | None: Built file name relative to the dist folder
+        """
+        entry = self.entries().get(path)
+        if entry is None:
+            return None
+        if variant is None:
+            return entry["file"]
+        return entry["variants"].get(variant)
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[: constants.ASSET_HASH_LENGTH]
+
+
+def _hashed_name(path: str, data: bytes, suffix: str = "", extension: str = None) -> str:
+    """e.g. images/headerbg.jpg -> images/headerbg-640w.1a2b3c4d5e6f.webp"""
+    stem, original_extension = os.path.splitext(path)
+    return f"{stem}{suffix}.{_content_hash(data)}{extension or original_extension}"
+
+
+def _write(output_dir: str, name: str, data: bytes) -> None:
+    target = os.path.join(output_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as file:
+        file.write(data)
+
+    if os.path.splitext(name)[1].lower() in constants.ASSET_GZIP_EXTENSIONS:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            with open(target + ".gz", "wb") as file:
+                file.write(compressed)
+
+
+def _image_variants(path: str, data: bytes) -> dict:
+    """Resized and WebP variants of an image
+
+    Args:
+        path (str): Source path, for naming
+        data (bytes): Original image
+
+    Returns:
+        dict: Variant name -> (built file name, bytes)
+    """
+    from PIL import Image
+
+    extension = os.path.splitext(path)[1].lower()
+    variants = {}
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        widths = [width for width in constants.ASSET_IMAGE_WIDTHS if width < original.width]
+        for width in widths + [None]:
+            if width is None:
+                image = original
+                suffix = ""
+            else:
+                height = round(original.height * width / original.width)
+                image = original.resize((width, height), Image.LANCZOS)
+                suffix = f"{width}w"
+
+            if suffix:
+                buffer = io.BytesIO()
+                options = {"optimize": True}
+                if IMAGE_FORMATS[extension] == "JPEG":
+                    options.update(quality=constants.ASSET_JPEG_QUALITY, progressive=True)
+                image.save(buffer, format=IMAGE_FORMATS[extension], **options)
+                resized = buffer.getvalue()
+                variants[suffix] = (_hashed_name(path, resized, f"-{suffix}"), resized)
+
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", quality=constants.ASSET_WEBP_QUALITY, method=6)
+            webp = buffer.getvalue()
+            name = f"{suffix}.webp" if suffix else "webp"
+            variants[name] = (
+                _hashed_name(path, webp, f"-{suffix}" if suffix else "", ".webp"),
+                webp,
+            )
+
+    return variants
+
+
+def build_assets(static_dir: str, output_dir: str) -> dict:
+    """Builds every static file into the dist folder and writes the manifest;
+    the previous build is replaced
+
+    Args:
+        static_dir (str): Source static folder
+        output_dir (str): Dist folder, inside the static folder or not
+
+    Returns:
+        dict: Manifest entries
+    """
+    try:
+        import PIL  # noqa: F401
+
+        resize_images = True
+    except ImportError:
+        app.logger.warning("Pillow isn't installed, image variants won't be built")
+        resize_images = False
+
+    staging_dir = output_dir + ".building"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    assets = {}
+    for directory, dirnames, filenames in os.walk(static_dir):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if os.path.join(directory, name) not in (output_dir, staging_dir)
+        ]
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            path = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as file:
+                data = file.read()
+
+            built_name = _hashed_name(path, data)
+            _write(staging_dir, built_name, data)
+            entry = {"file": built_name, "etag": _content_hash(data), "size": len(data), "variants": {}}
+
+            if resize_images and os.path.splitext(path)[1].lower() in IMAGE_FORMATS:
+                for variant, (name, variant_data) in _image_variants(path, data).items():
+                    _write(staging_dir, name, variant_data)
+                    entry["variants"][variant] = name
+
+            assets[path] = entry
+
+    with open(os.path.join(staging_dir, constants.ASSET_MANIFEST_FILE_NAME), "w") as file:
+        json.dump({"assets": assets}, file, indent=2, sort_keys=True)
+
+    # Swapping the whole build in at once
+    previous_dir = output_dir + ".previous"
+    shutil.rmtree(previous_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, previous_dir)
+    os.replace(staging_dir, output_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+
+    return assets
+
+
+def send_built_asset(output_dir: str, filename: str):
+    """Serves a built file with immutable caching, a strong ETag from its
+    content hash, conditional and Range requests, and the gzip copy when the
+    client accepts it. Only content-hashed files are served; the manifest
+    keeps its name across builds, so it's never cached as immutable.
+
+    Args:
+        output_dir (str): Dist folder
+        filename (str): Built file name
+
+    Raises:
+        NotFound: If the file name carries no content hash
+
+    Returns:
+        flask.Response: File response
+    """
+    match = HASHED_NAME.search(filename)
+    if match is None:
+        abort(404)
+
+    etag = match.group(1)
+    served_name = filename
+    encoded = False
+    if "gzip" in request.headers.get("Accept-Encoding", "") and os.path.isfile(
+        os.path.join(output_dir, filename + ".gz")
+    ):
+        served_name = filename + ".gz"
+        encoded = True
+        etag = f"{etag}-gzip"
+
+    response = send_from_directory(
+        output_dir,
+        served_name,
+        download_name=os.path.basename(filename),
+        mimetype=None if not encoded else _guess_mimetype(filename),
+        etag=etag,
+        conditional=True,
+        max_age=constants.ASSET_MAX_AGE,
+    )
+    if encoded:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = f"public, max-age={constants.ASSET_MAX_AGE}, immutable"
+
+    return response
+
+
+def _guess_mimetype(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
@@ -0,0 +1,188 @@
+"""
+Rendered page and fragment cache for the web pages, keyed by route, the
+template files' mtimes, the asset manifest and the data generation
+"""
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import make_response, render_template, request
+from markupsafe import Markup
+
+from flaskr import definitions as constants
+from flaskr.data import read_generation
+from flaskr.data.generation import generation_path
+from flaskr.metrics import registry
+
+
+PAGE_CACHE_LOOKUPS = registry.counter(
+    "wagescale_page_cache_lookups_total",
+    "Rendered page and fragment cache lookups by kind and result",
+    ("kind", "result"),
+)
+
+
+class PageCache:
+    """Bounded LRU cache of rendered pages and fragments. Every entry belongs
+    to a version made of the template mtimes, the asset manifest mtime and
+    the data generation; when any of them changes the cache is emptied, so a
+    deploy or a refresh is picked up on the next request."""
+
+    def __init__(
+        self,
+        template_dir: str,
+        manifest_path: str,
+        maxsize: int = constants.PAGE_CACHE_SIZE,
+    ) -> None:
+        """Constructor
+
+        Args:
+            template_dir (str): Templates folder whose files the pages are rendered from
+            manifest_path (str): Asset manifest, changes the URLs in the pages
+            maxsize (int): Most pages and fragments kept
+        """
+        self.template_dir = template_dir
+        self.manifest_path = manifest_path
+        self.maxsize = maxsize
+        self._templates = None
+        self._generation = (None, 0)
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _template_files(self) -> list:
+        # Template files only change with a deploy, the list is built once
+        if self._templates is None:
+            self._templates = sorted(
+                os.path.join(directory, filename)
+                for directory, _, filenames in os.walk(self.template_dir)
+                for filename in filenames
+            )
+        return self._templates
+
+    def _data_generation(self) -> int:
+        # The generation file is only re-read when its mtime changes
+        mtime = self._mtime(generation_path())
+        if mtime != self._generation[0]:
+            self._generation = (mtime, read_generation())
+        return self._generation[1]
+
+    def version(self) -> tuple:
+        """Current version of everything the rendered pages depend on
+
+        Returns:
+            tuple: (template mtimes, manifest mtime, data generation)
+        """
+        return (
+            tuple(self._mtime(path) for path in self._template_files()),
+            self._mtime(self.manifest_path),
+            self._data_generation(),
+        )
+
+    def _get_or_render(self, kind: str, key: tuple, render) -> tuple:
+        """Cached (body, etag) of a key, rendered and stored on a miss
+
+        Args:
+            kind (str): 'page' or 'fragment', for the metrics
+            key (tuple): Cache key, without the version
+            render: Zero-argument callable returning the body
+
+        Returns:
+            tuple: (str body, str strong ETag)
+        """
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get((kind, key))
+            if entry is not None:
+                self._entries.move_to_end((kind, key))
+
+        PAGE_CACHE_LOOKUPS.inc(kind=kind, result="miss" if entry is None else "hit")
+        if entry is not None:
+            return entry
+
+        body = str(render())
+        entry = (body, hashlib.sha256(body.encode("utf-8")).hexdigest()[:32])
+        with self._lock:
+            if version == self._version:
+                self._entries[(kind, key)] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return entry
+
+    def page(self, key: tuple, render) -> tuple:
+        """Cached rendered page
+
+        Args:
+            key (tuple): Route and its arguments
+            render: Zero-argument callable rendering the page
+
+        Returns:
+            tuple: (str body, str strong ETag)
+        """
+        return self._get_or_render("page", key, render)
+
+    def fragment(self, template_name: str, **context) -> Markup:
+        """Cached rendered include, for the parts shared between pages
+
+        Args:
+            template_name (str): Template of the fragment
+            **context: Variables the fragment depends on, part of the key
+
+        Returns:
+            Markup: Rendered fragment
+        """
+        key = (template_name, tuple(sorted(context.items())))
+        body, _ = self._get_or_render(
+            "fragment", key, lambda: render_template(template_name, **context)
+        )
+        return Markup(body)
+
+    def clear(self) -> None:
+        """Drops every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_page(page_cache: PageCache):
+    """View decorator serving the rendered page from the cache with a strong
+    ETag, and 304 Not Modified when the client already has it
+
+    Args:
+        page_cache (PageCache): Cache the pages are kept in
+
+    Returns:
+        Decorator for views returning the rendered page as a string
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+            )
+            body, etag = page_cache.page(key, lambda: view(*args, **kwargs))
+
+            response = make_response(body)
+            response.set_etag(etag)
+            # Browsers may keep the page but have to revalidate it every time
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
@@ -1,7 +1,11 @@
 import os
 from flaskr import app
-from flask import render_template, Blueprint, make_response, send_file
+from flask import render_template, Blueprint, make_response, send_file, url_for
 import flaskr.errorhandler
+from flaskr.metrics import registry
+from flaskr import definitions as constants
+from flaskr.web.assets import AssetManifest, build_assets, send_built_asset
+from flaskr.web.page_cache import PageCache, cached_page
 
 
 
@@ -18,14 +22,81 @@ bp_web.static_folder = "static"
 # Add the templates folder to the blueprint
 bp_web.template_folder = "templates"
 
+# Output of the asset build, see flaskr.web.assets
+ASSETS_DIST_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    bp_web.static_folder,
+    constants.ASSETS_DIST_DIR_NAME,
+)
+asset_manifest = AssetManifest(
+    os.path.join(ASSETS_DIST_DIR, constants.ASSET_MANIFEST_FILE_NAME)
+)
+page_cache = PageCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), bp_web.template_folder),
+    asset_manifest.path,
+)
+
+
+@bp_web.app_template_global()
+def cached_include(template_name: str, **context):
+    """Renders a shared include through the fragment cache, e.g.
+    {{ cached_include("includes/footer.html") }}
+
+    Args:
+        template_name (str): Template of the include
+        **context: Variables the include uses
+
+    Returns:
+        Markup: Rendered include
+    """
+    return page_cache.fragment(template_name, **context)
+
+
+@bp_web.app_template_global()
+def asset_url(path: str, variant: str = None) -> str:
+    """URL of a static file's fingerprinted build (or one of its variants);
+    falls back to the plain static URL when the assets haven't been built
+
+    Args:
+        path (str): Path relative to the static folder, e.g. 'images/headerbg.jpg'
+        variant (str): Optional variant, e.g. 'webp', '640w' or '640w.webp'
+
+    Returns:
+        str: URL to use in templates
+    """
+    built_file = asset_manifest.built_file(path, variant)
+    if built_file is None and variant is not None:
+        built_file = asset_manifest.built_file(path)
+    if built_file is None:
+        return url_for("web_routes.static", filename=path)
+
+    return url_for("web_routes.built_asset", filename=built_file)
+
+
+@bp_web.route("/assets/<path:filename>")
+def built_asset(filename):
+    return send_built_asset(ASSETS_DIST_DIR, filename)
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Builds fingerprinted, resized and precompressed static assets"""
+    static_dir = os.path.dirname(ASSETS_DIST_DIR)
+    assets = build_assets(static_dir, ASSETS_DIST_DIR)
+    source_bytes = sum(entry["size"] for entry in assets.values())
+    print(f"Built {len(assets)} assets ({source_bytes} source bytes) into {ASSETS_DIST_DIR}")
+
+
 @bp_web.route("/")
 @bp_web.route("/index")
 @bp_web.route("/home")
+@cached_page(page_cache)
 def index():
     return render_template("index.html", index=True)
 
 
 @bp_web.route("/about")
+@cached_page(page_cache)
 def about():
     return render_template("about.html", about=True)
 
@@ -37,4 +108,10 @@ def some_resource(filename):
     return response
 
 
-
+@bp_web.route("/metrics")
+def metrics():
+    """Metrics of the web app and the Celery workers in Prometheus text format"""
+    response = make_response(registry.render())
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    response.headers["Cache-Control"] = "no-store"
+    return response
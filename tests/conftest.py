@@ -0,0 +1,164 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+import requests
+
+from flaskr import app as flask_app
+from flaskr import definitions as constants
+from flaskr.api.conversion import ConversionEngine
+from flaskr.api.resolution import CountryResolver
+from flaskr.data import get_storage
+
+# Final merged data: PPP factor and USD exchange rate of every country
+MERGED_DATA = pd.DataFrame(
+    {
+        "Country": ["INDIA", "UNITED STATES", "GERMANY", "FRANCE"],
+        "AlphabeticCode": ["INR", "USD", "EUR", "EUR"],
+        "Value": [22.5, 1.0, 0.75, 0.72],
+        "ExchangeRate": [83.0, 1.0, 0.92, 0.92],
+    }
+)
+
+# PPP time series of the merged countries, sorted by country then year
+MERGED_SERIES = pd.DataFrame(
+    {
+        "Country": ["FRANCE", "GERMANY", "GERMANY", "INDIA", "INDIA", "UNITED STATES"],
+        "Date": [2021, 2019, 2022, 2020, 2022, 2019],
+        "Value": [0.72, 0.70, 0.75, 20.0, 22.5, 1.0],
+    }
+)
+
+ALIASES = {"USA": "UNITED STATES", "US": "UNITED STATES", "DEUTSCHLAND": "GERMANY"}
+
+# Upstream payloads: World Bank PPP records, openexchangerates.org rates and
+# the datahub.io ISO 4217 CSV
+WORLD_BANK_RECORDS = [
+    {
+        "country": {"id": iso2, "value": name},
+        "countryiso3code": iso3,
+        "date": str(year),
+        "value": value,
+    }
+    for iso2, iso3, name, year, value in [
+        ("IN", "IND", "India", 2022, 22.5),
+        ("IN", "IND", "India", 2021, 21.0),
+        ("IN", "IND", "India", 2020, None),
+        ("US", "USA", "United States", 2022, 1.0),
+        ("US", "USA", "United States", 2021, 1.0),
+        ("DE", "DEU", "Germany", 2022, 0.75),
+        ("FR", "FRA", "France", 2021, 0.72),
+        ("1W", "WLD", "World", 2022, 0.5),
+    ]
+]
+EXCHANGE_RATES = {"base": "USD", "rates": {"INR": 83.0, "USD": 1.0, "EUR": 0.92}}
+CURRENCY_CSV = (
+    "Entity,Currency,AlphabeticCode,NumericCode,MinorUnit,WithdrawalDate\n"
+    "INDIA,Indian Rupee,INR,356,2,\n"
+    "UNITED STATES OF AMERICA (THE),US Dollar,USD,840,2,\n"
+    "GERMANY,Euro,EUR,978,2,\n"
+    "FRANCE,Euro,EUR,978,2,\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def data_paths(tmp_path, monkeypatch):
+    """Points every data file the app writes at the test's temporary folder"""
+    monkeypatch.setattr(constants, "FETCHED_DATA_PATH", str(tmp_path / "fetched"))
+    monkeypatch.setattr(
+        constants, "GENERATED_DATA_PATH", str(tmp_path / "generated" / "current")
+    )
+    monkeypatch.setattr(constants, "RUN_LEDGER_PATH", str(tmp_path / "run_ledger.sqlite3"))
+    monkeypatch.setattr(constants, "METRICS_PATH", str(tmp_path / "metrics"))
+    return tmp_path
+
+
+def write_generated_data(directory, data=MERGED_DATA, series=MERGED_SERIES, aliases=ALIASES):
+    """Saves the files the conversion engine reads into a directory"""
+    os.makedirs(directory, exist_ok=True)
+    storage = get_storage()
+    storage.save(data, os.path.join(directory, constants.FINAL_MERGED_DATA_FILE_NAME))
+    if series is not None:
+        storage.save(series, os.path.join(directory, constants.FINAL_MERGED_SERIES_FILE_NAME))
+    if aliases:
+        CountryResolver.save_index(
+            aliases, os.path.join(directory, constants.RESOLUTION_INDEX_FILE_NAME)
+        )
+
+
+def _response(status: int = 200, content: bytes = b"", headers: dict = None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeUpstream:
+    """Stands in for the pooled fetch client: answers the three upstreams
+    from the payloads above, honours If-None-Match, and fails the hosts
+    listed in `failing` with a 503"""
+
+    def __init__(self) -> None:
+        self.world_bank_records = list(WORLD_BANK_RECORDS)
+        self.exchange_rates = json.loads(json.dumps(EXCHANGE_RATES))
+        self.currency_csv = CURRENCY_CSV
+        self.failing = set()
+        self.calls = []
+
+    def _host(self, url: str) -> str:
+        for host in ("worldbank", "openexchangerates", "datahub"):
+            if host in url:
+                return host
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        host = self._host(url)
+        self.calls.append(host)
+        if host in self.failing:
+            return _response(503)
+
+        if host == "worldbank":
+            meta = {"page": 1, "pages": 1, "total": len(self.world_bank_records)}
+            body = json.dumps([meta, self.world_bank_records])
+        elif host == "openexchangerates":
+            body = json.dumps(self.exchange_rates)
+        else:
+            body = self.currency_csv
+        etag = f'"{hash(body)}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return _response(304)
+        return _response(200, body.encode("utf-8"), {"ETag": etag})
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake upstreams behind the fetch client of the services"""
+    fake = FakeUpstream()
+    monkeypatch.setattr("flaskr.api.services.get_fetch_client", lambda: fake)
+    monkeypatch.setattr("flaskr.api.ingest.get_fetch_client", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Conversion engine loaded from the test data, without its watcher"""
+    directory = tmp_path / "engine"
+    write_generated_data(directory)
+    engine = ConversionEngine(
+        data_path=str(directory / constants.FINAL_MERGED_DATA_FILE_NAME)
+    )
+    assert engine.reload_if_changed()
+    return engine
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    """Test client whose API routes use the test engine"""
+    monkeypatch.setattr("flaskr.api.routes.get_conversion_engine", lambda: engine)
+    flask_app.config["TESTING"] = True
+    with flask_app.test_client() as client:
+        yield client
@@ -0,0 +1,105 @@
+import gzip
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from flaskr import app as flask_app
+from flaskr import definitions as constants
+from flaskr.web import routes as web_routes
+from flaskr.web.assets import AssetManifest, build_assets
+
+CSS = b"body { color: #333; }\n" * 50
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static_dir = tmp_path / "static"
+    (static_dir / "css").mkdir(parents=True)
+    (static_dir / "images").mkdir()
+    (static_dir / "css" / "site.css").write_bytes(CSS)
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), "navy").save(buffer, format="PNG")
+    (static_dir / "images" / "header.png").write_bytes(buffer.getvalue())
+    return static_dir
+
+
+@pytest.fixture
+def built(static_dir, monkeypatch):
+    """Assets built into the static folder's dist, served by the web routes"""
+    output_dir = str(static_dir / constants.ASSETS_DIST_DIR_NAME)
+    assets = build_assets(str(static_dir), output_dir)
+    manifest = AssetManifest(os.path.join(output_dir, constants.ASSET_MANIFEST_FILE_NAME))
+    monkeypatch.setattr(web_routes, "ASSETS_DIST_DIR", output_dir)
+    monkeypatch.setattr(web_routes, "asset_manifest", manifest)
+    return output_dir, assets
+
+
+def test_build_fingerprints_and_compresses(built):
+    output_dir, assets = built
+
+    assert sorted(assets) == ["css/site.css", "images/header.png"]
+    css = assets["css/site.css"]
+    assert css["file"] == f"css/site.{css['etag']}.css"
+    with gzip.open(os.path.join(output_dir, css["file"] + ".gz")) as file:
+        assert file.read() == CSS
+    # Only widths below the original are built
+    assert sorted(assets["images/header.png"]["variants"]) == ["640w", "640w.webp", "webp"]
+    for name in assets["images/header.png"]["variants"].values():
+        assert os.path.isfile(os.path.join(output_dir, name))
+
+
+def test_rebuild_replaces_the_previous_build(static_dir, built):
+    output_dir, assets = built
+    (static_dir / "css" / "site.css").write_bytes(b"body { color: red; }")
+    rebuilt = build_assets(str(static_dir), output_dir)
+
+    assert rebuilt["css/site.css"]["file"] != assets["css/site.css"]["file"]
+    assert not os.path.exists(os.path.join(output_dir, assets["css/site.css"]["file"]))
+    assert sorted(os.listdir(static_dir)) == ["css", "dist", "images"]
+
+
+def test_asset_url_falls_back_without_a_build(built, tmp_path, monkeypatch):
+    _, assets = built
+    with flask_app.test_request_context():
+        assert web_routes.asset_url("css/site.css").endswith("/assets/" + assets["css/site.css"]["file"])
+        webp = assets["images/header.png"]["variants"]["webp"]
+        assert web_routes.asset_url("images/header.png", "webp").endswith(webp)
+        # Unknown variant: the fingerprinted original
+        assert web_routes.asset_url("css/site.css", "webp").endswith(assets["css/site.css"]["file"])
+
+        monkeypatch.setattr(web_routes, "asset_manifest", AssetManifest(str(tmp_path / "none.json")))
+        assert web_routes.asset_url("css/site.css").endswith("/static/css/site.css")
+
+
+def test_built_assets_are_served_immutable(built):
+    _, assets = built
+    entry = assets["css/site.css"]
+    with flask_app.test_client() as client:
+        response = client.get(f"/assets/{entry['file']}")
+        assert response.data == CSS
+        assert response.headers["ETag"] == f'"{entry["etag"]}"'
+        assert "immutable" in response.headers["Cache-Control"]
+
+        response = client.get(
+            f"/assets/{entry['file']}", headers={"If-None-Match": f'"{entry["etag"]}"'}
+        )
+        assert response.status_code == 304
+
+        response = client.get(f"/assets/{entry['file']}", headers={"Range": "bytes=0-3"})
+        assert response.status_code == 206
+        assert response.data == CSS[:4]
+
+        response = client.get(f"/assets/{entry['file']}", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Content-Type"].startswith("text/css")
+        assert gzip.decompress(response.data) == CSS
+
+
+def test_only_fingerprinted_files_are_served(built):
+    _, assets = built
+    with flask_app.test_client() as client:
+        assert client.get(f"/assets/{constants.ASSET_MANIFEST_FILE_NAME}").status_code == 404
+        gz_name = assets["css/site.css"]["file"] + ".gz"
+        assert client.get(f"/assets/{gz_name}").status_code == 404
@@ -0,0 +1,42 @@
+import pytest
+
+from benchmarks.run import compare, run
+from flaskr import definitions as constants
+
+
+def _results(**stages):
+    return {
+        "results": [
+            {"stage": stage, "scale": 1, "seconds": seconds, "peak_bytes": peak}
+            for stage, (seconds, peak) in stages.items()
+        ]
+    }
+
+
+def test_compare_reports_regressions_over_the_threshold():
+    baseline = _results(parse=(1.0, 100), merge=(2.0, 100), save=(0.0, 0))
+    current = _results(parse=(1.2, 200), merge=(2.6, 100), save=(1.0, 10), load=(9.0, 9))
+
+    regressions = compare(current, baseline, threshold=0.25)
+    assert [(item["stage"], item["metric"]) for item in regressions] == [
+        ("parse", "peak_bytes"),
+        ("merge", "seconds"),
+    ]
+    assert regressions[1]["change"] == pytest.approx(0.3)
+
+
+def test_run_covers_every_stage(data_paths, capsys):
+    fetched_path = constants.FETCHED_DATA_PATH
+    results = run(scales=[1], repeat=1)["results"]
+
+    assert [result["stage"] for result in results] == [
+        "parse_ppp_data",
+        "parse_exch_rate_data",
+        "parse_currency_data",
+        "generate_merge",
+        "csv_save",
+        "csv_load",
+    ]
+    assert all(result["records"] > 0 and result["peak_bytes"] > 0 for result in results)
+    # The scratch paths of the suite are undone afterwards
+    assert constants.FETCHED_DATA_PATH == fetched_path
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from flaskr.api.cache import CACHE_LOOKUPS, ConversionCache
+from flaskr.data import bump_generation, read_generation
+from flaskr.data.generation import generation_path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("flaskr.api.cache.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ConversionCache(maxsize=2, ttl=60)
+    cache.put(("a",), 1)
+    cache.put(("b",), 2)
+    assert cache.get(("a",)) == (True, 1)
+    cache.put(("c",), 3)
+
+    assert cache.get(("b",)) == (False, None)
+    assert cache.get(("a",)) == (True, 1)
+    assert cache.get(("c",)) == (True, 3)
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_cache_entries_expire(clock):
+    cache = ConversionCache(maxsize=10, ttl=5)
+    cache.put(("a",), 1)
+    clock[0] += 4.9
+    assert cache.get(("a",)) == (True, 1)
+    clock[0] += 0.2
+    assert cache.get(("a",)) == (False, None)
+    assert len(cache) == 0
+
+
+def test_cache_counts_lookups():
+    before = CACHE_LOOKUPS.samples()
+    cache = ConversionCache()
+    cache.put(("a",), 1)
+    cache.get(("a",))
+    cache.get(("b",))
+    cache.get(("c",))
+    after = CACHE_LOOKUPS.samples()
+
+    assert after[("hit",)] - before.get(("hit",), 0) == 1
+    assert after[("miss",)] - before.get(("miss",), 0) == 2
+
+
+def test_generation_numbers(tmp_path):
+    assert read_generation(str(tmp_path)) == 0
+    assert bump_generation(str(tmp_path)) == 1
+    assert bump_generation(str(tmp_path)) == 2
+    # After a rollback the next generation stays above the snapshots
+    assert bump_generation(str(tmp_path), floor=7) == 8
+    assert read_generation(str(tmp_path)) == 8
+
+
+def test_unreadable_generation_counts_as_zero(tmp_path):
+    with open(generation_path(str(tmp_path)), "w") as file:
+        file.write("{not json")
+    assert read_generation(str(tmp_path)) == 0
+    with open(generation_path(str(tmp_path)), "w") as file:
+        json.dump({"generation": None}, file)
+    assert read_generation(str(tmp_path)) == 0
+
+
+def test_new_generation_invalidates_cached_conversions(engine):
+    directory = engine.data_dir
+    engine.convert(100, "INR", "USD")
+    assert len(engine.cache) == 1
+
+    generation = bump_generation(directory)
+    assert engine.reload_if_changed()
+    assert engine.table.generation == generation
+    assert len(engine.cache) == 0
+
+    engine.convert(100, "INR", "USD")
+    assert engine.cache.hits == 0
+    engine.convert(100, "INR", "USD")
+    assert engine.cache.hits == 1
+
+
+def test_convert_route_reports_the_generation(client, engine):
+    bump_generation(engine.data_dir)
+    engine.reload_if_changed()
+    response = client.get("/api/convert?amount=100&from=INR&to=USD")
+    assert response.get_json()["generation"] == 1
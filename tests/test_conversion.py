@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+import pytest
+
+from flaskr.api.conversion import ConversionError, PPPSeries
+
+
+def test_convert_ppp_and_exchange(engine):
+    assert engine.convert(100, "India", "United States") == pytest.approx(100 / 22.5)
+    assert engine.convert(83, "INR", "USD", mode="exchange") == pytest.approx(1.0)
+
+
+def test_convert_unknown_country_and_mode(engine):
+    with pytest.raises(ConversionError):
+        engine.convert(100, "Atlantis", "USD")
+    with pytest.raises(ConversionError):
+        engine.convert(100, "INR", "USD", mode="barter")
+
+
+@pytest.mark.parametrize("amount", ["abc", None, math.nan, math.inf, -math.inf, "nan", "inf"])
+def test_convert_rejects_invalid_amounts(engine, amount):
+    with pytest.raises(ConversionError):
+        engine.convert(amount, "INR", "USD")
+    assert len(engine.cache) == 0
+
+
+@pytest.mark.parametrize("year", [None, 2022])
+def test_convert_rejects_overflowing_results(engine, year):
+    with pytest.raises(ConversionError, match="out of range"):
+        engine.convert(1e308, "USD", "India", year=year)
+    assert len(engine.cache) == 0
+
+
+def test_convert_route_rejects_overflowing_results(client):
+    response = client.get("/api/convert?amount=1e308&from=USD&to=INDIA")
+    assert response.status_code == 400
+
+
+def test_convert_caches_results(engine):
+    first = engine.convert(100, "INR", "USD")
+    assert engine.convert(100, " inr ", "usd") == first
+    assert engine.cache.hits == 1
+
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "-inf"])
+def test_convert_route_rejects_non_finite_amounts(client, amount):
+    response = client.get(f"/api/convert?amount={amount}&from=INR&to=USD")
+    assert response.status_code == 400
+
+
+def test_convert_route(client):
+    response = client.get("/api/convert?amount=100&from=India&to=USA")
+    assert response.status_code == 200
+    assert response.get_json()["result"] == pytest.approx(100 / 22.5)
+
+
+def test_convert_batch_reports_failed_rows(engine):
+    results, errors = engine.convert_batch(
+        amounts=[100, "abc", math.inf, 100, 100],
+        from_countries=["INR", "INR", "INR", "Atlantis", "INR"],
+        to_countries=["USD", "USD", "USD", "USD", "Nowhere"],
+    )
+    assert results[0] == pytest.approx(100 / 22.5)
+    assert np.isnan(results[1:]).all()
+    assert [error["index"] for error in errors] == [1, 2, 3, 4]
+    assert errors[0]["message"] == "Invalid amount"
+    assert errors[2]["message"] == "Unknown source country or currency"
+    assert errors[3]["message"] == "Unknown target country or currency"
+
+
+def test_convert_batch_checks_lengths(engine):
+    with pytest.raises(ConversionError):
+        engine.convert_batch(amounts=[1, 2], from_countries=["INR"], to_countries="USD")
+
+
+def test_convert_as_of_year_falls_back_to_earlier_years(engine):
+    # GERMANY has 2019 and 2022, INDIA 2020 and 2022: 2021 uses 2019 and 2020
+    assert engine.convert(100, "India", "Germany", year=2021) == pytest.approx(100 / 20.0 * 0.70)
+    assert engine.convert(100, "India", "Germany", year=2030) == pytest.approx(100 / 22.5 * 0.75)
+    with pytest.raises(ConversionError):
+        engine.convert(100, "India", "Germany", year=2019)
+    with pytest.raises(ConversionError):
+        engine.convert(100, "India", "Germany", mode="exchange", year=2022)
+
+
+@pytest.mark.parametrize("year", [-1, 0, 1899, 3000, 10000, 12021])
+def test_convert_rejects_out_of_range_years(engine, year):
+    with pytest.raises(ConversionError, match="Invalid year"):
+        engine.convert(100, "India", "Germany", year=year)
+
+
+def test_convert_batch_years(engine):
+    results, errors = engine.convert_batch(
+        amounts=[100, 100, 100, 100, 100],
+        from_countries="India",
+        to_countries="Germany",
+        years=[2021, 2022, 2019, 12021, 2021.5],
+    )
+    assert results[:2] == pytest.approx([100 / 20.0 * 0.70, 100 / 22.5 * 0.75])
+    assert [(error["index"], error["message"]) for error in errors] == [
+        (2, "No PPP data available as of the requested year"),
+        (3, "Invalid year"),
+        (4, "Invalid year"),
+    ]
+
+
+def test_series_as_of_never_reads_a_neighbouring_series():
+    series = PPPSeries(
+        countries=["FRANCE", "GERMANY"], dates=[2020, 2020], values=[0.7, 0.75]
+    )
+    # 2020 + YEAR_STRIDE would be the key of GERMANY's 2020 observation
+    factors = series.as_of(np.array([0, 0, 1, -1]), np.array([2021, 12020, 1999, 2021]))
+    assert factors[0] == pytest.approx(0.7)
+    assert np.isnan(factors[1:]).all()
+
+
+def test_series_rejects_out_of_range_years():
+    with pytest.raises(ValueError):
+        PPPSeries(countries=["FRANCE"], dates=[20210], values=[0.7])
+
+
+def test_country_aliases(engine):
+    assert engine.convert(100, "USA", "Deutschland") == pytest.approx(100 * 0.75)
+    assert engine.convert(100, "  united states ", "EUR") == pytest.approx(100 * 0.75)
+    assert [item["country"] for item in engine.table.suggest("germ")] == ["GERMANY"]
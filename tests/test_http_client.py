@@ -0,0 +1,83 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from flaskr.api import http_client
+from flaskr.api.http_client import FetchClient, get_fetch_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        time.sleep(server.delay)
+        body = gzip.compress(b'{"ok": true}')
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.in_flight = server.peak = 0
+    server.delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/data"
+
+
+def test_connections_are_kept_alive(server):
+    client = FetchClient()
+    for _ in range(5):
+        response = client.get(_url(server))
+        # gzip bodies come back decoded
+        assert response.json() == {"ok": True}
+    client.close()
+
+    assert len(server.connections) == 1
+
+
+def test_requests_per_host_are_limited(server):
+    server.delay = 0.05
+    client = FetchClient(max_per_host=2)
+    threads = [threading.Thread(target=client.get, args=(_url(server),)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    assert server.peak == 2
+
+
+def test_one_client_per_process(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+    client = get_fetch_client()
+    assert get_fetch_client() is client
+
+    monkeypatch.setattr(http_client.os, "getpid", lambda: -1)
+    assert get_fetch_client() is not client
@@ -0,0 +1,81 @@
+import json
+import random
+import time
+
+import pytest
+import requests
+
+from benchmarks.synthetic import world_bank_records
+from flaskr.api.ingest import PPPColumns, WorldBankIngester
+
+from .conftest import _response
+
+URL = "https://api.worldbank.org/v2/country/all/indicator/PA.NUS.PPP"
+
+
+class PagedWorldBank:
+    """Serves records page by page, answering out of order"""
+
+    def __init__(self, records: list, status: int = 200) -> None:
+        self.records = records
+        self.status = status
+        self.pages = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        if self.status != 200:
+            return _response(self.status)
+        page, per_page = params["page"], params["per_page"]
+        self.pages.append(page)
+        time.sleep(random.random() / 100)
+        meta = {"page": page, "pages": -(-len(self.records) // per_page), "total": len(self.records)}
+        body = [meta, self.records[(page - 1) * per_page : page * per_page]]
+        return _response(200, json.dumps(body).encode("utf-8"))
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(records: list, status: int = 200) -> PagedWorldBank:
+        client = PagedWorldBank(records, status)
+        monkeypatch.setattr("flaskr.api.ingest.get_fetch_client", lambda: client)
+        return client
+
+    return install
+
+
+def test_pages_are_parsed_in_order(fake):
+    records = world_bank_records(2500, countries=40)
+    client = fake(records)
+    response, columns = WorldBankIngester(URL, {}, per_page=300, max_workers=3).ingest()
+
+    assert response.status_code == 200
+    assert sorted(client.pages) == list(range(1, 10))
+    encoded = columns.encoded()
+    names = [encoded["country_names"][code] for code in encoded["country_codes"]]
+    assert names == [record["country"]["value"] for record in records]
+    assert encoded["dates"].tolist() == [int(record["date"]) for record in records]
+
+
+def test_not_modified(fake):
+    fake([], status=304)
+    response, columns = WorldBankIngester(URL, {}).ingest(headers={"If-None-Match": '"v1"'})
+    assert response.status_code == 304
+    assert columns is None
+
+
+def test_upstream_error_is_raised(fake):
+    fake([], status=503)
+    with pytest.raises(requests.exceptions.HTTPError):
+        WorldBankIngester(URL, {}).ingest()
+
+
+def test_columns_dictionary_encode_countries():
+    columns = PPPColumns()
+    columns.extend(world_bank_records(50, countries=3, seed=1))
+    columns.extend([])
+    columns.extend(world_bank_records(50, countries=5, seed=2))
+    encoded = columns.encoded()
+
+    assert len(columns) == 100
+    assert len(encoded["country_names"]) == 5
+    assert len(encoded["country_iso2"]) == len(encoded["country_iso3"]) == 5
+    assert encoded["values"].dtype.name == "float64"
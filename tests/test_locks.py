@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from flaskr.locks import REFRESH_TRIGGERS, FileLeaseBackend, MemoryLeaseBackend, SingleFlight
+
+
+@pytest.fixture(params=["file", "memory"])
+def backend(request, tmp_path):
+    if request.param == "file":
+        return FileLeaseBackend(str(tmp_path / "leases"))
+    return MemoryLeaseBackend()
+
+
+def _coalesced(trigger: str) -> float:
+    return REFRESH_TRIGGERS.samples().get((trigger, "coalesced"), 0)
+
+
+def test_one_run_at_a_time(backend):
+    lock = SingleFlight(backend)
+    token = lock.acquire("beat")
+    assert token is not None
+    assert lock.holder()["trigger"] == "beat"
+
+    coalesced = _coalesced("manual")
+    assert lock.acquire("manual") is None
+    assert _coalesced("manual") == coalesced + 1
+
+    lock.release(token)
+    assert lock.holder() is None
+    assert lock.acquire("manual") is not None
+
+
+def test_expired_lease_is_taken_over(backend):
+    lock = SingleFlight(backend, ttl=0.05)
+    stale = lock.acquire("startup")
+    time.sleep(0.1)
+
+    assert lock.holder() is None
+    token = lock.acquire("beat")
+    assert token is not None
+    # The crashed run's late release doesn't free the new run's lease
+    assert not backend.release(lock.name, stale)
+    assert lock.holder()["trigger"] == "beat"
+
+
+def test_leases_are_per_name(backend):
+    assert SingleFlight(backend, name="refresh").acquire("beat") is not None
+    assert SingleFlight(backend, name="other").acquire("beat") is not None
+
+
+def test_concurrent_triggers_start_one_run(tmp_path):
+    directory = str(tmp_path / "leases")
+    tokens = []
+
+    def trigger() -> None:
+        # One backend per thread, like separate processes sharing the folder
+        tokens.append(SingleFlight(FileLeaseBackend(directory)).acquire("startup"))
+
+    threads = [threading.Thread(target=trigger) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len([token for token in tokens if token is not None]) == 1
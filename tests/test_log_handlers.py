@@ -0,0 +1,72 @@
+import logging
+import os
+import queue
+import time
+
+import pandas as pd
+
+from flaskr.log_handlers import (
+    LOG_RECORDS_DROPPED,
+    AsyncQueueHandler,
+    DailyDirectoryFileHandler,
+    LazyPreview,
+)
+
+
+def _record(created: float, message: str = "message") -> logging.LogRecord:
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, message, (), None)
+    record.created = created
+    return record
+
+
+def test_daily_directory_rollover(tmp_path):
+    handler = DailyDirectoryFileHandler(str(tmp_path), "app.log")
+    today = time.time()
+    tomorrow = handler.rollover_at + 60
+    try:
+        handler.emit(_record(today, "first"))
+        handler.emit(_record(tomorrow, "second"))
+    finally:
+        handler.close()
+
+    first_day = tmp_path / time.strftime("%Y%m%d", time.localtime(today)) / "app.log"
+    second_day = tmp_path / time.strftime("%Y%m%d", time.localtime(tomorrow)) / "app.log"
+    assert first_day.read_text().strip() == "first"
+    assert second_day.read_text().strip() == "second"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = AsyncQueueHandler(queue.Queue(1))
+    dropped = LOG_RECORDS_DROPPED.samples().get((), 0)
+
+    handler.emit(_record(time.time(), "kept"))
+    handler.emit(_record(time.time(), "dropped"))
+
+    assert handler.queue.get_nowait().getMessage() == "kept"
+    assert LOG_RECORDS_DROPPED.samples()[()] == dropped + 1
+
+
+class _CountingFrame(pd.DataFrame):
+    renders = 0
+
+    @property
+    def _constructor(self):
+        return _CountingFrame
+
+    def to_string(self, *args, **kwargs):
+        _CountingFrame.renders += 1
+        return super().to_string(*args, **kwargs)
+
+
+def test_lazy_preview_renders_only_emitted_records():
+    logger = logging.getLogger("tests.lazy_preview")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    frame = _CountingFrame({"Country": [f"C{i}" for i in range(20)], "Value": range(20)})
+
+    logger.debug("Data =\n%s", LazyPreview(frame))
+    assert _CountingFrame.renders == 0
+
+    preview = str(LazyPreview(frame, rows=3))
+    assert _CountingFrame.renders == 1
+    assert len(preview.splitlines()) == 4
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from flaskr import definitions as constants
+from flaskr.api.conversion import ConversionEngine
+from flaskr.data import build_pair_matrices, get_storage, load_pair_matrices, save_pair_matrices
+
+from .conftest import MERGED_DATA, write_generated_data
+
+
+def _save_matrices(directory, factors=None, countries=None, source_digest=None):
+    data_path = os.path.join(directory, constants.FINAL_MERGED_DATA_FILE_NAME)
+    columns = {"ppp": "Value", "exchange": "ExchangeRate"}
+    factors = factors or [MERGED_DATA[columns[mode]] for mode in constants.CONVERSION_MODES]
+    save_pair_matrices(
+        matrices=build_pair_matrices(factors),
+        matrices_path=os.path.join(directory, constants.PAIR_MATRICES_FILE_NAME),
+        index_path=os.path.join(directory, constants.PAIR_MATRICES_INDEX_FILE_NAME),
+        countries=countries or MERGED_DATA["Country"].tolist(),
+        modes=list(constants.CONVERSION_MODES),
+        source_digest=source_digest or get_storage().digest(data_path),
+    )
+    return data_path
+
+
+def test_build_pair_matrices():
+    matrices = build_pair_matrices([[1.0, 2.0, 0.0], [4.0, 2.0, 1.0]])
+
+    assert matrices.shape == (2, 3, 3)
+    assert matrices[0, 0, 1] == pytest.approx(2.0)
+    assert matrices[1, 0, 1] == pytest.approx(0.5)
+    assert np.diag(matrices[1]) == pytest.approx(np.ones(3))
+    assert matrices[0, 0, 2] == 0.0
+    assert np.isinf(matrices[0, 2, 0])
+
+
+def test_save_and_load_round_trip(tmp_path):
+    matrices = build_pair_matrices([[1.0, 2.0], [3.0, 4.0]])
+    matrices_path, index_path = str(tmp_path / "m.npy"), str(tmp_path / "m.json")
+    save_pair_matrices(matrices, matrices_path, index_path, ["A", "B"], ["ppp", "exchange"], "d")
+
+    index, loaded = load_pair_matrices(matrices_path, index_path)
+    assert index["countries"] == ["A", "B"]
+    assert index["source_digest"] == "d"
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, matrices)
+    assert sorted(os.listdir(tmp_path)) == ["m.json", "m.npy"]
+
+
+def test_engine_reads_fresh_matrices(tmp_path):
+    write_generated_data(tmp_path)
+    # Matrices that differ from the factors, to tell which one the engine used
+    data_path = _save_matrices(tmp_path, factors=[np.arange(1.0, 5.0), np.arange(1.0, 5.0)])
+    engine = ConversionEngine(data_path=data_path)
+    assert engine.reload_if_changed()
+
+    assert set(engine.table.pair_matrices) == set(constants.CONVERSION_MODES)
+    # INDIA is row 0, GERMANY row 2
+    assert engine.convert(100, "India", "Germany") == pytest.approx(300.0)
+    results, errors = engine.convert_batch([100, 100], "India", ["Germany", "France"])
+    assert not errors
+    assert results == pytest.approx([300.0, 400.0])
+
+
+@pytest.mark.parametrize(
+    "stale",
+    [
+        {"source_digest": "other"},
+        {"countries": ["FRANCE", "GERMANY", "UNITED STATES", "INDIA"]},
+        {"factors": [[1.0, 2.0], [1.0, 2.0]], "countries": ["INDIA", "GERMANY"]},
+    ],
+)
+def test_engine_ignores_stale_matrices(tmp_path, stale):
+    write_generated_data(tmp_path)
+    data_path = _save_matrices(tmp_path, **stale)
+    engine = ConversionEngine(data_path=data_path)
+    assert engine.reload_if_changed()
+
+    assert engine.table.pair_matrices == {}
+    assert engine.convert(100, "India", "Germany") == pytest.approx(100 / 22.5 * 0.75)
+
+
+def test_engine_ignores_unreadable_matrices(tmp_path):
+    write_generated_data(tmp_path)
+    data_path = _save_matrices(tmp_path)
+    with open(tmp_path / constants.PAIR_MATRICES_FILE_NAME, "wb") as file:
+        file.write(b"not a npy file")
+    engine = ConversionEngine(data_path=data_path)
+    assert engine.reload_if_changed()
+
+    assert engine.table.pair_matrices == {}
+    assert engine.convert(100, "India", "Germany") == pytest.approx(100 / 22.5 * 0.75)
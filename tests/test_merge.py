@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+
+from flaskr import definitions as constants
+from flaskr import pipeline
+from flaskr.api.services import GenerateData
+from flaskr.data import get_storage
+
+DATASETS = ("ppp", "exchange_rate", "currency")
+
+
+def _fetch_all() -> list:
+    return [pipeline.fetch_dataset(dataset) for dataset in DATASETS]
+
+
+def _merged_data() -> pd.DataFrame:
+    path = os.path.join(constants.GENERATED_DATA_PATH, constants.FINAL_MERGED_DATA_FILE_NAME)
+    data = get_storage().load(path)
+    return data.sort_values("Country").reset_index(drop=True)
+
+
+def test_exchange_rate_change_refreshes_the_rates_only(upstream):
+    pipeline.merge_datasets(_fetch_all())
+    upstream.exchange_rates["rates"]["EUR"] = 0.5
+
+    result = pipeline.merge_datasets(_fetch_all())
+    assert result["merge_path"] == "exchange_rate_refresh"
+    incremental = _merged_data()
+
+    # Same output as merging everything from scratch, done in a staging copy
+    # so the published generation isn't touched
+    generator = GenerateData()
+    staging = generator.snapshots.stage()
+    generator._set_generated_data_dir(staging)
+    full = generator._full_merge().sort_values("Country").reset_index(drop=True)
+    generator.snapshots.discard(staging)
+    pd.testing.assert_frame_equal(incremental[full.columns], full, check_dtype=False)
+    assert incremental.loc[incremental["Country"] == "GERMANY", "ExchangeRate"].item() == 0.5
+
+
+def test_ppp_change_runs_a_full_merge(upstream):
+    pipeline.merge_datasets(_fetch_all())
+    upstream.world_bank_records[5] = dict(upstream.world_bank_records[5], value=0.8)
+
+    assert pipeline.merge_datasets(_fetch_all())["merge_path"] == "full"
+    assert _merged_data().loc[lambda data: data["Country"] == "GERMANY", "Value"].item() == 0.8
+
+
+def test_unchanged_inputs_skip_the_merge(upstream):
+    pipeline.merge_datasets(_fetch_all())
+    generator = GenerateData()
+
+    assert generator.generate_merged_final_data()
+    assert generator.merge_path == "skipped"
+    assert generator.generation is None
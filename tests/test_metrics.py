@@ -0,0 +1,66 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from flaskr import definitions as constants
+from flaskr.metrics import MetricsRegistry
+
+
+def _write_snapshot(directory, name: str, value: float, written_at: float = None) -> str:
+    path = os.path.join(directory, name)
+    snapshot = {
+        "written_at": time.time() if written_at is None else written_at,
+        "metrics": {
+            "test_total": {"type": "counter", "help": "", "labelnames": [], "samples": [[[], value]]}
+        },
+    }
+    with open(path, "w") as file:
+        json.dump(snapshot, file)
+    return path
+
+
+def _exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_counters_are_summed_across_processes(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path))
+    registry.counter("test_total", "Test counter").inc(2)
+    _write_snapshot(tmp_path, "otherhost-1.json", 3)
+    _write_snapshot(tmp_path, f"{socket.gethostname()}-{os.getppid()}.json", 4)
+
+    assert registry.collect()["test_total"]["samples"][()] == 9
+    assert "test_total 9" in registry.render()
+
+
+def test_snapshots_of_exited_processes_are_deleted(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path))
+    registry.counter("test_total", "Test counter").inc(2)
+    dead = _write_snapshot(tmp_path, f"{socket.gethostname()}-{_exited_pid()}.json", 3)
+
+    assert registry.collect()["test_total"]["samples"][()] == 2
+    assert not os.path.exists(dead)
+
+
+def test_stale_snapshots_are_deleted(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path))
+    registry.counter("test_total", "Test counter").inc(2)
+    written_at = time.time() - constants.METRICS_SNAPSHOT_MAX_AGE - 1
+    stale = _write_snapshot(tmp_path, "otherhost-1.json", 3, written_at=written_at)
+
+    assert registry.collect()["test_total"]["samples"][()] == 2
+    assert not os.path.exists(stale)
+
+
+def test_own_snapshot_is_not_counted_twice(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path))
+    registry.counter("test_total", "Test counter").inc(2)
+    registry.write_snapshot()
+
+    assert os.path.exists(registry.snapshot_path)
+    assert registry.collect()["test_total"]["samples"][()] == 2
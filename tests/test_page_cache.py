@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from flaskr import app as flask_app
+from flaskr import definitions as constants
+from flaskr.data import bump_generation
+from flaskr.web.page_cache import PageCache
+
+
+class Renderer:
+    """Counts the renders a cache falls through to"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self) -> str:
+        self.count += 1
+        return f"<p>render {self.count}</p>"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "page.html").write_text("<p>{{ value }}</p>")
+    return PageCache(str(tmp_path / "templates"), str(tmp_path / "manifest.json"), maxsize=2)
+
+
+def _touch(path, mtime_ns: int) -> None:
+    if not os.path.exists(path):
+        open(path, "w").close()
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_pages_are_rendered_once(cache):
+    render = Renderer()
+    body, etag = cache.page(("index",), render)
+
+    assert cache.page(("index",), render) == (body, etag)
+    assert render.count == 1
+    assert cache.page(("about",), render)[1] != etag
+
+
+def test_least_recently_used_pages_are_evicted(cache):
+    render = Renderer()
+    for key in ("a", "b", "a", "c", "a", "b"):
+        cache.page((key,), render)
+    # "b" went out when "c" came in
+    assert render.count == 4
+
+
+@pytest.mark.parametrize("change", ["template", "manifest", "generation"])
+def test_cache_is_emptied_when_a_dependency_changes(cache, tmp_path, change):
+    render = Renderer()
+    cache.page(("index",), render)
+    if change == "template":
+        _touch(tmp_path / "templates" / "page.html", 10**18)
+    elif change == "manifest":
+        _touch(tmp_path / "manifest.json", 10**18)
+    else:
+        os.makedirs(constants.GENERATED_DATA_PATH)
+        bump_generation()
+
+    body, _ = cache.page(("index",), render)
+    assert body == "<p>render 2</p>"
+
+
+def test_fragments_are_keyed_by_context(cache):
+    with flask_app.test_request_context():
+        flask_app.jinja_loader.searchpath.append(cache.template_dir)
+        try:
+            assert cache.fragment("page.html", value=1) == "<p>1</p>"
+            assert cache.fragment("page.html", value=2) == "<p>2</p>"
+        finally:
+            flask_app.jinja_loader.searchpath.remove(cache.template_dir)
+
+
+def test_pages_are_served_with_a_strong_etag():
+    with flask_app.test_client() as client:
+        response = client.get("/about")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert not etag.startswith("W/")
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        response = client.get("/about", headers={"If-None-Match": etag})
+        assert response.status_code == 304
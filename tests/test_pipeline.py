@@ -0,0 +1,90 @@
+import pytest
+
+from flaskr import definitions as constants
+from flaskr import pipeline
+from flaskr.api.conversion import ConversionEngine
+from flaskr.retries import CircuitBreaker
+
+DATASETS = ("ppp", "exchange_rate", "currency")
+
+
+def _refresh() -> dict:
+    return pipeline.merge_datasets([pipeline.fetch_dataset(dataset) for dataset in DATASETS])
+
+
+def test_fetch_and_merge(upstream):
+    result = _refresh()
+
+    assert result["success"]
+    assert all(branch["success"] and branch["changed"] for branch in result["branches"])
+    assert result["rows_merged"] == 4
+    assert result["generation"] == 1
+
+    engine = ConversionEngine()
+    engine.reload_if_changed()
+    assert engine.convert(100, "India", "Germany") == pytest.approx(100 / 22.5 * 0.75)
+    assert engine.convert(83, "India", "United States", mode="exchange") == pytest.approx(1.0)
+
+
+def test_unchanged_upstreams_skip_the_merge(upstream):
+    _refresh()
+    result = _refresh()
+
+    assert not any(branch["changed"] for branch in result["branches"])
+    assert result["skipped"]
+    assert result["merge_path"] == "skipped"
+
+
+def test_changed_dataset_publishes_a_new_generation(upstream):
+    _refresh()
+    upstream.exchange_rates["rates"]["EUR"] = 0.5
+    result = _refresh()
+
+    assert [branch["changed"] for branch in result["branches"]] == [False, True, False]
+    assert not result["skipped"]
+    assert result["generation"] == 2
+
+
+def test_failed_fetch_keeps_the_fetched_data(upstream):
+    _refresh()
+    upstream.failing.add("openexchangerates")
+    branch = pipeline.fetch_dataset("exchange_rate")
+
+    # Still usable, from the data already fetched, but worth a retry
+    assert branch["success"]
+    assert branch["retryable"]
+    assert not branch["fetched"]
+    assert pipeline.merge_datasets([branch])["skipped"]
+
+
+def test_failed_first_fetch(upstream):
+    upstream.failing.add("datahub")
+    branch = pipeline.fetch_dataset("currency")
+
+    assert not branch["success"]
+    assert branch["retryable"]
+
+
+def test_open_breaker_skips_the_upstream(upstream):
+    _refresh()
+    breaker = CircuitBreaker("worldbank")
+    for _ in range(constants.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    calls = len(upstream.calls)
+
+    branch = pipeline.fetch_dataset("ppp")
+    assert branch["breaker_open"]
+    # Falls back to the data already fetched
+    assert branch["success"]
+    assert len(upstream.calls) == calls
+
+
+def test_call_ledger_failure_still_returns_the_branch_outcome(upstream, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("flaskr.pipeline.CallLedger.record_refresh", fail)
+    branch = pipeline.fetch_dataset("exchange_rate")
+
+    assert branch["success"]
+    assert branch["fetched"]
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from benchmarks.bench_ppp_parse import columnar_parse_ppp_data, legacy_parse_ppp_data
+from benchmarks.synthetic import world_bank_records
+from flaskr.api.ingest import PPPColumns
+from flaskr.api.services import PPPData
+
+
+def _record(country: str, date: int, value, iso2: str = "XX") -> dict:
+    return {
+        "country": {"id": iso2, "value": country},
+        "countryiso3code": iso2 + "X",
+        "date": str(date),
+        "value": value,
+    }
+
+
+def _columns(records: list) -> PPPColumns:
+    columns = PPPColumns()
+    columns.extend(records)
+    return columns
+
+
+@pytest.mark.parametrize("count, seed", [(0, 0), (50, 1), (5000, 2), (20000, 3)])
+def test_matches_the_legacy_parse(count, seed):
+    """The columnar parse keeps the output of the original row loop plus
+    groupby/idxmax reduction, duplicate (country, year) rows and country
+    names colliding once upper-cased included"""
+    records = world_bank_records(count, seed=seed)
+    pd.testing.assert_frame_equal(
+        legacy_parse_ppp_data(records).reset_index(drop=True),
+        columnar_parse_ppp_data(PPPData(), records).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_series_keeps_every_year_sorted():
+    records = [
+        _record("India", 2022, 22.5, "IN"),
+        _record("Germany", 2021, None, "DE"),
+        _record("India", 2020, 20.0, "IN"),
+        _record("Germany", 2019, 0.7, "DE"),
+        _record("INDIA", 2021, 21.0, "IN"),
+    ]
+    series_df = PPPData()._parse_ppp_series(ppp_data=_columns(records))
+
+    assert series_df["Country"].tolist() == ["GERMANY", "INDIA", "INDIA", "INDIA"]
+    assert series_df["Date"].tolist() == [2019, 2020, 2021, 2022]
+    assert series_df["ISO2"].tolist() == ["DE", "IN", "IN", "IN"]
+
+
+def test_latest_per_country():
+    records = [
+        _record("India", 2022, None),
+        _record("India", 2021, 21.0),
+        _record("India", 2021, 99.0),
+        _record("France", 2020, 0.7),
+    ]
+    parsed_df = PPPData()._parse_ppp_data(ppp_data=_columns(records))
+
+    assert parsed_df[["Country", "Date", "Value"]].values.tolist() == [
+        ["FRANCE", 2020, 0.7],
+        # First observation of a duplicated year wins, as with idxmax
+        ["INDIA", 2021, 21.0],
+    ]
+
+
+def test_series_drops_out_of_range_years():
+    records = [
+        _record("India", 2021, 21.0),
+        _record("India", 12021, 99.0),
+        _record("India", 0, 1.0),
+        _record("France", 2020, 0.7),
+    ]
+    series_df = PPPData()._parse_ppp_series(ppp_data=_columns(records))
+
+    assert series_df[["Country", "Date"]].values.tolist() == [["FRANCE", 2020], ["INDIA", 2021]]
@@ -0,0 +1,98 @@
+import calendar
+import os
+
+import pytest
+
+from flaskr import definitions as constants
+from flaskr.data import get_storage
+from flaskr.refresh_policy import CallLedger, RefreshPolicy
+
+# 2024-03-16 00:00 UTC, 16 days before the end of the month
+NOW = calendar.timegm((2024, 3, 16, 0, 0, 0))
+DAY = 86400
+
+INTERVALS = {"ppp": DAY, "exchange_rate": 3600, "currency": 7 * DAY}
+BUDGETS = {"ppp": 3 * DAY, "exchange_rate": DAY, "currency": 30 * DAY}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return CallLedger(str(tmp_path / "call_ledger.json"))
+
+
+@pytest.fixture
+def policy(ledger):
+    return RefreshPolicy(ledger=ledger, intervals=INTERVALS, staleness_budgets=BUDGETS)
+
+
+def test_calls_are_counted_per_month(ledger):
+    assert ledger.record_call("exchange_rate", now=NOW) == 1
+    assert ledger.record_call("exchange_rate", now=NOW + 60) == 2
+    assert ledger.calls_this_month("exchange_rate", now=NOW) == 2
+    assert ledger.calls_this_month("ppp", now=NOW) == 0
+
+    next_month = NOW + 20 * DAY
+    assert ledger.calls_this_month("exchange_rate", now=next_month) == 0
+    assert ledger.record_call("exchange_rate", now=next_month) == 1
+
+
+def test_refresh_times_persist(ledger):
+    assert ledger.last_refresh("ppp") is None
+    ledger.record_refresh("ppp", now=NOW)
+    assert CallLedger(ledger.path).last_refresh("ppp") == NOW
+
+
+def test_unreadable_ledger_starts_over(ledger):
+    with open(ledger.path, "w") as file:
+        file.write("{not json")
+    assert ledger.calls_this_month("exchange_rate", now=NOW) == 0
+    assert ledger.record_call("exchange_rate", now=NOW) == 1
+
+
+def test_never_fetched_datasets_are_due(policy):
+    assert policy.due_datasets(now=NOW) == ["ppp", "exchange_rate", "currency"]
+
+
+def test_fetched_file_stands_in_for_the_ledger(policy):
+    os.makedirs(constants.FETCHED_DATA_PATH)
+    fetched = get_storage().path_for(
+        os.path.join(constants.FETCHED_DATA_PATH, constants.PPP_FILE_NAME)
+    )
+    with open(fetched, "w") as file:
+        file.write("data")
+    os.utime(fetched, (NOW - 60, NOW - 60))
+
+    assert policy.last_refresh("ppp") == NOW - 60
+    assert "ppp" not in policy.due_datasets(now=NOW)
+
+
+def test_datasets_are_due_on_their_own_cadence(policy, ledger):
+    ledger.record_refresh("ppp", now=NOW - DAY + 60)
+    ledger.record_refresh("exchange_rate", now=NOW - DAY)
+    ledger.record_refresh("currency", now=NOW - DAY)
+
+    assert policy.due_datasets(now=NOW) == ["exchange_rate"]
+    assert policy.due_datasets(now=NOW + 60) == ["ppp", "exchange_rate"]
+
+
+def test_exchange_rate_interval_spreads_the_quota(policy, ledger, monkeypatch):
+    monkeypatch.setattr(constants, "EXCHANGE_RATE_MONTHLY_QUOTA", 100)
+    monkeypatch.setattr(constants, "EXCHANGE_RATE_QUOTA_RESERVE", 0.2)
+    for _ in range(40):
+        ledger.record_call("exchange_rate", now=NOW)
+
+    assert policy.exchange_rate_budget(now=NOW) == 40
+    # 16 days left for 40 calls
+    assert policy.interval("exchange_rate", now=NOW) == pytest.approx(16 * DAY / 40)
+    assert policy.interval("ppp", now=NOW) == DAY
+
+
+def test_spent_quota_stops_exchange_rate_refreshes(policy, ledger, monkeypatch):
+    monkeypatch.setattr(constants, "EXCHANGE_RATE_MONTHLY_QUOTA", 10)
+    monkeypatch.setattr(constants, "EXCHANGE_RATE_QUOTA_RESERVE", 0.5)
+    for _ in range(5):
+        ledger.record_call("exchange_rate", now=NOW)
+    ledger.record_refresh("exchange_rate", now=NOW - 10 * DAY)
+
+    assert policy.interval("exchange_rate", now=NOW) == float("inf")
+    assert "exchange_rate" not in policy.due_datasets(now=NOW)
@@ -0,0 +1,47 @@
+from flaskr.api.resolution import CountryResolver, build_aliases, normalize_name
+
+COUNTRIES = ["BAHAMAS, THE", "UNITED STATES", "KOREA, REP.", "KOREA, DEM. PEOPLE'S REP."]
+
+
+def test_normalize_name():
+    assert normalize_name("Bahamas, The") == "BAHAMAS"
+    assert normalize_name("Côte d'Ivoire") == "COTE DIVOIRE"
+    assert normalize_name("St. Lucia") == "SAINT LUCIA"
+
+
+def test_build_aliases():
+    aliases = build_aliases(
+        COUNTRIES,
+        entity_by_country={"UNITED STATES": "UNITED STATES OF AMERICA (THE)"},
+        codes_by_country={"UNITED STATES": ["US", "USA"], "BAHAMAS, THE": ["BS", "BHS"]},
+    )
+    resolver = CountryResolver(COUNTRIES, aliases=aliases)
+
+    assert resolver.resolve("united states of america") == "UNITED STATES"
+    assert resolver.resolve("USA") == "UNITED STATES"
+    assert resolver.resolve("the bahamas") == "BAHAMAS, THE"
+    assert resolver.resolve("South Korea") == "KOREA, REP."
+    # Both Koreas share the base name, so it resolves to neither
+    assert resolver.resolve("Korea") is None
+    assert resolver.resolve("Atlantis") is None
+
+
+def test_aliases_to_unknown_countries_are_ignored():
+    resolver = CountryResolver(["FRANCE"], aliases={"GERMANY": "GERMANY", "FR": "FRANCE"})
+    assert resolver.resolve("Germany") is None
+    assert resolver.resolve("fr") == "FRANCE"
+
+
+def test_suggest():
+    resolver = CountryResolver(COUNTRIES, limit=2)
+    assert resolver.suggest("kor") == ["KOREA, DEM. PEOPLE'S REP.", "KOREA, REP."]
+    assert resolver.suggest("kor", limit=1) == ["KOREA, DEM. PEOPLE'S REP."]
+    assert resolver.suggest("  ") == []
+
+
+def test_index_round_trip(tmp_path):
+    path = str(tmp_path / "resolution_index.json")
+    assert CountryResolver.load_index(path) == {}
+
+    CountryResolver.save_index({"USA": "UNITED STATES"}, path)
+    assert CountryResolver.load_index(path) == {"USA": "UNITED STATES"}
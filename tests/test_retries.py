@@ -0,0 +1,84 @@
+import pytest
+import requests
+
+from flaskr import definitions as constants
+from flaskr.retries import CircuitBreaker, is_retryable, retry_delay
+
+NOW = 1_700_000_000.0
+
+
+def _http_error(status: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (requests.exceptions.ConnectionError(), True),
+        (requests.exceptions.ReadTimeout(), True),
+        (_http_error(429), True),
+        (_http_error(503), True),
+        (_http_error(404), False),
+        (_http_error(401), False),
+        (ValueError("bad payload"), False),
+    ],
+)
+def test_is_retryable(error, expected):
+    assert is_retryable(error) is expected
+
+
+def test_retry_delay_backs_off_with_jitter():
+    for attempt in range(constants.REQUEST_TRY_COUNT - 1):
+        ceiling = min(constants.RETRY_MAX_DELAY, constants.RETRY_BASE_DELAY * 2**attempt)
+        for _ in range(20):
+            delay = retry_delay(attempt, first_attempt_at=NOW, now=NOW)
+            assert constants.RETRY_BASE_DELAY / 2 <= delay <= ceiling
+
+
+def test_retry_delay_gives_up():
+    assert retry_delay(constants.REQUEST_TRY_COUNT - 1, first_attempt_at=NOW, now=NOW) is None
+    late = NOW + constants.RETRY_MAX_TOTAL
+    assert retry_delay(0, first_attempt_at=NOW, now=late) is None
+
+
+@pytest.fixture
+def breaker(tmp_path):
+    return CircuitBreaker("worldbank", directory=str(tmp_path))
+
+
+def test_breaker_opens_at_the_threshold(breaker, tmp_path):
+    for _ in range(constants.BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.record_failure(now=NOW)
+    assert breaker.allow(now=NOW)
+
+    breaker.record_failure(now=NOW)
+    assert not breaker.allow(now=NOW)
+    # Shared through the state file
+    assert not CircuitBreaker("worldbank", directory=str(tmp_path)).allow(now=NOW)
+    assert CircuitBreaker("openexchangerates", directory=str(tmp_path)).allow(now=NOW)
+
+
+def test_breaker_half_opens_after_the_reset_timeout(breaker):
+    for _ in range(constants.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(now=NOW)
+
+    trial_at = NOW + constants.BREAKER_RESET_TIMEOUT
+    assert breaker.allow(now=trial_at)
+
+    # A failed trial re-opens it for another timeout
+    breaker.record_failure(now=trial_at)
+    assert not breaker.allow(now=trial_at + 1)
+
+    breaker.record_success()
+    assert breaker.allow(now=trial_at + 1)
+
+
+def test_success_resets_the_failure_count(breaker):
+    for _ in range(constants.BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.record_failure(now=NOW)
+    breaker.record_success()
+    breaker.record_failure(now=NOW)
+
+    assert breaker.allow(now=NOW)
@@ -0,0 +1,86 @@
+import pytest
+
+from flaskr import definitions as constants
+
+
+def test_convert_batch(client):
+    response = client.post(
+        "/api/convert/batch",
+        json={"amounts": [100, "x", 100], "from": ["INR", "INR", "Atlantis"], "to": "USD"},
+    )
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body["count"] == 3
+    assert body["results"][0] == pytest.approx(100 / 22.5)
+    assert body["results"][1:] == [None, None]
+    assert [error["index"] for error in body["errors"]] == [1, 2]
+
+
+def test_convert_batch_nested_amounts_are_row_errors(client):
+    body = client.post(
+        "/api/convert/batch",
+        json={"amounts": [[1, 2], [3, 4]], "from": ["INR", "INR"], "to": "USD"},
+    ).get_json()
+
+    assert body["count"] == 2
+    assert body["results"] == [None, None]
+    assert [error["message"] for error in body["errors"]] == ["Invalid amount"] * 2
+
+
+def test_convert_batch_overflowing_rows_are_errors(client):
+    response = client.post(
+        "/api/convert/batch", json={"amounts": [1e308, 100], "from": "USD", "to": "INDIA"}
+    )
+    body = response.get_json()
+
+    assert b"Infinity" not in response.data
+    assert body["results"] == [None, pytest.approx(100 * 22.5)]
+    assert body["errors"] == [{"index": 0, "message": "Conversion result out of range"}]
+
+
+def test_convert_batch_years(client):
+    body = client.post(
+        "/api/convert/batch",
+        json={"amounts": [100, 100], "from": "India", "to": "Germany", "year": [2021, 1800]},
+    ).get_json()
+
+    assert body["results"][0] == pytest.approx(100 / 20.0 * 0.70)
+    assert body["errors"] == [{"index": 1, "message": "Invalid year"}]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        None,
+        [1, 2],
+        {"amounts": 100, "from": "INR", "to": "USD"},
+        {"amounts": [100], "from": 1, "to": "USD"},
+        {"amounts": [100, 200], "from": ["INR"], "to": "USD"},
+        {"amounts": [100], "from": "INR", "to": "USD", "mode": "barter"},
+        {"amounts": [100], "from": "INR", "to": "USD", "mode": ["ppp"]},
+        {"amounts": [100], "from": "INR", "to": "USD", "mode": None},
+        {"amounts": [100], "from": "INR", "to": "USD", "mode": "exchange", "year": 2022},
+    ],
+)
+def test_convert_batch_rejects_bad_requests(client, payload):
+    assert client.post("/api/convert/batch", json=payload).status_code == 400
+
+
+def test_convert_batch_row_limit(client, monkeypatch):
+    monkeypatch.setattr(constants, "BATCH_CONVERSION_MAX_ROWS", 2)
+    response = client.post(
+        "/api/convert/batch", json={"amounts": [1, 2, 3], "from": "INR", "to": "USD"}
+    )
+    assert response.status_code == 400
+
+
+def test_suggest_countries(client):
+    response = client.get("/api/countries/suggest?q=germ")
+    assert response.status_code == 200
+    assert [item["country"] for item in response.get_json()["suggestions"]] == ["GERMANY"]
+
+
+@pytest.mark.parametrize("limit", ["0", "-1", "abc", ""])
+def test_suggest_countries_rejects_bad_limits(client, limit):
+    assert client.get(f"/api/countries/suggest?q=germ&limit={limit}").status_code == 400
@@ -0,0 +1,124 @@
+import pytest
+
+from flaskr import definitions as constants
+from flaskr.run_ledger import RunLedger
+
+NOW = 1_700_000_000.0
+
+
+def _branch(dataset: str, success: bool = True, duration: float = 2.0, rows: int = 100) -> dict:
+    return {
+        "dataset": dataset,
+        "success": success,
+        "changed": success,
+        "started_at": NOW,
+        "duration": duration,
+        "bytes_fetched": 4096,
+        "rows_parsed": rows,
+        "retries": 0 if success else 2,
+    }
+
+
+def _result(branches: list, success: bool = True) -> dict:
+    return {
+        "success": success,
+        "branches": branches,
+        "started_at": NOW + 5,
+        "duration": 1.0,
+        "merge_path": "incremental",
+        "generation": 7,
+        "rows_merged": 180,
+        "rows_dropped": 3,
+        "retries": sum(branch["retries"] for branch in branches),
+    }
+
+
+@pytest.fixture
+def ledger():
+    return RunLedger()
+
+
+def test_run_with_its_stages(ledger):
+    run_id = ledger.start_run("beat", ["ppp", "exchange_rate"], now=NOW)
+    ledger.finish_run(
+        run_id, _result([_branch("ppp"), _branch("exchange_rate")]), now=NOW + 6
+    )
+
+    (run,) = ledger.runs()
+    assert run["id"] == run_id
+    assert run["datasets"] == ["ppp", "exchange_rate"]
+    assert run["outcome"] == "success"
+    assert run["duration"] == pytest.approx(6.0)
+    assert (run["generation"], run["rows_merged"], run["rows_dropped"]) == (7, 180, 3)
+    stages = {stage["stage"]: stage for stage in run["stages"]}
+    assert run["stages"][-1]["stage"] == "merge"
+    assert set(stages) == {"ppp", "exchange_rate", "merge"}
+    assert stages["ppp"]["bytes_fetched"] == 4096
+    assert stages["merge"]["rows"] == 180
+    assert stages["merge"]["retries"] is None
+
+
+@pytest.mark.parametrize(
+    "result, outcome",
+    [
+        (_result([_branch("ppp"), _branch("currency", success=False)]), "partial"),
+        (_result([_branch("ppp")], success=False), "failure"),
+        (None, "failure"),
+    ],
+)
+def test_outcomes(ledger, result, outcome):
+    run_id = ledger.start_run("manual", ["ppp"], now=NOW)
+    ledger.finish_run(run_id, result, now=NOW + 6)
+    assert ledger.runs()[0]["outcome"] == outcome
+
+
+def test_runs_left_running_are_abandoned(ledger):
+    ledger.start_run("startup", ["ppp"], now=NOW)
+    ledger.start_run("beat", ["ppp"], now=NOW + constants.REFRESH_LOCK_TTL + 1)
+
+    assert [run["outcome"] for run in ledger.runs()] == ["running", "abandoned"]
+
+
+def test_runs_filter_and_limit(ledger):
+    for offset, trigger in enumerate(["beat", "manual", "beat"]):
+        ledger.start_run(trigger, ["ppp"], now=NOW + offset)
+
+    assert [run["started_at"] for run in ledger.runs(limit=2)] == [NOW + 2, NOW + 1]
+    assert len(ledger.runs(trigger="beat")) == 2
+
+
+def test_trends(ledger):
+    for duration, rows in ((2.0, 100), (4.0, 90)):
+        run_id = ledger.start_run("beat", ["ppp"], now=NOW)
+        ledger.finish_run(run_id, _result([_branch("ppp", duration=duration, rows=rows)]))
+
+    trends = {trend["stage"]: trend for trend in ledger.trends(now=NOW + 60)}
+    assert set(trends) == {"merge", "ppp"}
+    assert trends["ppp"]["runs"] == 2
+    assert trends["ppp"]["mean_duration"] == pytest.approx(3.0)
+    assert (trends["ppp"]["min_rows"], trends["ppp"]["max_rows"]) == (90, 100)
+    assert ledger.trends(now=NOW + 31 * 86400) == []
+
+
+def test_write_failures_are_not_raised(tmp_path):
+    ledger = RunLedger(str(tmp_path / "missing" / "dir" / "ledger.sqlite3"))
+    (tmp_path / "missing").write_text("not a directory")
+
+    with pytest.raises(OSError):
+        ledger.runs()
+    # The refresh itself goes on
+    ledger.finish_run(ledger.start_run("beat", ["ppp"]))
+
+
+def test_runs_api(client):
+    ledger = RunLedger()
+    ledger.finish_run(ledger.start_run("manual", ["ppp"], now=NOW), _result([_branch("ppp")]))
+
+    body = client.get("/api/runs?trigger=manual").get_json()
+    assert [run["trigger"] for run in body["runs"]] == ["manual"]
+    assert client.get("/api/runs?limit=0").status_code == 400
+    assert client.get("/api/runs?limit=x").status_code == 400
+
+    body = client.get("/api/runs/trends?days=36500").get_json()
+    assert [trend["stage"] for trend in body["stages"]] == ["merge", "ppp"]
+    assert client.get("/api/runs/trends?days=x").status_code == 400
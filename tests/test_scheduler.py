@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from flaskr.locks import FileLeaseBackend, SingleFlight
+from flaskr.run_ledger import RunLedger
+from flaskr.scheduler import EmbeddedScheduler
+
+DATASETS = ["ppp", "exchange_rate", "currency"]
+
+
+@pytest.fixture
+def refresh_lock(tmp_path, monkeypatch):
+    lock = SingleFlight(FileLeaseBackend(str(tmp_path / "leases")))
+    monkeypatch.setattr("flaskr.scheduler.get_refresh_lock", lambda: lock)
+    return lock
+
+
+@pytest.fixture
+def scheduler(upstream, refresh_lock):
+    scheduler = EmbeddedScheduler(interval=60, workers=3)
+    yield scheduler
+    scheduler.stop()
+
+
+def test_refresh_fetches_the_due_datasets_and_merges(scheduler):
+    result = scheduler.run_refresh("manual")
+
+    assert result["success"]
+    assert sorted(branch["dataset"] for branch in result["branches"]) == sorted(DATASETS)
+    assert result["generation"] == 1
+    (run,) = RunLedger().runs()
+    assert run["trigger"] == "manual"
+    assert run["outcome"] == "success"
+
+    # Everything was just fetched, nothing is due
+    assert scheduler.run_refresh("schedule") is None
+    assert len(RunLedger().runs()) == 1
+
+
+def test_refresh_in_flight_is_joined(scheduler, refresh_lock):
+    token = refresh_lock.acquire("beat")
+    try:
+        assert scheduler.run_refresh("manual", DATASETS) is None
+    finally:
+        refresh_lock.release(token)
+    assert RunLedger().runs() == []
+
+
+def test_failed_branch_is_retried_early(scheduler, upstream):
+    scheduler.run_refresh("startup")
+    upstream.failing.add("openexchangerates")
+    scheduler.run_refresh("manual", ["exchange_rate"])
+
+    assert scheduler._retries["exchange_rate"]["retries"] == 1
+    assert scheduler._next_wait() < scheduler.interval
+
+    # Once the retry is due it is picked up although the policy says it's fresh
+    upstream.failing.clear()
+    scheduler._retries["exchange_rate"]["due_at"] = time.time() - 1
+    result = scheduler.run_refresh("schedule")
+    (branch,) = result["branches"]
+    assert branch["dataset"] == "exchange_rate"
+    assert branch["retries"] == 1
+    assert branch["changed"] is False
+    assert scheduler._retries == {}
+    assert scheduler._next_wait() == scheduler.interval
+
+
+def test_retries_stop_when_used_up(scheduler, upstream, monkeypatch):
+    monkeypatch.setattr("flaskr.scheduler.retry_delay", lambda *args: None)
+    upstream.failing.add("openexchangerates")
+    result = scheduler.run_refresh("manual", ["exchange_rate"])
+
+    assert not result["branches"][0]["success"]
+    assert scheduler._retries == {}
+
+
+def test_thread_refreshes_on_start_and_on_trigger(scheduler, upstream):
+    scheduler.start(run_now=True)
+    _wait_for(lambda: _finished_runs() == 1)
+
+    upstream.exchange_rates["rates"]["EUR"] = 0.5
+    scheduler._retries["exchange_rate"] = {
+        "retries": 0,
+        "first_attempt_at": time.time(),
+        "due_at": time.time(),
+    }
+    scheduler.trigger()
+    _wait_for(lambda: _finished_runs() == 2)
+    assert [run["trigger"] for run in RunLedger().runs()] == ["manual", "startup"]
+
+    scheduler.stop()
+    scheduler._thread.join(timeout=5)
+    assert not scheduler._thread.is_alive()
+
+
+def _finished_runs() -> int:
+    return sum(run["outcome"] != "running" for run in RunLedger().runs())
+
+
+def _wait_for(condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from flaskr import definitions as constants
+from flaskr.api.conversion import ConversionEngine
+from flaskr.data import bump_generation
+from flaskr.snapshots import SnapshotStore, snapshot_name
+
+from .conftest import MERGED_DATA, write_generated_data
+
+
+def _publish(store: SnapshotStore, value: float = 22.5) -> str:
+    """Stages the current generation, rewrites the data and publishes it"""
+    staging = store.stage()
+    write_generated_data(staging, data=MERGED_DATA.assign(Value=[value, 1.0, 0.75, 0.72]))
+    generation = bump_generation(staging, floor=store.latest_generation())
+    store.publish(staging, snapshot_name(generation))
+    return snapshot_name(generation)
+
+
+@pytest.fixture
+def store():
+    return SnapshotStore(keep=3)
+
+
+def test_first_use_moves_legacy_files_into_a_snapshot(store):
+    os.makedirs(store.root)
+    with open(os.path.join(store.root, "legacy.csv"), "w") as file:
+        file.write("data")
+
+    store.ensure_layout()
+
+    assert store.current() == snapshot_name(0)
+    assert os.path.islink(store.link_path)
+    assert os.listdir(store.link_path) == ["legacy.csv"]
+    assert not os.path.exists(os.path.join(store.root, "legacy.csv"))
+
+
+def test_publish_flips_current(store):
+    first = _publish(store, value=20.0)
+    second = _publish(store, value=21.0)
+
+    assert store.list() == [snapshot_name(0), first, second]
+    assert store.current() == second
+    assert os.path.realpath(store.link_path) == os.path.join(store.directory, second)
+
+
+def test_staging_leaves_the_published_files_untouched(store):
+    first = _publish(store, value=20.0)
+    published = os.path.join(store.directory, first, "final_merged_data.csv")
+    with open(published) as file:
+        before = file.read()
+
+    _publish(store, value=21.0)
+
+    with open(published) as file:
+        assert file.read() == before
+    assert not [name for name in os.listdir(store.directory) if name.startswith(".")]
+
+
+def test_publish_refuses_an_existing_name(store):
+    name = _publish(store)
+    staging = store.stage()
+    with pytest.raises(FileExistsError):
+        store.publish(staging, name)
+    store.discard(staging)
+    assert not os.path.exists(staging)
+
+
+def test_prune_keeps_the_newest_generations(store):
+    names = [_publish(store, value=20.0 + i) for i in range(4)]
+    assert store.list() == names[1:]
+
+
+def test_rollback(store):
+    first = _publish(store, value=20.0)
+    second = _publish(store, value=21.0)
+
+    assert store.rollback() == first
+    assert store.current() == first
+    assert store.rollback(second) == second
+    with pytest.raises(ValueError):
+        store.rollback("99999999")
+
+    # The next publish numbers on from the newest generation, not the served one
+    store.rollback(first)
+    assert _publish(store) == snapshot_name(int(second) + 1)
+
+
+def test_rollback_without_an_earlier_snapshot(store):
+    store.ensure_layout()
+    with pytest.raises(ValueError):
+        store.rollback()
+
+
+def test_engine_follows_the_current_symlink(store):
+    _publish(store, value=20.0)
+    engine = ConversionEngine()
+    engine.reload_if_changed()
+    assert engine.convert(100, "INR", "USD") == pytest.approx(5.0)
+
+    _publish(store, value=25.0)
+    assert engine.convert(100, "INR", "USD") == pytest.approx(4.0)
+
+    store.rollback()
+    assert engine.convert(100, "INR", "USD") == pytest.approx(5.0)
+
+
+def test_engine_retries_a_snapshot_that_failed_to_load(store, monkeypatch):
+    _publish(store, value=20.0)
+    engine = ConversionEngine()
+    engine.reload_if_changed()
+
+    load_columns = engine.storage.load_columns
+    failures = []
+
+    def failing_load_columns(path, *args, **kwargs):
+        if not failures:
+            failures.append(path)
+            raise OSError("disk hiccup")
+        return load_columns(path, *args, **kwargs)
+
+    monkeypatch.setattr(engine.storage, "load_columns", failing_load_columns)
+    _publish(store, value=25.0)
+
+    # The failed load keeps the old table, the next read loads the new one
+    assert engine.table.generation == 1
+    assert failures
+    assert engine.table.generation == 2
+    assert engine.convert(100, "INR", "USD") == pytest.approx(4.0)
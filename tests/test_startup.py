@@ -0,0 +1,14 @@
+import click
+import pytest
+
+from flaskr.initialize import cli_command_running
+
+
+def test_not_a_cli_command_outside_click():
+    assert not cli_command_running()
+
+
+@pytest.mark.parametrize("command, expected", [("run", False), ("routes", True), ("flask", True)])
+def test_cli_command_running(command, expected):
+    with click.Context(click.Command(command), info_name=command):
+        assert cli_command_running() is expected
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from flaskr import definitions as constants
+from flaskr.data import ColumnarStorage, CsvStorage, get_storage
+
+DATA = pd.DataFrame(
+    {
+        "Country": ["INDIA", "GERMANY", None, "INDIA"],
+        "Date": [2022, 2021, 2020, 2019],
+        "Value": [22.5, 0.75, np.nan, 20.0],
+    }
+)
+
+
+@pytest.mark.parametrize("storage", [CsvStorage(), ColumnarStorage(csv_export=False)])
+def test_round_trip(tmp_path, storage):
+    path = str(tmp_path / "data.csv")
+    storage.save(DATA, path)
+
+    assert storage.exists(path)
+    assert os.listdir(tmp_path) == [os.path.basename(storage.path_for(path))]
+    pd.testing.assert_frame_equal(storage.load(path), DATA, check_dtype=False)
+
+
+def test_columnar_columns_are_memory_mapped(tmp_path):
+    storage = ColumnarStorage(csv_export=False)
+    path = str(tmp_path / "data")
+    storage.save(DATA, path)
+    columns = storage.load_columns(path)
+
+    assert isinstance(columns["Value"], np.memmap)
+    assert columns["Value"].ctypes.data % constants.COLUMNAR_ALIGNMENT == 0
+    assert columns["Country"].tolist() == ["INDIA", "GERMANY", None, "INDIA"]
+    assert storage.load_columns(path, decode=False)["Country"].tolist() == [0, 1, -1, 0]
+
+
+def test_columnar_exports_a_csv_copy(tmp_path):
+    path = str(tmp_path / "data")
+    ColumnarStorage(csv_export=True).save(DATA, path)
+
+    assert sorted(os.listdir(tmp_path)) == ["data.csv", "data.wsc"]
+    pd.testing.assert_frame_equal(CsvStorage().load(path), DATA, check_dtype=False)
+
+
+def test_digest_follows_the_content(tmp_path):
+    storage = ColumnarStorage(csv_export=False)
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    storage.save(DATA, first)
+    storage.save(DATA.copy(), second)
+    assert storage.digest(first) == storage.digest(second)
+
+    storage.save(DATA.assign(Value=1.0), second)
+    assert storage.digest(first) != storage.digest(second)
+
+
+def test_columnar_rejects_other_files(tmp_path):
+    path = tmp_path / "data.wsc"
+    path.write_bytes(b"Country|Value\n")
+    with pytest.raises(ValueError):
+        ColumnarStorage().read_header(str(path))
+
+
+def test_empty_data(tmp_path):
+    storage = ColumnarStorage(csv_export=False)
+    path = str(tmp_path / "empty")
+    storage.save(DATA.iloc[:0], path)
+    assert storage.load(path).empty
+
+
+def test_configured_backend(monkeypatch):
+    assert isinstance(get_storage("csv"), CsvStorage)
+    monkeypatch.setattr(constants, "DATA_STORAGE_BACKEND", "columnar")
+    assert isinstance(get_storage(), ColumnarStorage)
@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from flaskr.api.validators import DatasetValidators
+
+
+def test_save_and_load(tmp_path):
+    data_path = str(tmp_path / "fetched" / "ppp_data.wsc")
+    validators = DatasetValidators(data_path)
+    validators.etag = '"v1"'
+    validators.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+    validators.sha256 = "abc"
+    validators.save()
+
+    loaded = DatasetValidators(data_path)
+    assert loaded.etag == '"v1"'
+    assert loaded.last_modified == validators.last_modified
+    assert loaded.sha256 == "abc"
+    # Written through a temporary file which was moved into place
+    assert os.listdir(tmp_path / "fetched") == [os.path.basename(validators.meta_path)]
+
+
+def test_unreadable_validators_are_ignored(tmp_path):
+    data_path = str(tmp_path / "ppp_data.wsc")
+    with open(data_path + ".meta.json", "w") as file:
+        file.write('{"etag": "trunc')
+
+    assert DatasetValidators(data_path).etag is None
+
+
+def test_conditional_headers_need_the_data_file(tmp_path):
+    data_path = tmp_path / "ppp_data.wsc"
+    validators = DatasetValidators(str(data_path))
+    validators.etag = '"v1"'
+    assert validators.conditional_headers() == {}
+
+    data_path.write_bytes(b"data")
+    assert validators.conditional_headers() == {"If-None-Match": '"v1"'}
+
+
+def test_is_unchanged(tmp_path):
+    data_path = tmp_path / "ppp_data.wsc"
+    data_frame = pd.DataFrame({"Country": ["INDIA"], "Value": [22.5]})
+    validators = DatasetValidators(str(data_path))
+    validators.sha256 = DatasetValidators.fingerprint(data_frame)
+    assert not validators.is_unchanged(validators.sha256)
+
+    data_path.write_bytes(b"data")
+    assert validators.is_unchanged(DatasetValidators.fingerprint(data_frame.copy()))
+    assert not validators.is_unchanged(DatasetValidators.fingerprint(data_frame.assign(Value=1.0)))